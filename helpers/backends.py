@@ -0,0 +1,464 @@
+import abc
+import csv
+import glob
+import io
+import os
+import pyarrow as pa
+import pyarrow.parquet as pq
+from pyspark import SparkContext
+from pyspark.rdd import RDD
+from pyspark.sql import SparkSession
+from pyspark.sql.types import ArrayType, LongType, StringType, StructField, StructType
+import shutil
+import time
+from typing import Any, Dict, List, Optional, Union
+
+from . import logging
+from utils import constants, gsheet, worksheet_cache
+
+"""
+This module contains the backends that the ETL pipeline reads its worksheets
+from and writes its worksheets to, which are selected by the "backend" config
+value:
+- "gsheets" - the spreadsheet in Google Sheets
+- "csv" - CSV files in the backend directory
+- "parquet" - Parquet files in the backend directory
+
+Each worksheet of a local backend is stored at "{backend dir}/{title}.csv"
+or "{backend dir}/{title}.parquet", either as a single file or as a directory
+of part files as written by Spark. The local backends read worksheets into
+RDDs and write RDDs to worksheets in parallel, without going through the
+driver; the Google Sheets backend reads and writes them on the driver.
+"""
+
+# Parquet schema of a worksheet, where each row keeps its position
+_PARQUET_SCHEMA = StructType([
+    StructField('row_idx', LongType(), False),
+    StructField('row', ArrayType(StringType()), False),
+])
+
+def _to_strings(row: List[Any]) -> List[str]:
+    """Converts the values of a row, e.g. parsed prices, to strings."""
+    return [x if isinstance(x, str) else str(x) for x in row]
+
+def _to_csv_line(row: List[Any]) -> str:
+    """Formats a row as a line of CSV."""
+    line = io.StringIO()
+    csv.writer(line).writerow(row)
+    return line.getvalue().rstrip('\r\n')
+
+def _from_csv_file(content: str) -> List[List[str]]:
+    """Parses the content of a CSV file as rows."""
+    return list(csv.reader(io.StringIO(content, newline='')))
+
+def _get_part_paths(path: str, pattern: str) -> List[str]:
+    """Returns the path itself if it is a file, else the part files in the
+    directory in order."""
+
+    if os.path.isfile(path):
+        return [path]
+    return sorted(glob.glob(os.path.join(glob.escape(path), pattern)))
+
+def _replace_path(path_tmp: str, path: str) -> None:
+    """Replaces the file or directory at the path with the one at the
+    temporary path."""
+
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    elif os.path.exists(path):
+        os.remove(path)
+    os.replace(path_tmp, path)
+    return None
+
+class Backend(abc.ABC):
+    """Source and sink of the worksheets of the ETL pipeline.
+
+    A backend has to implement all of the abstract methods to be created,
+    so that an incomplete backend fails before any worksheet is read.
+    """
+
+    @abc.abstractmethod
+    def read(self, ws_titles: List[str]) -> List[List[List[str]]]:
+        """Reads worksheets.
+
+        Args:
+            ws_titles: Worksheet titles
+
+        Returns:
+            All values from each worksheet, as a list of lists,
+            in the order of the worksheet titles.
+        """
+
+    @abc.abstractmethod
+    def write(self,
+              ws_title: str,
+              data: List[List[Any]],
+              keep_header_row: bool) -> Dict[str, Union[str, int]]:
+        """Writes the data to a worksheet, replacing its contents.
+
+        Args:
+            ws_title: Worksheet title
+            data: New data, in a list of lists
+            keep_header_row: Whether the header row should be kept
+
+        Returns:
+            A dict with the same keys as `gsheet.save_to_worksheet`.
+        """
+
+    @abc.abstractmethod
+    def has_more_cells(self, ws_title: str, n_cells: int) -> bool:
+        """Checks if a worksheet has more than a number of cells, without
+        reading all of it.
+
+        Args:
+            ws_title: Worksheet title
+            n_cells: Number of cells
+
+        Returns:
+            True if the worksheet has more cells.
+        """
+
+    @abc.abstractmethod
+    def read_rdds(self, sc: SparkContext, ws_titles: List[str]) -> List[RDD]:
+        """Reads worksheets into RDDs of rows, in the order of the worksheet
+        titles."""
+
+    @abc.abstractmethod
+    def write_rdd(self,
+                  ws_title: str,
+                  rdd: RDD,
+                  keep_header_row: bool) -> Dict[str, Union[str, int]]:
+        """Writes an RDD of rows to a worksheet, as in `write`."""
+
+class GSheetsBackend(Backend):
+    """Backend of the spreadsheet in Google Sheets.
+
+    Worksheets are loaded from the extract cache if they are cached at the
+    current version of the spreadsheet. The other worksheets are fetched
+    together in a single request, and cached. The worksheets read are also
+    kept in memory, until they are written, so that a worksheet whose size
+    has been checked is not read again when it is extracted. The "VRN" and
+    "Prices" worksheets are always fetched together, as both are extracted.
+
+    Args:
+        log: Logger object
+        config: Key-value mappings of config values
+        client: Google Sheets client
+    """
+
+    def __init__(self,
+                 log: logging.Logger,
+                 config: Dict[str, str],
+                 client: gsheet.GSheetClient):
+        self.log = log
+        self.client = client
+        self.spreadsheet_id = config[constants.CONFIG_GSHEET_SPREADSHEET_ID_DEV]
+        self.cache_dir = config[constants.CONFIG_EXTRACT_CACHE_DIR]
+        self.cache_memory_map = config[constants.CONFIG_EXTRACT_CACHE_MEMORY_MAP]
+        self.diff_max_ratio = float(config[constants.CONFIG_LOAD_DIFF_MAX_RATIO])
+        self.ws_titles_extract = [
+            config[constants.CONFIG_GSHEET_WS_VRN],
+            config[constants.CONFIG_GSHEET_WS_PRICES]]
+        self.ws_data: Dict[str, List[List[str]]] = {}
+
+    def read(self, ws_titles: List[str]) -> List[List[List[str]]]:
+        ws_titles_read = [ws_title for ws_title in ws_titles if ws_title not in self.ws_data]
+        if set(ws_titles_read) & set(self.ws_titles_extract):
+            ws_titles_read += [ws_title for ws_title in self.ws_titles_extract
+                               if ws_title not in self.ws_data and ws_title not in ws_titles_read]
+        if ws_titles_read:
+            self.ws_data.update(zip(ws_titles_read, self._read(ws_titles_read)))
+        return [self.ws_data[ws_title] for ws_title in ws_titles]
+
+    def _read(self, ws_titles: List[str]) -> List[List[List[str]]]:
+        # the version is fetched once, so that all worksheets are checked
+        # against the same version of the spreadsheet
+        version = gsheet.get_spreadsheet_version(self.client, self.spreadsheet_id) \
+            if self.cache_dir else None
+
+        ws_data = {}
+        if version is not None:
+            for ws_title in ws_titles:
+                time_start = time.perf_counter()
+                data = worksheet_cache.load(
+                    self.cache_dir,
+                    self.spreadsheet_id,
+                    ws_title,
+                    version,
+                    self.cache_memory_map)
+                if data is not None:
+                    ws_data[ws_title] = data
+                    self.log.info(f'"{ws_title}" worksheet loaded: cache hit at version {version} '
+                                  f'in {time.perf_counter() - time_start:.3f}s')
+
+        ws_titles_fetch = [ws_title for ws_title in ws_titles if ws_title not in ws_data]
+        if ws_titles_fetch:
+            time_start = time.perf_counter()
+            ws_data_fetch = gsheet.load_worksheets(self.client, self.spreadsheet_id, ws_titles_fetch)
+            latency = time.perf_counter() - time_start
+
+            for ws_title, data in zip(ws_titles_fetch, ws_data_fetch):
+                if version is not None:
+                    worksheet_cache.save(self.cache_dir, self.spreadsheet_id, ws_title, version, data)
+                ws_data[ws_title] = data
+                self.log.info(f'"{ws_title}" worksheet loaded: fetched'
+                              f'{"" if version is None else f" at version {version}"} '
+                              f'in {latency:.3f}s, in 1 request of {len(ws_titles_fetch)} worksheets')
+
+        return [ws_data[ws_title] for ws_title in ws_titles]
+
+    def write(self,
+              ws_title: str,
+              data: List[List[Any]],
+              keep_header_row: bool) -> Dict[str, Union[str, int]]:
+        self.ws_data.pop(ws_title, None)
+        return gsheet.save_to_worksheet(
+            self.client,
+            self.spreadsheet_id,
+            ws_title,
+            data,
+            keep_header_row,
+            self.diff_max_ratio)
+
+    def has_more_cells(self, ws_title: str, n_cells: int) -> bool:
+        # the worksheet is read on the driver in any case, so its cells are
+        # counted in the values read, without the blank rows and columns of
+        # its grid, and it is not read again when it is extracted
+        data, = self.read([ws_title])
+        return sum(len(row) for row in data) > n_cells
+
+    def read_rdds(self, sc: SparkContext, ws_titles: List[str]) -> List[RDD]:
+        # the Sheets API is called from the driver, within the request limit
+        # of the client, so the worksheets are read there and parallelized
+        return [sc.parallelize(data) for data in self.read(ws_titles)]
+
+    def write_rdd(self,
+                  ws_title: str,
+                  rdd: RDD,
+                  keep_header_row: bool) -> Dict[str, Union[str, int]]:
+        # the rows are collected to the driver, as the changed cells are
+        # found against the worksheet and written from there
+        return self.write(ws_title, rdd.collect(), keep_header_row)
+
+class _FileBackend(Backend):
+    """Backend of files in a local directory, with one file or directory of
+    part files per worksheet, which its subclasses read and write in their
+    file format.
+
+    Args:
+        log: Logger object
+        backend_dir: Directory of the worksheets
+    """
+
+    extension = None
+
+    def __init__(self, log: logging.Logger, backend_dir: str):
+        self.log = log
+        self.backend_dir = backend_dir
+
+    def get_path(self, ws_title: str) -> str:
+        """Returns the path of a worksheet."""
+        return os.path.join(self.backend_dir, f'{ws_title}.{self.extension}')
+
+    @abc.abstractmethod
+    def read_path(self, path: str) -> List[List[str]]:
+        """Reads all rows of the worksheet at the path."""
+
+    @abc.abstractmethod
+    def write_path(self, path: str, rows: List[List[str]]) -> None:
+        """Writes the rows to a new directory of part files at the path."""
+
+    @abc.abstractmethod
+    def read_path_rdd(self, sc: SparkContext, path: str) -> RDD:
+        """Reads the worksheet at the path into an RDD of rows."""
+
+    @abc.abstractmethod
+    def write_path_rdd(self, path: str, rdd: RDD) -> None:
+        """Writes the RDD of rows to a new directory of part files at the path."""
+
+    def read_header_row(self, path: str) -> Optional[List[str]]:
+        """Reads the header row of the worksheet at the path, if it exists."""
+        if not os.path.exists(path):
+            return None
+        return next(iter(self.read_path(path)), None)
+
+    def read(self, ws_titles: List[str]) -> List[List[List[str]]]:
+        ws_data = []
+        for ws_title in ws_titles:
+            time_start = time.perf_counter()
+            ws_data.append(self.read_path(self.get_path(ws_title)))
+            self.log.info(f'"{ws_title}" worksheet loaded: read from {self.get_path(ws_title)} '
+                          f'in {time.perf_counter() - time_start:.3f}s')
+        return ws_data
+
+    def read_rdds(self, sc: SparkContext, ws_titles: List[str]) -> List[RDD]:
+        return [self.read_path_rdd(sc, self.get_path(ws_title)) for ws_title in ws_titles]
+
+    def write(self,
+              ws_title: str,
+              data: List[List[Any]],
+              keep_header_row: bool) -> Dict[str, Union[str, int]]:
+        path = self.get_path(ws_title)
+        header_row = self.read_header_row(path) if keep_header_row else None
+        rows = ([header_row] if header_row is not None else []) \
+            + [_to_strings(row) for row in data]
+
+        # the worksheet is only replaced once it has been written in full
+        path_tmp = f'{path}.{os.getpid()}.tmp'
+        os.makedirs(path_tmp)
+        self.write_path(path_tmp, rows)
+        _replace_path(path_tmp, path)
+
+        return {
+            constants.UPDATED_RANGE: path,
+            constants.UPDATED_ROWS: len(data),
+            constants.REWRITTEN_CELLS: sum(len(row) for row in data),
+            constants.SKIPPED_CELLS: 0,
+        }
+
+    def write_rdd(self,
+                  ws_title: str,
+                  rdd: RDD,
+                  keep_header_row: bool) -> Dict[str, Union[str, int]]:
+        sc = rdd.context
+        path = self.get_path(ws_title)
+        header_row = self.read_header_row(path) if keep_header_row else None
+
+        n_rows = sc.accumulator(0)
+        n_cells = sc.accumulator(0)
+
+        def _count(row: List[Any]) -> List[str]:
+            n_rows.add(1)
+            n_cells.add(len(row))
+            return _to_strings(row)
+
+        rows_rdd = rdd.map(_count)
+        if header_row is not None:
+            rows_rdd = sc.parallelize([header_row], 1).union(rows_rdd)
+
+        # the worksheet is only replaced once it has been written in full,
+        # as the RDD may be computed from the worksheet itself
+        path_tmp = f'{path}.{os.getpid()}.tmp'
+        self.write_path_rdd(path_tmp, rows_rdd)
+        _replace_path(path_tmp, path)
+
+        return {
+            constants.UPDATED_RANGE: path,
+            constants.UPDATED_ROWS: n_rows.value,
+            constants.REWRITTEN_CELLS: n_cells.value,
+            constants.SKIPPED_CELLS: 0,
+        }
+
+class CSVBackend(_FileBackend):
+    """Backend of CSV files in a local directory."""
+
+    extension = 'csv'
+
+    def read_path(self, path: str) -> List[List[str]]:
+        rows = []
+        for part_path in _get_part_paths(path, 'part-*'):
+            with open(part_path, 'r', newline='') as part_file:
+                rows.extend(csv.reader(part_file))
+        return rows
+
+    def write_path(self, path: str, rows: List[List[str]]) -> None:
+        with open(os.path.join(path, 'part-00000'), 'w', newline='') as part_file:
+            csv.writer(part_file).writerows(rows)
+        return None
+
+    def has_more_cells(self, ws_title: str, n_cells: int) -> bool:
+        # the rows are parsed only until there are more cells
+        n_cells_read = 0
+        for part_path in _get_part_paths(self.get_path(ws_title), 'part-*'):
+            with open(part_path, 'r', newline='') as part_file:
+                for row in csv.reader(part_file):
+                    n_cells_read += len(row)
+                    if n_cells_read > n_cells:
+                        return True
+        return False
+
+    def read_path_rdd(self, sc: SparkContext, path: str) -> RDD:
+        # each part file is parsed whole, as a quoted value may span lines,
+        # and the part files are kept in order
+        return sc.wholeTextFiles(path) \
+            .sortByKey() \
+            .flatMap(lambda x: _from_csv_file(x[1]))
+
+    def write_path_rdd(self, path: str, rdd: RDD) -> None:
+        rdd.map(_to_csv_line).saveAsTextFile(path)
+        return None
+
+class ParquetBackend(_FileBackend):
+    """Backend of Parquet files in a local directory, where each row is
+    stored with its position as a list of strings."""
+
+    extension = 'parquet'
+
+    def read_path(self, path: str) -> List[List[str]]:
+        rows = []
+        for part_path in _get_part_paths(path, 'part-*.parquet'):
+            table = pq.read_table(part_path)
+            rows.extend(zip(table.column(0).to_pylist(), table.column(1).to_pylist()))
+        return [row for _, row in sorted(rows, key=lambda x: x[0])]
+
+    def write_path(self, path: str, rows: List[List[str]]) -> None:
+        table = pa.Table.from_arrays(
+            [pa.array(range(len(rows)), type=pa.int64()),
+             pa.array(rows, type=pa.list_(pa.string()))],
+            names=['row_idx', 'row'])
+        pq.write_table(table, os.path.join(path, 'part-00000.parquet'))
+        return None
+
+    def has_more_cells(self, ws_title: str, n_cells: int) -> bool:
+        # the number of values of the rows column is in the metadata of each
+        # row group
+        n_cells_read = 0
+        for part_path in _get_part_paths(self.get_path(ws_title), 'part-*.parquet'):
+            metadata = pq.read_metadata(part_path)
+            n_cells_read += sum(metadata.row_group(i).column(1).num_values
+                                for i in range(metadata.num_row_groups))
+        return n_cells_read > n_cells
+
+    def read_path_rdd(self, sc: SparkContext, path: str) -> RDD:
+        spark = SparkSession.builder.getOrCreate()
+        return spark.read.parquet(path) \
+            .orderBy('row_idx') \
+            .rdd \
+            .map(lambda x: list(x.row))
+
+    def write_path_rdd(self, path: str, rdd: RDD) -> None:
+        spark = SparkSession.builder.getOrCreate()
+        spark.createDataFrame(rdd.zipWithIndex().map(lambda x: (x[1], x[0])), _PARQUET_SCHEMA) \
+            .write \
+            .parquet(path)
+        return None
+
+def get_backend(log: logging.Logger,
+                config: Dict[str, str],
+                client: gsheet.GSheetClient = None) -> Backend:
+    """Returns the backend selected in the config.
+
+    Args:
+        log: Logger object
+        config: Key-value mappings of config values
+        client: Google Sheets client, created if not given and needed
+
+    Returns:
+        Backend object.
+    """
+
+    # config values used
+    backend = config[constants.CONFIG_BACKEND]
+    backend_dir = config[constants.CONFIG_BACKEND_DIR]
+
+    if backend == constants.BACKEND_GSHEETS:
+        if client is None:
+            client = gsheet.GSheetClient(
+                requests_per_minute=int(config[constants.CONFIG_GSHEET_REQUESTS_PER_MINUTE]),
+                api_url=config[constants.CONFIG_GSHEET_API_URL] or None)
+        return GSheetsBackend(log, config, client)
+    if backend == constants.BACKEND_CSV:
+        return CSVBackend(log, backend_dir)
+    if backend == constants.BACKEND_PARQUET:
+        return ParquetBackend(log, backend_dir)
+    raise ValueError(f'Unknown backend "{backend}"')
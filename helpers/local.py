@@ -0,0 +1,43 @@
+import json
+from os import path
+from typing import Tuple
+
+from . import logging
+
+def start_local(app_name: str,
+                files: list = None) -> Tuple[logging.Log, dict]:
+    """Get a logger and load config files, without starting Spark.
+
+    This is the counterpart of `helpers.spark.start_spark` for running the
+    ETL job in plain Python. The config is loaded from the first file
+    ending in 'config.json' in the list of files, instead of from the files
+    sent to the Spark cluster.
+
+    Args:
+        app_name (str): Name of app.
+        files (list): List of files to look for the config file in.
+
+    Returns:
+        A tuple of references to the logger and config dict
+        (only if available).
+    """
+
+    # handle optional kwargs
+    if files is None:
+        files = []
+
+    logger = logging.Log(app_name)
+
+    config_files = [filename
+                    for filename in files
+                    if filename.endswith('config.json')]
+
+    if config_files:
+        with open(config_files[0], 'r') as config_file:
+            config_dict = json.load(config_file)
+        logger.debug('Loaded config from ' + path.basename(config_files[0]))
+    else:
+        logger.debug('No config file found')
+        config_dict = None
+
+    return logger, config_dict
@@ -1,35 +1,289 @@
+import abc
+import atexit
+from itertools import groupby
+import logging
+import logging.handlers
+from pyspark import SparkContext
+from pyspark.accumulators import AccumulatorParam
 from pyspark.sql import SparkSession
+import queue
+import sys
+import threading
+import time
+from typing import Dict, List, Optional, Tuple, Union
+
+from utils import constants
 
 """
 This module contains a class that wraps the log4j object instantiated
-by the active SparkContext, enabling Log4j logging for PySpark use.
+by the active SparkContext, enabling Log4j logging for PySpark use,
+a class with the same interface for when the job runs without Spark,
+and a class with the same interface for logging from the executors.
+
+Each of them counts the messages it logs and the time spent logging them,
+so that the overhead of logging can be measured.
 """
 
-class Log4j(object):
+# Format of the messages logged in Python, as in the Log4j console appender
+_FORMAT = '%(asctime)s %(levelname)s %(name)s: %(message)s'
+_DATE_FORMAT = '%y/%m/%d %H:%M:%S'
+
+class _LogStatsParam(AccumulatorParam):
+    """Accumulates the logging stats of the executors."""
+
+    def zero(self, value: Dict[str, float]) -> Dict[str, float]:
+        return {}
+
+    def addInPlace(self,
+                   value1: Dict[str, float],
+                   value2: Dict[str, float]) -> Dict[str, float]:
+        for k, v in value2.items():
+            value1[k] = value1.get(k, 0) + v
+        return value1
+
+def _get_message_prefix(app_name: str, app_id: str) -> str:
+    return '<' + app_name + ' ' + app_id + '>'
+
+class _StatsLog(abc.ABC):
+    """Base class of the loggers, which counts the messages logged, dropped
+    and flushed, and the time spent logging them. Each logger implements
+    `_log` to send a message on.
+
+    Args:
+        message_prefix: Prefix of each message, "<{app name} {app ID}>"
+        level: Lowest level logged, e.g. `logging.INFO`
+    """
+
+    def __init__(self, message_prefix: str, level: int):
+        self.message_prefix = message_prefix
+        self.level = level
+        self.n_messages = 0
+        self.n_dropped = 0
+        self.n_flushes = 0
+        self.seconds = 0.0
+
+    @abc.abstractmethod
+    def _log(self, level: int, message: str) -> None:
+        """Sends a message of an enabled level on, and counts it."""
+
+    def _log_timed(self, level: int, message: str) -> None:
+        if level < self.level:
+            return None
+        time_start = time.perf_counter()
+        self._log(level, message)
+        self.seconds += time.perf_counter() - time_start
+        return None
+
+    def error(self, message: str) -> None:
+        self._log_timed(logging.ERROR, message)
+        return None
+
+    def info(self, message: str) -> None:
+        self._log_timed(logging.INFO, message)
+        return None
+
+    def debug(self, message: str) -> None:
+        self._log_timed(logging.DEBUG, message)
+        return None
+
+    def flush(self) -> None:
+        return None
+
+    def get_stats(self) -> Dict[str, float]:
+        """Returns the number of messages logged, dropped and flushed, and the
+        time spent logging them."""
+        return {
+            constants.LOG_MESSAGES: self.n_messages,
+            constants.LOG_DROPPED: self.n_dropped,
+            constants.LOG_FLUSHES: self.n_flushes,
+            constants.LOG_SECONDS: self.seconds,
+        }
+
+class Log4j(_StatsLog):
     """Wrapper class for Log4j JVM object.
 
+    The messages are buffered, and flushed to Log4j when the buffer is full,
+    when an error is logged, when `flush` is called, or by a timer thread
+    once the oldest message has been buffered for the flush interval, even if
+    nothing else is logged. Each run of messages of the same level in a flush
+    is sent to Log4j in a single call, with one message per line, instead of
+    one call per message.
+
+    `flush` is to be called before the SparkSession is stopped; any message
+    buffered once the SparkContext has been stopped is dropped, and counted,
+    instead of being sent to a JVM that is no longer there.
+
+    The levels enabled are looked up once, so that messages of disabled levels
+    are dropped without any call to the JVM.
+
     Args:
         spark: SparkSession object
+        buffer_size: Maximum number of messages buffered
+        flush_interval: Maximum time a message is buffered, in seconds
     """
 
-    def __init__(self, spark: SparkSession):
+    def __init__(self,
+                 spark: SparkSession,
+                 buffer_size: int = constants.LOG_BUFFER_SIZE,
+                 flush_interval: float = constants.LOG_FLUSH_INTERVAL):
         conf = spark.sparkContext.getConf()
         app_id = conf.get('spark.app.id')
         app_name = conf.get('spark.app.name')
 
+        self.sc = spark.sparkContext
         log4j = spark._jvm.org.apache.log4j
-        message_prefix = '<' + app_name + ' ' + app_id + '>'
+        message_prefix = _get_message_prefix(app_name, app_id)
         self.logger = log4j.LogManager.getLogger(message_prefix)
 
-    def error(self, message: str) -> None:
-        self.logger.error(message)
+        level = logging.DEBUG if self.logger.isDebugEnabled() \
+            else logging.INFO if self.logger.isInfoEnabled() \
+            else logging.ERROR
+        super().__init__(message_prefix, level)
+
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self.buffer: List[Tuple[int, str]] = []
+        self.timer: Optional[threading.Timer] = None
+        # messages may be logged from several threads at once,
+        # and are flushed from the timer thread
+        self.lock = threading.RLock()
+
+    def _log(self, level: int, message: str) -> None:
+        with self.lock:
+            if not self.buffer:
+                self.timer = threading.Timer(self.flush_interval, self.flush)
+                self.timer.daemon = True
+                self.timer.start()
+            self.buffer.append((level, message))
+            self.n_messages += 1
+            if level >= logging.ERROR or len(self.buffer) >= self.buffer_size:
+                self._flush()
         return None
-        
-    def info(self, message: str) -> None:
-        self.logger.info(message)
+
+    def _flush(self) -> None:
+        buffer, self.buffer = self.buffer, []
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        # the JVM has gone once the SparkContext has been stopped
+        if self.sc._jsc is None:
+            self.n_dropped += len(buffer)
+            return None
+        log_fns = {
+            logging.DEBUG: self.logger.debug,
+            logging.INFO: self.logger.info,
+            logging.ERROR: self.logger.error,
+        }
+        for level, messages in groupby(buffer, key=lambda x: x[0]):
+            log_fns[level]('\n'.join(message for _, message in messages))
+            self.n_flushes += 1
         return None
 
-    def debug(self, message: str) -> None:
-        self.logger.debug(message)
+    def flush(self) -> None:
+        """Sends the buffered messages to Log4j."""
+
+        time_start = time.perf_counter()
+        with self.lock:
+            self._flush()
+        self.seconds += time.perf_counter() - time_start
+        return None
+
+class Log(_StatsLog):
+    """Wrapper class for a Python logger, with the same interface and message
+    prefix as `Log4j`, for when the job runs without Spark.
+
+    Args:
+        app_name: Name of the application
+    """
+
+    def __init__(self, app_name: str):
+        # same form as the app ID of a local Spark application
+        app_id = f'local-{int(time.time() * 1000)}'
+
+        message_prefix = _get_message_prefix(app_name, app_id)
+        self.logger = logging.getLogger(message_prefix)
+        if not self.logger.handlers:
+            handler = logging.StreamHandler()
+            handler.setFormatter(logging.Formatter(_FORMAT, _DATE_FORMAT))
+            self.logger.addHandler(handler)
+        self.logger.setLevel(logging.INFO)
+        super().__init__(message_prefix, logging.INFO)
+
+    def _log(self, level: int, message: str) -> None:
+        self.logger.log(level, message)
+        self.n_messages += 1
         return None
-        
\ No newline at end of file
+
+# Queue of the records logged from the executors, which is module-level,
+# so each Python worker process has one queue and one thread that writes the
+# records in it to stderr, where they end up in the executor logs
+_executor_queue: Optional[queue.Queue] = None
+
+def _get_executor_queue(queue_size: int) -> queue.Queue:
+    """Returns the queue of records of this process, and starts the thread
+    that writes them out if it has not been started."""
+
+    global _executor_queue
+    if _executor_queue is None:
+        handler = logging.StreamHandler(sys.stderr)
+        handler.setFormatter(logging.Formatter(_FORMAT, _DATE_FORMAT))
+        _executor_queue = queue.Queue(queue_size)
+        listener = logging.handlers.QueueListener(_executor_queue, handler)
+        listener.start()
+        atexit.register(listener.stop)
+    return _executor_queue
+
+class ExecutorLog(_StatsLog):
+    """Logger with the same interface and message prefix as the driver logger,
+    for logging from the tasks run on the executors.
+
+    It is created on the driver and sent to the executors with the tasks.
+    On the executors, the messages are put in a bounded queue without waiting,
+    and written to stderr by a background thread; messages are dropped, and
+    counted, if the queue is full. The stats of each task are sent back to
+    the driver through an accumulator when `flush` is called at the end of
+    the task.
+
+    Args:
+        log: Driver logger, whose message prefix and level are used
+        sc: SparkContext object
+        queue_size: Maximum number of messages queued in each executor process
+    """
+
+    def __init__(self,
+                 log: Union[Log4j, Log],
+                 sc: SparkContext,
+                 queue_size: int = constants.LOG_QUEUE_SIZE):
+        super().__init__(log.message_prefix, log.level)
+        self.queue_size = queue_size
+        self.stats = sc.accumulator({}, _LogStatsParam())
+
+    def _log(self, level: int, message: str) -> None:
+        record = logging.LogRecord(self.message_prefix, level, '', 0, message, None, None)
+        try:
+            _get_executor_queue(self.queue_size).put_nowait(record)
+            self.n_messages += 1
+        except queue.Full:
+            self.n_dropped += 1
+        return None
+
+    def flush(self) -> None:
+        """Sends the stats of this task to the driver, and resets them."""
+
+        self.n_flushes += 1
+        self.stats.add(super().get_stats())
+        self.n_messages = self.n_dropped = self.n_flushes = 0
+        self.seconds = 0.0
+        return None
+
+    def get_stats(self) -> Dict[str, float]:
+        """Returns the stats added up across the executors, on the driver."""
+        return dict(super().get_stats(), **self.stats.value)
+
+def get_stats_summary(stats: Dict[str, float]) -> str:
+    """Returns a summary of the logging stats of a logger, for logging."""
+    return f'{stats[constants.LOG_MESSAGES]} messages in {stats[constants.LOG_FLUSHES]} flushes, ' \
+        f'{stats[constants.LOG_DROPPED]} dropped, {stats[constants.LOG_SECONDS] * 1000:.1f}ms spent logging'
+
+# Either logger, as both have the same interface
+Logger = Union[Log4j, Log]
@@ -0,0 +1,103 @@
+from pyspark import SparkContext, StorageLevel
+from pyspark.accumulators import AccumulatorParam
+from pyspark.rdd import RDD
+from typing import Dict, Iterable
+
+from . import logging
+
+"""
+This module contains a class that persists the intermediate RDDs shared
+between the phases of the ETL job, and tracks how often each is computed.
+"""
+
+class _CountsParam(AccumulatorParam):
+    """Accumulates counts keyed by name across executors."""
+
+    def zero(self, value: Dict[str, int]) -> Dict[str, int]:
+        return {}
+
+    def addInPlace(self,
+                   value1: Dict[str, int],
+                   value2: Dict[str, int]) -> Dict[str, int]:
+        for k, v in value2.items():
+            value1[k] = value1.get(k, 0) + v
+        return value1
+
+class RDDPersistence(object):
+    """Persistence policy for intermediate RDDs.
+
+    Every RDD registered through `persist` is persisted at the configured
+    storage level, and each computation of its partitions is counted so that
+    any recomputation of its lineage shows up in the logs.
+
+    Args:
+        sc: SparkContext object
+        storage_level: Name of a `StorageLevel`, e.g. "MEMORY_AND_DISK",
+            or "NONE" to only count computations without persisting
+    """
+
+    def __init__(self, sc: SparkContext, storage_level: str):
+        if storage_level == 'NONE':
+            self.storage_level = None
+        else:
+            self.storage_level = getattr(StorageLevel, storage_level)
+        self.compute_counts = sc.accumulator({}, _CountsParam())
+        self.rdds = {}
+
+    def persist(self, name: str, rdd: RDD) -> RDD:
+        """Registers and persists the RDD under the given stage name.
+
+        Args:
+            name: Stage name
+            rdd: RDD to be persisted
+
+        Returns:
+            The persisted RDD, to be used in place of the input RDD.
+        """
+
+        compute_counts = self.compute_counts
+
+        def _count_partition(items: Iterable) -> Iterable:
+            compute_counts.add({name: 1})
+            return items
+
+        rdd = rdd \
+            .mapPartitions(_count_partition, preservesPartitioning=True) \
+            .setName(name)
+        if self.storage_level is not None:
+            rdd.persist(self.storage_level)
+
+        self.rdds[name] = rdd
+        return rdd
+
+    def log_compute_counts(self, log: logging.Log4j) -> None:
+        """Outputs logging messages of the number of times each stage was computed.
+
+        Args:
+            log: Log4j object
+        """
+
+        compute_counts = self.compute_counts.value
+        for name, rdd in self.rdds.items():
+            n_partitions = rdd.getNumPartitions()
+            n_computed = compute_counts.get(name, 0)
+            # e.g. when every row was reused from the manifest
+            if n_partitions == 0:
+                log.info(f'Stage "{name}" has no partitions to compute')
+                continue
+            log.info(f'Stage "{name}" computed {n_computed / n_partitions:g} times '
+                     f'({n_computed} partition computations, {n_partitions} partitions)')
+        return None
+
+    def unpersist_all(self, log: logging.Log4j) -> None:
+        """Logs the compute counts, then unpersists all registered RDDs.
+
+        Args:
+            log: Log4j object
+        """
+
+        self.log_compute_counts(log)
+        for rdd in self.rdds.values():
+            rdd.unpersist()
+        self.rdds = {}
+        return None
@@ -0,0 +1,185 @@
+from contextlib import contextmanager
+from itertools import chain
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+from . import logging
+
+"""
+This module contains a class that records a timing span for each stage of
+the ETL job, with the number of records that go in and out of the stage and
+the bytes of cell values that it moves, and writes them as a run report in
+JSON and in the Prometheus textfile format.
+"""
+
+# Prefix of the Prometheus metric names
+_METRIC_PREFIX = 'vrn_etl'
+
+# Prometheus metrics of each span, with the span attribute and help text
+_SPAN_METRICS = [
+    ('stage_seconds', 'seconds', 'Wall time of the stage of the ETL job.'),
+    ('stage_records_in', 'records_in', 'Number of records that went into the stage.'),
+    ('stage_records_out', 'records_out', 'Number of records that came out of the stage.'),
+    ('stage_bytes', 'bytes', 'Bytes of cell values moved by the stage.'),
+]
+
+def get_size(rows: List[List[Any]]) -> int:
+    """Returns the size of the cell values of the rows, as they are written
+    to or read from a worksheet, in characters, which is their size in bytes
+    for the ASCII values of the worksheets."""
+    return sum(map(len, map(str, chain.from_iterable(rows))))
+
+def _write_atomic(path: str, content: str) -> None:
+    """Writes the file through a temporary file, so that the file is never
+    read partly written."""
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    path_tmp = f'{path}.{os.getpid()}.tmp'
+    with open(path_tmp, 'w') as tmp_file:
+        tmp_file.write(content)
+    os.replace(path_tmp, path)
+    return None
+
+class Span(object):
+    """Timing span of a stage of the ETL job.
+
+    The number of records out and the bytes moved are set by the stage
+    while the span is open.
+
+    Args:
+        name: Stage name, e.g. "extract.read"
+        records_in: Number of records that go into the stage
+        labels: Labels that tell apart the spans of the same stage,
+            e.g. the worksheet uploaded
+    """
+
+    def __init__(self,
+                 name: str,
+                 records_in: Optional[int] = None,
+                 labels: Dict[str, str] = None):
+        self.name = name
+        self.labels = labels or {}
+        self.records_in = records_in
+        self.records_out = None
+        self.bytes = None
+        self.time_start = time.time()
+        self.seconds = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'name': self.name,
+            'labels': self.labels,
+            'start': self.time_start,
+            'seconds': self.seconds,
+            'records_in': self.records_in,
+            'records_out': self.records_out,
+            'bytes': self.bytes,
+        }
+
+class RunReport(object):
+    """Run report of the timing spans of the stages of the ETL job.
+
+    Spans may be recorded from several threads at once, e.g. by concurrent
+    uploads.
+    """
+
+    def __init__(self):
+        self.time_start = time.time()
+        self.spans = []
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def span(self,
+             name: str,
+             records_in: Optional[int] = None,
+             labels: Dict[str, str] = None) -> Iterator[Span]:
+        """Records the wall time of the stage run within the context.
+
+        Args:
+            name: Stage name, e.g. "extract.read"
+            records_in: Number of records that go into the stage
+            labels: Labels that tell apart the spans of the same stage
+
+        Returns:
+            Span of the stage, for the stage to set the number of records
+            out and the bytes moved.
+        """
+
+        span = Span(name, records_in, labels)
+        time_start = time.perf_counter()
+        try:
+            yield span
+        finally:
+            span.seconds = time.perf_counter() - time_start
+            with self.lock:
+                self.spans.append(span)
+
+    def get_seconds(self, name: str) -> float:
+        """Returns the total wall time of the spans of a stage."""
+        return sum(span.seconds for span in self.spans if span.name == name)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'start': self.time_start,
+            'seconds': time.time() - self.time_start,
+            'spans': [span.to_dict() for span in sorted(self.spans, key=lambda x: x.time_start)],
+        }
+
+    def to_prometheus(self) -> str:
+        """Returns the report in the Prometheus textfile format."""
+
+        report = self.to_dict()
+        lines = [
+            f'# HELP {_METRIC_PREFIX}_run_start_timestamp_seconds Start time of the ETL job.',
+            f'# TYPE {_METRIC_PREFIX}_run_start_timestamp_seconds gauge',
+            f'{_METRIC_PREFIX}_run_start_timestamp_seconds {report["start"]}',
+            f'# HELP {_METRIC_PREFIX}_run_seconds Wall time of the ETL job.',
+            f'# TYPE {_METRIC_PREFIX}_run_seconds gauge',
+            f'{_METRIC_PREFIX}_run_seconds {report["seconds"]}',
+        ]
+
+        # spans of the same stage and labels are summed
+        stages = {}
+        for span in report['spans']:
+            labels = ','.join(f'{k}="{v}"'
+                              for k, v in [('stage', span['name']), *sorted(span['labels'].items())])
+            stage = stages.setdefault(labels, {})
+            for _, attr, _ in _SPAN_METRICS:
+                if span[attr] is not None:
+                    stage[attr] = stage.get(attr, 0) + span[attr]
+
+        for metric, attr, help_text in _SPAN_METRICS:
+            lines.append(f'# HELP {_METRIC_PREFIX}_{metric} {help_text}')
+            lines.append(f'# TYPE {_METRIC_PREFIX}_{metric} gauge')
+            lines.extend(f'{_METRIC_PREFIX}_{metric}{{{labels}}} {stage[attr]}'
+                         for labels, stage in stages.items() if attr in stage)
+
+        return '\n'.join(lines) + '\n'
+
+    def save(self,
+             log: logging.Logger,
+             json_path: str,
+             prometheus_path: str) -> None:
+        """Writes the report in JSON and in the Prometheus textfile format.
+
+        Args:
+            log: Logger object
+            json_path: Filepath of the JSON report; empty if disabled
+            prometheus_path: Filepath of the Prometheus textfile, e.g. in
+                the textfile collector directory; empty if disabled
+        """
+
+        if not json_path and not prometheus_path:
+            return None
+
+        if json_path:
+            _write_atomic(json_path, json.dumps(self.to_dict(), indent=2))
+        if prometheus_path:
+            _write_atomic(prometheus_path, self.to_prometheus())
+
+        log.info(f'Run report of {len(self.spans)} spans saved: '
+                 + ', '.join(path for path in [json_path, prometheus_path] if path))
+        return None
@@ -2,7 +2,7 @@ import __main__
 
 from os import environ, listdir, path
 import json
-from pyspark import SparkFiles
+from pyspark import SparkFiles, __version__ as pyspark_version
 from pyspark.sql import SparkSession
 from typing import Tuple
 
@@ -91,6 +91,13 @@ def start_spark(app_name: str,
         for key, val in spark_config.items():
             spark_builder.config(key, val)
 
+    # Spark 2.x reads Arrow data in the IPC format from before pyarrow 0.15,
+    # which pyarrow 0.15 and later only write if this is set, on the driver
+    # and on the executors
+    if pyspark_version.startswith('2.'):
+        environ.setdefault('ARROW_PRE_0_15_IPC_FORMAT', '1')
+        spark_builder.config('spark.executorEnv.ARROW_PRE_0_15_IPC_FORMAT', '1')
+
     # create session and retrieve Spark logger object
     spark_sess = spark_builder.getOrCreate()
     spark_logger = logging.Log4j(spark_sess)
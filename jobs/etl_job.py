@@ -1,42 +1,344 @@
-from . import extract, transform, load
+from pyspark.sql import SparkSession
+from typing import Dict
+
+from . import extract, transform, transform_local, transform_manifest, load
+from helpers import backends, logging, spans
+from helpers.local import start_local
+from helpers.persistence import RDDPersistence
 from helpers.spark import start_spark
+from utils import constants, gsheet
+
+def _log_api_calls(log: logging.Logger, client: gsheet.GSheetClient) -> None:
+    """Outputs a logging message of the Google API calls made in this run.
+
+    Args:
+        log: Logger object
+        client: Google Sheets client
+    """
+
+    api_calls = client.get_api_calls()
+    api_calls_summary = ', '.join(f'{name} ({n})' for name, n in sorted(api_calls.items()))
+    log.info(f'{sum(api_calls.values())} Google API calls made: {api_calls_summary}')
+    return None
+
+def _is_local(config: Dict[str, str], backend: backends.Backend) -> bool:
+    """Checks if the job runs without Spark, i.e. if the local engine is
+    configured, or if the "VRN" worksheet has no more cells than the
+    configured maximum, which the backend checks before it is extracted.
+
+    Args:
+        config: Key-value mappings of config values
+        backend: Backend that the worksheets are extracted from
+
+    Returns:
+        True if the job runs without Spark.
+    """
+
+    # config values used
+    engine = config[constants.CONFIG_TRANSFORM_ENGINE]
+    local_max_cells = int(config[constants.CONFIG_LOCAL_MAX_CELLS])
+    ws_title_vrn = config[constants.CONFIG_GSHEET_WS_VRN]
+
+    if engine == constants.TRANSFORM_ENGINE_LOCAL:
+        return True
+    return not backend.has_more_cells(ws_title_vrn, local_max_cells)
+
+def _run_local(log: logging.Logger,
+               config: Dict[str, str],
+               client: gsheet.GSheetClient,
+               backend: backends.Backend,
+               report: spans.RunReport) -> None:
+    """Runs the Extract, Transform and Load phases in plain Python.
+
+    Only the rows that are not in the manifest of the previous run, or whose
+    car types have new prices, are transformed.
+
+    Args:
+        log: Logger object
+        config: Key-value mappings of config values
+        client: Google Sheets client shared by all sheet operations
+        backend: Backend that the worksheets are extracted from
+        report: Run report that the phases are timed in
+    """
+
+    # config values used
+    manifest_path = config[constants.CONFIG_TRANSFORM_MANIFEST_PATH]
+
+    # Extract phase: get VRN + Prices sheets
+    with report.span(constants.PHASE_EXTRACT) as span:
+        vrn_data, prices_data = extract.run_local(
+            log,
+            config,
+            client,
+            report,
+            backend)
+        span.records_out = len(vrn_data)
+
+    with report.span(constants.PHASE_TRANSFORM, records_in=len(vrn_data)) as span:
+        # reuse the rows transformed in the previous run
+        with report.span('transform.manifest_lookup', records_in=len(vrn_data)) as span_lookup:
+            cached_rows = transform_manifest.lookup(
+                transform_manifest.load(log, manifest_path),
+                vrn_data,
+                prices_data)
+            vrn_data_pending = [row for row, cached_row in zip(vrn_data, cached_rows)
+                                if cached_row is None]
+            # new car types are found across all rows, including the reused ones
+            results_data_cached = [cached_row[1] for cached_row in cached_rows
+                                   if cached_row is not None]
+            span_lookup.records_out = len(vrn_data_pending)
+        log.info(f'{len(vrn_data) - len(vrn_data_pending)} rows reused from the manifest, '
+                 f'{len(vrn_data_pending)} rows to be transformed')
+
+        # Transform phase, in plain Python
+        vrn_data_tfm, results_data, prices_data_tfm = transform_local.run(
+            log,
+            config,
+            vrn_data_pending,
+            prices_data,
+            report,
+            results_data_cached)
+
+        if len(vrn_data_pending) < len(vrn_data):
+            with report.span('transform.manifest_merge', records_in=len(vrn_data_tfm)) as span_merge:
+                vrn_data_tfm, results_data = transform_manifest.merge(
+                    cached_rows,
+                    vrn_data_tfm,
+                    results_data)
+                span_merge.records_out = len(vrn_data_tfm)
+
+        span.records_out = len(vrn_data_tfm)
+
+    # Load phase: save the transformed data back to the backend
+    with report.span(constants.PHASE_LOAD, records_in=len(vrn_data_tfm)):
+        load.run_local(
+            log,
+            config,
+            vrn_data_tfm,
+            results_data,
+            prices_data_tfm,
+            client,
+            report)
+
+    with report.span('manifest.save', records_in=len(vrn_data)):
+        transform_manifest.save(
+            manifest_path,
+            transform_manifest.build(vrn_data, vrn_data_tfm, results_data, prices_data))
+    return None
+
+def _run_spark(spark: SparkSession,
+               log: logging.Log4j,
+               config: Dict[str, str],
+               client: gsheet.GSheetClient,
+               backend: backends.Backend,
+               report: spans.RunReport) -> None:
+    """Runs the Extract, Transform and Load phases on Spark.
+
+    Only the rows that are not in the manifest of the previous run, or whose
+    car types have new prices, are transformed, as in `_run_local`; the
+    manifest is looked up and merged with RDD joins.
+
+    The RDDs are computed lazily, so the transformed rows are computed and
+    persisted at the end of the Transform phase, for it to be timed apart
+    from the Load phase.
+
+    Args:
+        spark: SparkSession object
+        log: Log4j object
+        config: Key-value mappings of config values
+        client: Google Sheets client shared by all sheet operations
+        backend: Backend that the worksheets are extracted from
+        report: Run report that the phases are timed in
+    """
+
+    # config values used
+    manifest_path = config[constants.CONFIG_TRANSFORM_MANIFEST_PATH]
+
+    sc = spark.sparkContext
+    persistence = RDDPersistence(
+        sc,
+        config[constants.CONFIG_TRANSFORM_STORAGE_LEVEL])
+    stats = transform.TransformStats(
+        log,
+        sc,
+        config[constants.CONFIG_TRANSFORM_PROFILE_RULES])
+
+    # Extract phase: get VRN + Prices sheets
+    with report.span(constants.PHASE_EXTRACT):
+        vrn_rdd, prices_rdd = extract.run(
+            sc,
+            log,
+            config,
+            client,
+            backend)
+
+    with report.span(constants.PHASE_TRANSFORM) as span:
+        # reuse the rows transformed in the previous run
+        vrn_rdd_pending, results_rdd_cached = vrn_rdd, None
+        if manifest_path:
+            with report.span('transform.manifest_lookup') as span_lookup:
+                prices_bc = transform_manifest.broadcast_prices(log, config, prices_rdd)
+                rows_rdd = transform_manifest.lookup_rdd(
+                    transform_manifest.load_rdd(log, sc, manifest_path),
+                    vrn_rdd,
+                    prices_rdd,
+                    prices_bc)
+                rows_rdd = persistence.persist('manifest_rows', rows_rdd)
+                n_rows = rows_rdd.count()
+                n_rows_pending = rows_rdd.filter(lambda x: x[1][1] is None).count()
+                span_lookup.records_in = n_rows
+                span_lookup.records_out = n_rows_pending
+            log.info(f'{n_rows - n_rows_pending} rows reused from the manifest, '
+                     f'{n_rows_pending} rows to be transformed')
+
+            vrn_rdd_pending = transform_manifest.get_pending_rdd(rows_rdd)
+            # new car types are found across all rows, including the reused ones
+            results_rdd_cached = transform_manifest.get_cached_results_rdd(rows_rdd)
+
+        # Transform phase:
+        # perform cleaning on car model names
+        # convert each car model to a price
+        # update prices RDD with any new car types
+        if config[constants.CONFIG_TRANSFORM_ENGINE] == constants.TRANSFORM_ENGINE_DATAFRAME:
+            # imported here, as its pandas UDFs need pandas and
+            # pyarrow, which the other engines do not
+            from . import transform_df
+            vrn_rdd_tfm, results_rdd, prices_rdd_tfm = transform_df.run(
+                spark,
+                log,
+                config,
+                vrn_rdd_pending,
+                prices_rdd,
+                persistence,
+                stats,
+                results_rdd_cached)
+        else:
+            vrn_rdd_tfm, results_rdd, prices_rdd_tfm = transform.run(
+                log,
+                config,
+                vrn_rdd_pending,
+                prices_rdd,
+                persistence,
+                stats,
+                results_rdd_cached)
+
+        if manifest_path:
+            with report.span('transform.manifest_merge'):
+                # reshape it in the form of ({VRN row}, {transformed row}, {results row})
+                rows_rdd_tfm = transform_manifest.merge_rdd(rows_rdd, vrn_rdd_tfm, results_rdd)
+                rows_rdd_tfm = persistence.persist('manifest_rows_tfm', rows_rdd_tfm)
+                vrn_rdd_tfm = rows_rdd_tfm.map(lambda x: x[1])
+                results_rdd = rows_rdd_tfm.map(lambda x: x[2])
+                span.records_out = rows_rdd_tfm.count()
+                # the entries are built before the Load phase replaces the
+                # "Prices" worksheet that they may be joined against
+                entries_rdd = transform_manifest.build_rdd(rows_rdd_tfm, prices_rdd, prices_bc)
+                entries_rdd = persistence.persist('manifest_entries', entries_rdd)
+                entries_rdd.count()
+        else:
+            span.records_out = results_rdd.count()
+
+    # Load phase: save the transformed data back to the backend
+    with report.span(constants.PHASE_LOAD, records_in=span.records_out):
+        load.run(
+            log,
+            config,
+            vrn_rdd_tfm,
+            results_rdd,
+            prices_rdd_tfm,
+            client,
+            report)
+
+    if manifest_path:
+        with report.span('manifest.save', records_in=span.records_out):
+            transform_manifest.save_rdd(manifest_path, entries_rdd)
+
+    # the stats are only complete once the outputs have been computed
+    stats.log_stats(log)
+
+    # release the intermediate RDDs persisted in the Transform phase
+    persistence.unpersist_all(log)
+    return None
+
+def run(log: logging.Logger,
+        config: Dict[str, str],
+        client: gsheet.GSheetClient) -> spans.RunReport:
+    """Runs the Extract, Transform and Load phases.
+
+    Whether to start Spark is decided before the worksheets are extracted:
+    if the local engine is configured, or the "VRN" worksheet has no more
+    cells than the configured maximum, all phases run in plain Python
+    without starting Spark at all. Otherwise, all phases run on Spark with
+    the configured engine.
+
+    Each phase, and each stage within it, is timed in a run report, which is
+    saved when the job ends.
+
+    Args:
+        log: Logger object
+        config: Key-value mappings of config values
+        client: Google Sheets client shared by all sheet operations
+
+    Returns:
+        Run report of the phases and their stages.
+    """
+
+    # config values used
+    report_json_path = config[constants.CONFIG_REPORT_JSON_PATH]
+    report_prometheus_path = config[constants.CONFIG_REPORT_PROMETHEUS_PATH]
+
+    report = spans.RunReport()
+
+    # the worksheets are extracted from the backend that checked their size
+    backend = backends.get_backend(log, config, client)
+
+    with report.span('extract.check_size'):
+        is_local = _is_local(config, backend)
+
+    spark = None
+    if is_local:
+        log.info('Running locally')
+        _run_local(log, config, client, backend, report)
+    else:
+        # start Spark application and get session, logger
+        # the config of this run is kept
+        with report.span('spark.start'):
+            spark, log, _ = start_spark(
+                app_name='vrn_analysis',
+                files=['configs/etl_config.json'])
+
+        log.info(f'Running on Spark: more than {config[constants.CONFIG_LOCAL_MAX_CELLS]} cells')
+        _run_spark(spark, log, config, client, backend, report)
+    _log_api_calls(log, client)
+
+    log.info('Phase times: ' + ', '.join(
+        f'{phase} {report.get_seconds(phase):.3f}s'
+        for phase in [constants.PHASE_EXTRACT, constants.PHASE_TRANSFORM, constants.PHASE_LOAD]))
+    report.save(log, report_json_path, report_prometheus_path)
+    log.info(f'Driver logging: {logging.get_stats_summary(log.get_stats())}')
+
+    if spark is not None:
+        # the buffered messages are sent to Log4j while the JVM is up
+        log.flush()
+        spark.stop()
+    return report
 
 def main():
     """Main ETL script definition."""
 
-    # start Spark application and get session, logger, config
-    spark, log, config = start_spark(
+    # get logger and config without starting Spark
+    log, config = start_local(
         app_name='vrn_analysis',
         files=['configs/etl_config.json'])
-    sc = spark.sparkContext
 
     log.info('ETL job running')
 
-    # Extract phase: get VRN + Prices sheets as RDDs
-    vrn_rdd, prices_rdd = extract.run(
-        sc, 
-        log,
-        config)
+    # shared by all sheet operations of this run
+    client = gsheet.GSheetClient(
+        requests_per_minute=int(config[constants.CONFIG_GSHEET_REQUESTS_PER_MINUTE]),
+        api_url=config[constants.CONFIG_GSHEET_API_URL] or None)
 
-    # Transform phase:
-    # perform cleaning on car model names
-    # convert each car model to a price
-    # update prices RDD with any new car types 
-    vrn_rdd_tfm, results_rdd, prices_rdd_tfm = transform.run(
-        log,
-        vrn_rdd,
-        prices_rdd)
-
-    # Load phase: Load the transformed RDDs as CSVs and upload back to GSheets
-    n_cols = len(vrn_rdd.take(1)[0])
-    load.run(
-        log,
-        config,
-        n_cols,
-        vrn_rdd_tfm,
-        results_rdd,
-        prices_rdd_tfm)
+    run(log, config, client)
 
     log.info('ETL job finished')
-    spark.stop()
     return None
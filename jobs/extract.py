@@ -1,27 +1,86 @@
-import gspread
 from pyspark import SparkContext
 from pyspark.rdd import RDD
 from typing import Dict, List, Tuple
 
-from helpers import logging
+from helpers import backends, logging, spans
 from utils import constants, gsheet
 
 """
 Extract phase of the ETL pipeline.
 """
 
+def _clean_prices_row(row: List[str]) -> List[str]:
+    """Removes the whitespace around the price of a car prices row."""
+    return [row[0], row[1], row[2].strip()]
+
+def run_local(log: logging.Logger,
+              config: Dict[str, str],
+              client: gsheet.GSheetClient = None,
+              report: spans.RunReport = None,
+              backend: backends.Backend = None) -> Tuple[List[List[str]], List[List[str]]]:
+    """Runner of Extract phase, without Spark.
+
+    Loads the "VRN" and "Prices" worksheets that contains the car details
+    and car prices.
+
+    The worksheets are read from the backend selected in the config.
+
+    Args:
+        log: Logger object
+        config: Key-value mappings of config values
+        client: Google Sheets client, created if not given and needed
+        report: Run report that the stages are timed in
+        backend: Backend to read from, selected in the config if not given
+
+    Returns:
+        "VRN" worksheet as a list of lists
+        "Prices" worksheet as a list of lists
+    """
+
+    # config values used
+    ws_title_vrn = config[constants.CONFIG_GSHEET_WS_VRN]
+    ws_title_prices = config[constants.CONFIG_GSHEET_WS_PRICES]
+
+    if report is None:
+        report = spans.RunReport()
+    if backend is None:
+        backend = backends.get_backend(log, config, client)
+
+    with report.span('extract.read') as span:
+        vrn_data, prices_data = backend.read([ws_title_vrn, ws_title_prices])
+        span.records_out = len(vrn_data) + len(prices_data)
+        span.bytes = spans.get_size(vrn_data) + spans.get_size(prices_data)
+
+    with report.span('extract.clean_prices', records_in=len(prices_data)) as span:
+        # remove header column
+        prices_data = prices_data[1:]
+        # remove entries where price is empty
+        prices_data = [_clean_prices_row(x) for x in prices_data]
+        prices_data = [x for x in prices_data if x[2] != '0']
+        span.records_out = len(prices_data)
+
+    return vrn_data, prices_data
+
 def run(sc: SparkContext,
-        log: logging.Log4j,
-        config: Dict[str, str]) -> Tuple[RDD, RDD]:
+        log: logging.Logger,
+        config: Dict[str, str],
+        client: gsheet.GSheetClient = None,
+        backend: backends.Backend = None) -> Tuple[RDD, RDD]:
     """Runner of Extract phase.
     
     Loads the "VRN" and "Prices" worksheets that contains the car details
     and car prices.
 
+    The worksheets are read from the backend selected in the config. The
+    local backends read the worksheets into the RDDs in parallel, without
+    going through the driver.
+
     Args:
         sc: SparkContext object
-        log: Log4j object
+        log: Logger object
         config: Key-value mappings of config values
+        client: Google Sheets client, created if not given and needed
+        backend: Backend to read from, selected in the config if not given
 
     Returns:
         "VRN" worksheet as a list of lists in an RDD
@@ -29,21 +88,19 @@ def run(sc: SparkContext,
     """
 
     # config values used
-    spreadsheet_id = config[constants.CONFIG_GSHEET_SPREADSHEET_ID_DEV]
     ws_title_vrn = config[constants.CONFIG_GSHEET_WS_VRN]
     ws_title_prices = config[constants.CONFIG_GSHEET_WS_PRICES]
 
-    vrn_data = gsheet.load_worksheet(spreadsheet_id, ws_title_vrn)
-    vrn_rdd = sc.parallelize(vrn_data)
-    log.info(f'"{ws_title_vrn}" worksheet loaded')
+    if backend is None:
+        backend = backends.get_backend(log, config, client)
+    vrn_rdd, prices_rdd = backend.read_rdds(sc, [ws_title_vrn, ws_title_prices])
 
-    prices_data = gsheet.load_worksheet(spreadsheet_id, ws_title_prices)
     # remove header column
-    prices_data = prices_data[1:]
     # remove entries where price is empty
-    prices_rdd = sc.parallelize(prices_data) \
-        .map(lambda x: [x[0], x[1], x[2].strip()]) \
+    prices_rdd = prices_rdd \
+        .zipWithIndex() \
+        .filter(lambda x: x[1] > 0) \
+        .map(lambda x: _clean_prices_row(x[0])) \
         .filter(lambda x: x[2] != '0')
-    log.info(f'"{ws_title_prices}" worksheet loaded')
 
     return vrn_rdd, prices_rdd
@@ -1,89 +1,224 @@
+from concurrent.futures import ThreadPoolExecutor
 from pyspark.rdd import RDD
-from typing import Dict, Union
+import time
+from typing import Callable, Dict, List, Optional, Tuple, Union
 
-from helpers import logging
-from utils import constants, genhelpers, gsheet
+from helpers import backends, logging, spans
+from utils import constants, gsheet
 
 """
 Load phase of the ETL pipeline.
 """
 
-def _log_load_resp(log: logging.Log4j,
+def _log_load_resp(log: logging.Logger,
                    ws_title: str,
                    resp: Dict[str, Union[str, int]]) -> None:
     """Outputs logging messages based on the response object in the Load phase.
     
     Args:
-        log: Log4j object
+        log: Logger object
         ws_title: Worksheet title
         resp: Load phase response object
     """
 
     load_resp_cols = [constants.UPDATED_RANGE, constants.UPDATED_ROWS]
-    
+    upload_summary = f'{resp[constants.LOAD_LATENCY]:.3f}s, {resp[constants.LOAD_RETRIES]} retries'
+
     if all(k in resp for k in load_resp_cols):
-        log.info(f'{resp[constants.UPDATED_ROWS]} rows updated'
-                 f'in range {resp[constants.UPDATED_RANGE]}')
+        log.info(f'{resp[constants.UPDATED_ROWS]} rows updated '
+                 f'in range {resp[constants.UPDATED_RANGE]}: '
+                 f'{resp[constants.REWRITTEN_CELLS]} cells rewritten, '
+                 f'{resp[constants.SKIPPED_CELLS]} cells skipped ({upload_summary})')
     else:
-        log.error(f'Error in saving to "{ws_title}" worksheet')
+        log.error(f'Error in saving to "{ws_title}" worksheet ({upload_summary}): '
+                  f'{resp.get(constants.LOAD_ERROR)}')
+
+def _save_to_worksheet(config: Dict[str, str],
+                       save: Callable[[], Dict[str, Union[str, int]]]) \
+                       -> Dict[str, Union[str, int, float]]:
+    """Saves to a worksheet, retrying with backoff if the save fails with a
+    retryable error.
+
+    Args:
+        config: Key-value mappings of config values
+        save: Function that saves to the worksheet and returns the response
+
+    Returns:
+        Load phase response object, with the latency and number of retries
+        of the save. If the save failed, the response object only has these
+        and the error.
+    """
+
+    # config values used
+    max_retries = int(config[constants.CONFIG_LOAD_MAX_RETRIES])
+    backoff_base = float(config[constants.CONFIG_LOAD_BACKOFF_BASE])
+    backoff_max = float(config[constants.CONFIG_LOAD_BACKOFF_MAX])
+
+    n_attempts = 0
+
+    def _save() -> Dict[str, Union[str, int]]:
+        nonlocal n_attempts
+        n_attempts += 1
+        return save()
+
+    time_start = time.perf_counter()
+    try:
+        resp = gsheet.call_with_retry(_save, max_retries, backoff_base, backoff_max)
+    except Exception as e:
+        resp = {constants.LOAD_ERROR: e}
+    resp[constants.LOAD_LATENCY] = time.perf_counter() - time_start
+    resp[constants.LOAD_RETRIES] = n_attempts - 1
+    return resp
+
+def _save_to_worksheets(log: logging.Logger,
+                        config: Dict[str, str],
+                        report: spans.RunReport,
+                        saves: List[Tuple[str, Callable[[], Dict[str, Union[str, int]]],
+                                          Optional[List[List[str]]]]]) -> None:
+    """Saves to the worksheets concurrently, then logs the responses. If a
+    save fails, the other saves are completed before the error is raised.
+
+    Each save is timed in its own span of the run report.
+
+    Args:
+        log: Logger object
+        config: Key-value mappings of config values
+        report: Run report that the saves are timed in
+        saves: Worksheet title, save function and data of each worksheet;
+            the data is None if it is in an RDD
+    """
+
+    def _save_timed(ws_title: str,
+                    save: Callable[[], Dict[str, Union[str, int]]],
+                    data: Optional[List[List[str]]]) -> Dict[str, Union[str, int, float]]:
+        n_bytes = spans.get_size(data) if data is not None else None
+        with report.span(
+                'load.upload',
+                records_in=len(data) if data is not None else None,
+                labels={'worksheet': ws_title}) as span:
+            resp = _save_to_worksheet(config, save)
+            span.records_out = resp.get(constants.UPDATED_ROWS)
+            span.bytes = n_bytes
+        return resp
+
+    with ThreadPoolExecutor(max_workers=len(saves)) as executor:
+        futures = [executor.submit(_save_timed, *save) for save in saves]
+        resps = [future.result() for future in futures]
+
+    for (ws_title, _, _), resp in zip(saves, resps):
+        _log_load_resp(log, ws_title, resp)
 
-def run(log: logging.Log4j,
+    errors = [resp[constants.LOAD_ERROR] for resp in resps if constants.LOAD_ERROR in resp]
+    if errors:
+        raise errors[0]
+
+    return None
+
+def run_local(log: logging.Logger,
+              config: Dict[str, str],
+              vrn_data_tfm: List[List[str]],
+              results_data: List[List[str]],
+              prices_data_tfm: List[List[str]],
+              client: gsheet.GSheetClient = None,
+              report: spans.RunReport = None) -> None:
+    """Runner of Load phase, without Spark.
+
+    Saves the transformed data back into the respective worksheets of the
+    backend selected in the config:
+    - vrn_data_tfm - "VRNCleaned" worksheet
+    - results_data - "Results" worksheet
+    - prices_data_tfm - "Prices" worksheet
+
+    In GSheets, only the changed cells are written, unless more of them than
+    the configured ratio have changed.
+
+    The worksheets are saved concurrently, within the request limit of the
+    client. Each save is retried on rate limiting and server errors; if a
+    save still fails, the other saves are completed before the error is
+    raised.
+
+    Args:
+        log: Logger object
+        config: Key-value mappings of config values
+        vrn_data_tfm: Transformed VRN data, as rows
+        results_data: Results data, as rows
+        prices_data_tfm: Transformed car prices data
+        client: Google Sheets client, created if not given and needed
+        report: Run report that the saves are timed in
+    """
+
+    # config values used
+    ws_title_vrn_cleaned = config[constants.CONFIG_GSHEET_WS_VRN_CLEANED]
+    ws_title_results = config[constants.CONFIG_GSHEET_WS_RESULTS]
+    ws_title_prices = config[constants.CONFIG_GSHEET_WS_PRICES]
+
+    if report is None:
+        report = spans.RunReport()
+
+    backend = backends.get_backend(log, config, client)
+
+    # save to "VRNCleaned", "Results" and "Prices" worksheets
+    _save_to_worksheets(log, config, report, [
+        (ws_title_vrn_cleaned,
+         lambda: backend.write(ws_title_vrn_cleaned, vrn_data_tfm, False),
+         vrn_data_tfm),
+        (ws_title_results,
+         lambda: backend.write(ws_title_results, results_data, False),
+         results_data),
+        (ws_title_prices,
+         lambda: backend.write(ws_title_prices, prices_data_tfm, True),
+         prices_data_tfm),
+    ])
+    return None
+
+def run(log: logging.Logger,
         config: Dict[str, str],
-        n_cols: int,
         vrn_rdd_tfm: RDD,
         results_rdd: RDD,
-        prices_rdd_tfm: RDD) -> None:
+        prices_rdd_tfm: RDD,
+        client: gsheet.GSheetClient = None,
+        report: spans.RunReport = None) -> None:
     """Runner of Load phase.
 
-    Loads the transformed RDDs back into the respective worksheets in GSheets:
+    Loads the transformed RDDs back into the respective worksheets of the
+    backend selected in the config, as in `run_local`:
     - vrn_rdd_tfm - "VRNCleaned" worksheet
     - results_rdd - "Results" worksheet
     - prices_rdd_tfm - "Prices" worksheet
 
+    The local backends write the RDDs as partitioned output, without
+    collecting them to the driver.
+
     Args:
-        log: Log4j object
+        log: Logger object
         config: Key-value mappings of config values
-        n_cols: Number of columns in original VRN worksheet
-        vrn_rdd_tfm: Transformed VRN RDD
-        results_rdd: Results RDD
+        vrn_rdd_tfm: Transformed VRN RDD, as rows
+        results_rdd: Results RDD, as rows
         prices_rdd_tfm: Transformed car prices RDD
+        client: Google Sheets client, created if not given and needed
+        report: Run report that the saves are timed in
     """
 
     # config values used
-    spreadsheet_id = config[constants.CONFIG_GSHEET_SPREADSHEET_ID_DEV]
     ws_title_vrn_cleaned = config[constants.CONFIG_GSHEET_WS_VRN_CLEANED]
     ws_title_results = config[constants.CONFIG_GSHEET_WS_RESULTS]
     ws_title_prices = config[constants.CONFIG_GSHEET_WS_PRICES]
 
-    # load VRN RDD and save to "VRNCleaned" worksheet
-    vrn_data_tfm_flattened = vrn_rdd_tfm.collect()
-    # Split this list into chunks, where each chunk is the number of elements per row
-    vrn_data_tfm = list(genhelpers._chunks(vrn_data_tfm_flattened, n_cols))
-    vrn_resp = gsheet.save_to_worksheet(
-        spreadsheet_id,
-        ws_title_vrn_cleaned,
-        vrn_data_tfm,
-        False)
-    _log_load_resp(log, ws_title_results, vrn_resp)
-
-    # load results RDD and save to "Results" worksheet
-    results_data_flattened = results_rdd.collect()
-    # Split this list into chunks, where each chunk is the number of elements per row
-    results_data = list(genhelpers._chunks(results_data_flattened, n_cols))
-    results_resp = gsheet.save_to_worksheet(
-        spreadsheet_id,
-        ws_title_results,
-        results_data,
-        False)
-    _log_load_resp(log, ws_title_results, results_resp)
-
-    # load prices RDD and save to "Prices" worksheet
-    prices_data_tfm = prices_rdd_tfm.collect()
-    prices_resp = gsheet.save_to_worksheet(
-        spreadsheet_id,
-        ws_title_prices,
-        prices_data_tfm,
-        True)
-    _log_load_resp(log, ws_title_prices, prices_resp)
+    if report is None:
+        report = spans.RunReport()
+
+    backend = backends.get_backend(log, config, client)
 
+    # save to "VRNCleaned", "Results" and "Prices" worksheets
+    _save_to_worksheets(log, config, report, [
+        (ws_title_vrn_cleaned,
+         lambda: backend.write_rdd(ws_title_vrn_cleaned, vrn_rdd_tfm, False),
+         None),
+        (ws_title_results,
+         lambda: backend.write_rdd(ws_title_results, results_rdd, False),
+         None),
+        (ws_title_prices,
+         lambda: backend.write_rdd(ws_title_prices, prices_rdd_tfm, True),
+         None),
+    ])
     return None
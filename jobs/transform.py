@@ -1,16 +1,164 @@
+from pyspark import SparkContext
+from pyspark.accumulators import AccumulatorParam
 from pyspark.rdd import RDD
+from pyspark.serializers import CloudPickleSerializer
 import re
-from typing import Dict, Generator, List, Union, Tuple
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Union, Tuple
 
-from .transform_scripts import cleaners, general
+from .transform_scripts import cleaners, memo, profiler, resolver
 from helpers import logging
+from helpers.persistence import RDDPersistence
 from utils import constants
 
 """
 Transform phase of the ETL pipeline.
 """
 
-def _get_prices_dict(prices_rdd: RDD) -> Dict[str, str]:
+# A car price, parsed to a number where possible
+Price = Union[int, float, str]
+
+# A price in the "Prices" worksheet, once its commas are removed
+_PRICE_PATTERN = re.compile(r'[0-9]+(\.[0-9]+)?')
+
+class _StatsParam(AccumulatorParam):
+    """Accumulates stats keyed by name, e.g. the stats of the memoizing caches,
+    across executors."""
+
+    def zero(self, value: Dict[str, Dict[str, int]]) -> Dict[str, Dict[str, int]]:
+        return {}
+
+    def addInPlace(self,
+                   value1: Dict[str, Dict[str, int]],
+                   value2: Dict[str, Dict[str, int]]) -> Dict[str, Dict[str, int]]:
+        for name, cache_stats in value2.items():
+            value1_cache_stats = value1.setdefault(name, {})
+            for k, v in cache_stats.items():
+                value1_cache_stats[k] = value1_cache_stats.get(k, 0) + v
+        return value1
+
+def _log_cache_stats(log: logging.Log4j,
+                     stats: Dict[str, Dict[str, int]]) -> None:
+    """Outputs logging messages of the hits, misses and evictions of each
+    memoizing cache.
+
+    Args:
+        log: Log4j object
+        stats: Cache stats, keyed by cache name
+    """
+
+    for name, cache_stats in sorted(stats.items()):
+        hits = cache_stats[constants.CACHE_HITS]
+        misses = cache_stats[constants.CACHE_MISSES]
+        hit_rate = hits / (hits + misses) if hits + misses else 0
+        log.info(f'Cache "{name}": {hits} hits, {misses} misses, '
+                 f'{cache_stats[constants.CACHE_EVICTIONS]} evictions '
+                 f'({hit_rate:.1%} hit rate)')
+    return None
+
+def _log_rule_profile(log: logging.Log4j, stats: profiler.RuleStats) -> None:
+    """Outputs logging messages of the profile of the cleaning rules: the time
+    spent on each car make, the hottest rules, and the dead rules, which were
+    applied but never changed a model name.
+
+    Args:
+        log: Log4j object
+        stats: Rule stats, keyed by (make, rule index)
+    """
+
+    def _get_rule_summary(make: str, rule_idx: int) -> str:
+        rule_stats = stats[make, rule_idx]
+        n_calls = rule_stats[constants.PROFILE_CALLS]
+        n_matches = rule_stats[constants.PROFILE_MATCHES]
+        pattern, replacement = cleaners.MAKE_TO_RULES_MAPPING[make][rule_idx]
+        seconds = rule_stats[constants.PROFILE_SECONDS]
+        return f'{make} #{rule_idx} {pattern!r} -> {replacement!r}: ' \
+            f'{seconds:.3f}s ({seconds / n_calls * 1e6:.1f}us per call), ' \
+            f'{n_calls} calls, {n_matches} matches, {n_calls - n_matches} no-ops'
+
+    make_stats = {}
+    for (make, _), rule_stats in stats.items():
+        make_stats[make] = make_stats.get(make, 0) + rule_stats[constants.PROFILE_SECONDS]
+    log.info(f'Cleaning rules of {len(make_stats)} makes profiled: ' + ', '.join(
+        f'{make} {seconds:.3f}s'
+        for make, seconds in sorted(make_stats.items(), key=lambda x: -x[1])))
+
+    rules_hottest = sorted(stats, key=lambda x: -stats[x][constants.PROFILE_SECONDS])
+    for make, rule_idx in rules_hottest[:constants.PROFILE_HOTTEST_LOG_MAX]:
+        log.info(f'Hot cleaning rule {_get_rule_summary(make, rule_idx)}')
+
+    rules_dead = sorted(x for x in stats if stats[x][constants.PROFILE_MATCHES] == 0)
+    for make, rule_idx in rules_dead:
+        log.info(f'Dead cleaning rule {_get_rule_summary(make, rule_idx)}')
+    n_rules = sum(len(rules) for rules in cleaners.MAKE_TO_RULES_MAPPING.values())
+    log.info(f'{len(rules_dead)} of {len(stats)} cleaning rules applied never matched, '
+             f'{n_rules - len(stats)} cleaning rules were not applied')
+    return None
+
+class TransformStats(object):
+    """Stats sent back from the executors in the Transform phase: the hits,
+    misses and evictions of the memoizing caches, the stats of the cleaning
+    rules if they are profiled, and the stats of the executor logger.
+
+    The stats are added up as the outputs of the Transform phase are computed,
+    which is only once the caller has run the actions that compute them, e.g.
+    in the Load phase. So they are logged by the caller with `log_stats`
+    after that, and not by the Transform phase itself.
+
+    Args:
+        log: Driver logger, whose message prefix and level are used by the
+            executor logger
+        sc: SparkContext object
+        profile_rules: Whether the cleaning rules are profiled
+    """
+
+    def __init__(self,
+                 log: logging.Log4j,
+                 sc: SparkContext,
+                 profile_rules: bool):
+        self.cache_stats = sc.accumulator({}, _StatsParam())
+        self.rule_stats = sc.accumulator({}, _StatsParam())
+        self.executor_log = logging.ExecutorLog(log, sc)
+        self.profile_rules = profile_rules
+
+    def log_stats(self, log: logging.Log4j) -> None:
+        """Outputs logging messages of the stats sent back so far.
+
+        Args:
+            log: Log4j object
+        """
+
+        _log_cache_stats(log, self.cache_stats.value)
+        log.info(f'Executor logging: {logging.get_stats_summary(self.executor_log.get_stats())}')
+        if self.profile_rules:
+            _log_rule_profile(log, self.rule_stats.value)
+        return None
+
+def _get_serialized_size(obj: Any) -> int:
+    """Returns the size in bytes of the object when pickled for a task."""
+    return len(CloudPickleSerializer().dumps(obj))
+
+def _parse_price(price: str) -> Price:
+    """Parses a price string from the "Prices" worksheet to a number,
+    e.g. "588,800" to 588800, or "12,345.50" to 12345.5.
+
+    Only digits, with an optional decimal part, are parsed after the commas
+    and surrounding whitespace are removed, so strings such as "nan", "inf"
+    or "1e3" are not taken as prices. Prices that are not numeric are
+    returned without the commas.
+
+    The parsed prices are written to the "Results" worksheet as they are,
+    so its price cells are numbers rather than the text of the "Prices"
+    worksheet.
+    """
+
+    price = price.replace(',', '')
+    match = _PRICE_PATTERN.fullmatch(price.strip())
+    if match is None:
+        return price
+    return float(match.group()) if match.group(1) else int(match.group())
+
+def _get_prices_dict(prices_rdd: RDD) -> Dict[str, Price]:
     """Performs transformation on the prices RDD to return a dict
     of car model to price.
 
@@ -20,44 +168,194 @@ def _get_prices_dict(prices_rdd: RDD) -> Dict[str, str]:
 
     Each list is transformed to a key-value pair of the structure
         {make} / {model}: {price},
-        e.g. "B.M.W. / M5 30 JAHRE EDITION: 588,800"
+        e.g. "B.M.W. / M5 30 JAHRE EDITION: 588800"
 
     Args:
         prices_rdd: RDD of car prices
 
     Returns:
-        A dict of key-value mappings from car model to car price.
+        A dict of key-value mappings from car model to parsed car price.
     """
 
-    prices_dict = prices_rdd \
-        .map(lambda x: (f'{x[0]} / {x[1]}', x[2])) \
-        .collectAsMap()
+    prices_dict = _get_prices_pair_rdd(prices_rdd).collectAsMap()
     return prices_dict
 
-def _car_type_to_price(prices: Dict[str, str],
-                       s: str) -> Union[str, float]:
-    """Maps the car type to the corresponding price.
-    
+def _get_prices_pair_rdd(prices_rdd: RDD) -> RDD:
+    """Performs transformation on the prices RDD to return a pair RDD
+    of car model to parsed car price, in the same structure as the entries
+    of `_get_prices_dict`.
+
+    Args:
+        prices_rdd: RDD of car prices
+
+    Returns:
+        Pair RDD of car model to parsed car price.
+    """
+
+    return prices_rdd.map(lambda x: (f'{x[0]} / {x[1]}', _parse_price(x[2])))
+
+def _get_last_prices_pair_rdd(prices_rdd: RDD) -> RDD:
+    """Performs transformation on the prices RDD to return a pair RDD of car
+    model to parsed car price, keeping the last price of each car type as in
+    `_get_prices_dict`.
+
+    Args:
+        prices_rdd: RDD of car prices
+
+    Returns:
+        Pair RDD of car model to parsed car price, with 1 entry per car model.
+    """
+
+    return _get_prices_pair_rdd(prices_rdd) \
+        .zipWithIndex() \
+        .map(lambda x: (x[0][0], (x[1], x[0][1]))) \
+        .reduceByKey(max) \
+        .mapValues(lambda x: x[1])
+
+def _car_type_with_price(s: str,
+                         price: Optional[Price]) -> Union[str, Price]:
+    """Maps the car type to its looked-up price.
+
     If the input string is not a car type,
         - Return the string as it is
     If the input string is a car type,
-        - Return the price in float, if it exists
+        - Return the price, if it exists
         - Else, return the input string, with an additional prefix to indicate that the price is missing
     """
 
     # First, check if the input string is of a car type structure
     # If not, simply return the string
-    if not general.is_car_type(s):
+    if not memo.is_car_type(s):
         return s
 
-    if s in prices:
-        return re.sub(',', '', prices[s])
+    if price is not None:
+        return price
     else:
         return f'{constants.ERROR_MISSING_PRICE}{s}'
 
+def _car_type_to_price(prices: Dict[str, Price],
+                       s: str) -> Union[str, Price]:
+    """Maps the car type to the corresponding price in the prices dict."""
+    return _car_type_with_price(s, prices.get(s))
+
+def _join_car_type_prices(log: logging.Log4j,
+                          cells_rdd: RDD,
+                          prices_rdd: RDD) -> RDD:
+    """Maps the car type of each cell to its price with a shuffle join against
+    the prices RDD, for when the prices are too many to be broadcast.
+
+    Args:
+        log: Log4j object
+        cells_rdd: Pair RDD of key to cleaned cell value
+        prices_rdd: Car prices RDD
+
+    Returns:
+        Pair RDD of key to (cleaned cell value, price mapping).
+    """
+
+    prices_pair_rdd = _get_last_prices_pair_rdd(prices_rdd)
+
+    join_fn = lambda x: (x[1][0], (x[0], _car_type_with_price(x[0], x[1][1])))
+    log.info(f'Prices looked up by shuffle join: '
+             f'{_get_serialized_size(join_fn)} bytes serialized per task')
+
+    # reshape it in the form of ({cleaned cell}, {key}) for the join
+    return cells_rdd \
+        .map(lambda x: (x[1], x[0])) \
+        .leftOuterJoin(prices_pair_rdd) \
+        .map(join_fn)
+
+def _rows_to_cells(rows_rdd: RDD) -> RDD:
+    """Splits an RDD of rows into a pair RDD of cells, where each cell is keyed
+    by its (row, column) position in the worksheet.
+
+    Args:
+        rows_rdd: RDD of rows, in worksheet order
+
+    Returns:
+        Pair RDD of ({row idx}, {col idx}) to cell value.
+    """
+
+    return rows_rdd \
+        .zipWithIndex() \
+        .flatMap(lambda x: (((x[1], col_idx), cell) for col_idx, cell in enumerate(x[0])))
+
+def _cells_to_rows(cells_rdd: RDD, rows_rdd: RDD) -> RDD:
+    """Regroups a pair RDD of cells keyed by their (row, column) position,
+    as returned by `_rows_to_cells`, into rows in worksheet order.
+
+    The cells are grouped with the index of each row of the RDD they were
+    split from, so that the rows without any cells are kept as empty rows.
+
+    Args:
+        cells_rdd: Pair RDD of ({row idx}, {col idx}) to cell value
+        rows_rdd: RDD of rows that the cells were split from
+
+    Returns:
+        RDD of rows, in worksheet order.
+    """
+
+    # reshape it in the form of ({row idx}, None)
+    row_idx_rdd = rows_rdd \
+        .zipWithIndex() \
+        .map(lambda x: (x[1], None))
+
+    return row_idx_rdd \
+        .cogroup(cells_rdd.map(lambda x: (x[0][0], (x[0][1], x[1])))) \
+        .sortByKey() \
+        .map(lambda x: [cell for _, cell in sorted(x[1][1])])
+
+def _new_car_type_order(car_type_count: Tuple[str, int]) -> Tuple[int, str]:
+    """Sort key of a new car type and its count, most frequent first."""
+    return -car_type_count[1], car_type_count[0]
+
+def _log_new_car_types(log: logging.Logger,
+                       n_car_types_new: int,
+                       car_types_new_top: List[Tuple[str, int]]) -> None:
+    """Outputs a logging message of the number of new car types found and
+    the most frequent ones.
+
+    Args:
+        log: Logger object
+        n_car_types_new: Number of new car types
+        car_types_new_top: Most frequent new car types with their counts,
+            in the order of `_new_car_type_order`
+    """
+
+    car_types_new_summary = ', '.join(f'{x[0]} ({x[1]})' for x in car_types_new_top)
+    n_car_types_new_omitted = n_car_types_new - len(car_types_new_top)
+    if n_car_types_new_omitted > 0:
+        car_types_new_summary += f' and {n_car_types_new_omitted} more'
+    log.info(f'{n_car_types_new} new car types found: {car_types_new_summary}')
+    return None
+
+def _get_make(car_type: str) -> str:
+    """Returns the make of a car type, in the form of '{make} / {model}'."""
+    return car_type.split(' / ')[0]
+
+def _resolve_make(car_types_new: Iterable[str],
+                  prices: Iterable[Tuple[str, Price]]) -> Iterator[Tuple[str, str]]:
+    """Finds the price candidates of the new car types of a make, by indexing
+    the priced car types of the make.
+
+    Args:
+        car_types_new: New car types of the make
+        prices: Car types of the make, with their prices
+
+    Returns:
+        Iterator of (new car type, formatted price candidates).
+    """
+
+    car_types_new = list(car_types_new)
+    if not car_types_new:
+        return iter([])
+
+    index = resolver.MakeIndex(prices)
+    return ((x, resolver.format_candidates(index.resolve(x))) for x in car_types_new)
+
 def _add_new_car_types(log: logging.Log4j,
                        results_rdd: RDD,
-                       prices_rdd: RDD) -> List[List[str]]:
+                       prices_rdd: RDD) -> RDD:
     """Adds any new car types found to the overall prices dict.
 
     Car types with a missing price indicate that these are new car models that
@@ -65,66 +363,207 @@ def _add_new_car_types(log: logging.Log4j,
 
     These new car types will be added to the prices dict for subsequent manual
     intervention to find the corresponding price for these new car types.
+    Each new car type is added once, and the most frequent ones are logged
+    first so that they can be priced first; this ranking is only used in the
+    log, as the prices RDD stays sorted by make, then model name, as the
+    "Prices" worksheet is. Each is added with the most
+    similar priced car types of the same make, and their prices, as
+    candidates for its price, which are found by grouping the prices by make
+    and indexing the prices of each make.
 
     Args:
         log: Log4j object
-        results_rdd: Results RDD
+        results_rdd: Results RDD, as rows
         prices_rdd: Car prices RDD
     
     Returns:
         Transformed car prices RDD
     """
 
-    # create a RDD of new car types
-    # reshape it in the form of [{make}, {model}, "0"]
-    prices_new_rdd = results_rdd \
-        .filter(lambda x: constants.ERROR_MISSING_PRICE in x) \
-        .map(lambda x: x.replace(constants.ERROR_MISSING_PRICE, '')) \
-        .map(lambda x: [*x.split(' / '), '0'])
+    # create a RDD of new car types with their number of occurrences
+    # reshape it in the form of ({make} / {model}, {count})
+    car_types_new_rdd = results_rdd \
+        .flatMap(lambda x: x) \
+        .filter(lambda x: isinstance(x, str) and constants.ERROR_MISSING_PRICE in x) \
+        .map(lambda x: (x.replace(constants.ERROR_MISSING_PRICE, ''), 1)) \
+        .reduceByKey(lambda x, y: x + y)
+
+    # log the most frequent new car types only
+    _log_new_car_types(
+        log,
+        car_types_new_rdd.count(),
+        car_types_new_rdd.takeOrdered(
+            constants.NEW_CAR_TYPES_LOG_MAX,
+            key=_new_car_type_order))
 
-    car_types_new = [f'{x[0]} / {x[1]}' for x in prices_new_rdd.collect()]
-    log.info(f'New car types found: {car_types_new}')
+    # find the price candidates of the new car types of each make
+    # reshape it in the form of [{make}, {model}, "0", {candidates}]
+    prices_by_make_rdd = _get_last_prices_pair_rdd(prices_rdd) \
+        .keyBy(lambda x: _get_make(x[0]))
+    prices_new_rdd = car_types_new_rdd \
+        .map(lambda x: (_get_make(x[0]), x[0])) \
+        .cogroup(prices_by_make_rdd) \
+        .flatMap(lambda x: _resolve_make(x[1][0], x[1][1])) \
+        .map(lambda x: [*x[0].split(' / '), '0', x[1]])
 
     # join the 2 prices RDDs together
     # sort by make, then model name
     prices_rdd_tfm = prices_rdd \
         .union(prices_new_rdd) \
-        .sortBy(lambda x: x[1]) \
-        .sortBy(lambda x: x[0])
+        .sortBy(lambda x: (x[0], x[1]))
 
     return prices_rdd_tfm
 
 def run(log: logging.Log4j,
+        config: Dict[str, str],
         vrn_rdd: RDD,
-        prices_rdd: RDD) -> Tuple[RDD, RDD, RDD]:
+        prices_rdd: RDD,
+        persistence: RDDPersistence = None,
+        stats: TransformStats = None,
+        results_rdd_cached: RDD = None) -> Tuple[RDD, RDD, RDD]:
     """Runner of Transform phase.
 
+    The cleaning functions and car type checks are memoized by caches that are
+    held by each executor, as the same car types recur across many cells.
+
+    The rows of the VRN RDD are kept throughout, so that each row is cleaned
+    and priced in place. If dedup is enabled in the config, only the distinct
+    cell values are cleaned and priced, and the results are joined back to each
+    cell by its (row, column) position.
+
+    The stats of the caches, and of each cleaning rule if rule profiling is
+    enabled in the config, are sent back from the executors through the
+    stats object; the caller should log them once the outputs have been
+    computed, as they are only complete then.
+
+    The prices are broadcast to the executors, unless there are more of them
+    than the configured maximum, in which case they are joined to the cells.
+
+    The intermediate RDDs that are used by more than one action are persisted
+    through the persistence policy; the caller should unpersist them once the
+    Load phase has finished.
+
     Args:
         log: Log4j object
-        vrn_rdd: VRN RDD
+        config: Key-value mappings of config values
+        vrn_rdd: VRN RDD, as rows
         prices_rdd: Car prices RDD
+        persistence: Persistence policy, created from the config if not given
+        stats: Stats sent back from the executors, created if not given
+        results_rdd_cached: Results RDD of the rows reused from the manifest,
+            whose new car types are added to the prices together with those
+            of the transformed rows
 
     Returns:
-        Transformed VRN RDD
-        Results RDD
+        Transformed VRN RDD, as rows
+        Results RDD, as rows
         Transformed car prices RDD
     """
 
-    # get car prices as a dict
-    prices_dict = _get_prices_dict(prices_rdd)
+    # config values used
+    cache_size = int(config[constants.CONFIG_TRANSFORM_CACHE_SIZE])
+    cache_eviction = config[constants.CONFIG_TRANSFORM_CACHE_EVICTION]
+    dedup = config[constants.CONFIG_TRANSFORM_DEDUP]
+    prices_broadcast_max_size = int(config[constants.CONFIG_TRANSFORM_PRICES_BROADCAST_MAX_SIZE])
+    profile_rules = config[constants.CONFIG_TRANSFORM_PROFILE_RULES]
 
-    # Basic cleaning of raw data
-    # Cleans the car model name
-    vrn_rdd_tfm = vrn_rdd \
-        .flatMap(lambda x: x) \
-        .map(lambda x: cleaners.clean_raw_data(x)) \
-        .map(lambda x: cleaners.clean_model_name(x))
+    sc = vrn_rdd.context
+    if persistence is None:
+        persistence = RDDPersistence(sc, config[constants.CONFIG_TRANSFORM_STORAGE_LEVEL])
+
+    if stats is None:
+        stats = TransformStats(log, sc, profile_rules)
+
+    # Cache, rule and logging stats are sent back from the executors at the
+    # end of each partition; as the rows are processed lazily, this also
+    # covers the downstream lookups
+    cache_stats = stats.cache_stats
+    rule_stats = stats.rule_stats
+    executor_log = stats.executor_log
+
+    def _with_cache_stats(fn: Callable[[Any], Any]) -> Callable[[Iterable[Any]], Iterator[Any]]:
+        # applies fn to each element of a partition, tracking the cache
+        # and rule stats
+        def _partition(items: Iterable[Any]) -> Iterator[Any]:
+            memo.configure(cache_size, cache_eviction)
+            profiler.configure(profile_rules)
+            stats_start = memo.get_stats()
+            rule_stats_start = profiler.get_stats()
+            time_start = time.perf_counter()
+            n_items = 0
+            for item in items:
+                yield fn(item)
+                n_items += 1
+            executor_log.debug(f'Partition cleaned: {n_items} items in '
+                               f'{time.perf_counter() - time_start:.3f}s')
+            cache_stats.add(memo.diff_stats(memo.get_stats(), stats_start))
+            rule_stats.add(profiler.diff_stats(profiler.get_stats(), rule_stats_start))
+            executor_log.flush()
+        return _partition
+
+    clean_fn = lambda x: memo.clean_model_name(memo.clean_raw_data(x))
+
+    # Small price tables are parsed once and broadcast to the executors,
+    # while larger ones are joined against the cells instead
+    n_prices = prices_rdd.count()
+    use_broadcast = n_prices <= prices_broadcast_max_size
+    if use_broadcast:
+        prices_bc = sc.broadcast(_get_prices_dict(prices_rdd))
+        price_fn = lambda x: _car_type_to_price(prices_bc.value, x)
+        log.info(f'Prices looked up by broadcast: {n_prices} prices, '
+                 f'{_get_serialized_size(prices_bc.value)} bytes broadcast, '
+                 f'{_get_serialized_size(price_fn)} bytes serialized per task')
+
+    def _price_cells(cells_rdd: RDD) -> RDD:
+        # maps a pair RDD of {key}: {cleaned cell}
+        # to {key}: ({cleaned cell}, {price})
+        if use_broadcast:
+            return cells_rdd.mapValues(lambda x: (x, price_fn(x)))
+        return _join_car_type_prices(log, cells_rdd, prices_rdd)
+
+    if not dedup:
+        # Basic cleaning of raw data
+        # Cleans the car model name
+        # Each row is cleaned in place
+        vrn_rdd_tfm = vrn_rdd \
+            .mapPartitions(_with_cache_stats(lambda row: [clean_fn(x) for x in row]))
+        vrn_rdd_tfm = persistence.persist('vrn_tfm', vrn_rdd_tfm)
+
+        # Finds the price mapping for each car type
+        if use_broadcast:
+            results_rdd = vrn_rdd_tfm.map(lambda row: [price_fn(x) for x in row])
+        else:
+            results_cells_rdd = _price_cells(_rows_to_cells(vrn_rdd_tfm)) \
+                .mapValues(lambda x: x[1])
+            results_rdd = _cells_to_rows(results_cells_rdd, vrn_rdd_tfm)
+    else:
+        cells_rdd = _rows_to_cells(vrn_rdd)
+
+        # Cleans and prices each distinct cell value only once
+        # reshape it in the form of ({raw cell}, ({cleaned cell}, {price}))
+        canonical_rdd = _price_cells(cells_rdd
+                                     .values()
+                                     .distinct()
+                                     .mapPartitions(_with_cache_stats(lambda x: (x, clean_fn(x)))))
+
+        # join the canonical values back to the position of each cell
+        cells_tfm_rdd = cells_rdd \
+            .map(lambda x: (x[1], x[0])) \
+            .join(canonical_rdd) \
+            .map(lambda x: x[1])
+        cells_tfm_rdd = persistence.persist('cells_tfm', cells_tfm_rdd)
+
+        vrn_rdd_tfm = _cells_to_rows(cells_tfm_rdd.mapValues(lambda x: x[0]), vrn_rdd)
+        vrn_rdd_tfm = persistence.persist('vrn_tfm', vrn_rdd_tfm)
+        results_rdd = _cells_to_rows(cells_tfm_rdd.mapValues(lambda x: x[1]), vrn_rdd)
 
-    # Finds the price mapping for each car type
-    results_rdd = vrn_rdd_tfm \
-        .map(lambda x: _car_type_to_price(prices_dict, x))
+    # used in this phase, and collected again in the Load phase
+    results_rdd = persistence.persist('results', results_rdd)
 
     # Add any new car types to the prices RDD
-    prices_rdd_tfm = _add_new_car_types(log, results_rdd, prices_rdd)
+    prices_rdd_tfm = _add_new_car_types(
+        log,
+        results_rdd if results_rdd_cached is None else results_rdd.union(results_rdd_cached),
+        prices_rdd)
 
     return vrn_rdd_tfm, results_rdd, prices_rdd_tfm
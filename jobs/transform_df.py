@@ -0,0 +1,235 @@
+import pandas as pd
+from pyspark.accumulators import Accumulator
+from pyspark.rdd import RDD
+from pyspark.sql import Column, DataFrame, Row, SparkSession, Window
+from pyspark.sql import functions as F
+from pyspark.sql.functions import PandasUDFType, pandas_udf
+from pyspark.sql.types import BooleanType, LongType, StringType, StructField, StructType
+from typing import Callable, Dict, List, Tuple
+
+from . import transform
+from .transform_scripts import cleaners, general, profiler
+from helpers import logging
+from helpers.persistence import RDDPersistence
+from utils import constants
+
+"""
+Transform phase of the ETL pipeline, executed on DataFrames.
+
+This is an alternative engine to `transform.run` that produces the same
+outputs. The cells are cleaned by Arrow-backed pandas UDFs, which transfer
+the cells between the JVM and the Python workers in batches, and are priced
+with a DataFrame join. The cells are then regrouped into rows in the JVM, so
+that only the prices are parsed in Python, once per row.
+"""
+
+_CELLS_SCHEMA = StructType([
+    StructField('row_idx', LongType(), False),
+    StructField('col_idx', LongType(), False),
+    StructField('cell', StringType(), False),
+])
+
+_ROWS_SCHEMA = StructType([
+    StructField('row_idx', LongType(), False),
+])
+
+_PRICES_SCHEMA = StructType([
+    StructField('price_idx', LongType(), False),
+    StructField('car_type', StringType(), False),
+    StructField('price', StringType(), False),
+])
+
+@pandas_udf(StringType(), PandasUDFType.SCALAR)
+def _clean_cells(cells: pd.Series) -> pd.Series:
+    """Performs the basic cleaning and model name cleaning on a batch of cells."""
+    return cleaners.clean_model_names(cells.map(cleaners.clean_raw_data))
+
+def _get_clean_cells_profiled(rule_stats: Accumulator) -> Callable[[str], Column]:
+    """Returns a version of `_clean_cells` that profiles the cleaning rules,
+    and adds the rule stats of each batch to the accumulator."""
+
+    @pandas_udf(StringType(), PandasUDFType.SCALAR)
+    def _clean_cells_profiled(cells: pd.Series) -> pd.Series:
+        profiler.configure(True)
+        rule_stats_start = profiler.get_stats()
+        cells_tfm = cleaners.clean_model_names(cells.map(cleaners.clean_raw_data))
+        rule_stats.add(profiler.diff_stats(profiler.get_stats(), rule_stats_start))
+        return cells_tfm
+
+    return _clean_cells_profiled
+
+@pandas_udf(BooleanType(), PandasUDFType.SCALAR)
+def _is_car_type(cells: pd.Series) -> pd.Series:
+    """Checks if each cell in a batch of cells is a car type."""
+    return general.are_car_types(cells)
+
+def _get_cells_df(spark: SparkSession, vrn_rdd: RDD) -> DataFrame:
+    """Loads the VRN RDD into a DataFrame with 1 row per cell, where each cell
+    is keyed by its (row, column) position in the worksheet.
+
+    Args:
+        spark: SparkSession object
+        vrn_rdd: VRN RDD, as rows
+
+    Returns:
+        DataFrame with the columns "row_idx", "col_idx" and "cell".
+    """
+
+    cells_rdd = transform._rows_to_cells(vrn_rdd) \
+        .map(lambda x: (x[0][0], x[0][1], x[1]))
+    return spark.createDataFrame(cells_rdd, _CELLS_SCHEMA)
+
+def _get_prices_df(spark: SparkSession, prices_rdd: RDD) -> DataFrame:
+    """Loads the prices RDD into a DataFrame of car type to price, keeping the
+    last price of each car type as in `transform._get_prices_dict`.
+
+    Args:
+        spark: SparkSession object
+        prices_rdd: Car prices RDD
+
+    Returns:
+        DataFrame with the columns "car_type" and "price", where the prices
+        are still unparsed strings.
+    """
+
+    prices_df = spark.createDataFrame(
+        prices_rdd
+            .zipWithIndex()
+            .map(lambda x: (x[1], f'{x[0][0]} / {x[0][1]}', x[0][2])),
+        _PRICES_SCHEMA)
+
+    last_price_window = Window \
+        .partitionBy('car_type') \
+        .orderBy(F.desc('price_idx'))
+    return prices_df \
+        .withColumn('rank', F.row_number().over(last_price_window)) \
+        .filter(F.col('rank') == 1) \
+        .select('car_type', 'price')
+
+def _get_result(cells_tfm_df: DataFrame) -> Column:
+    """Returns the price mapping of each transformed cell, following
+    `transform._car_type_with_price`, with the prices still unparsed strings.
+    """
+
+    return F \
+        .when(~F.col('is_car_type'), F.col('cell_tfm')) \
+        .when(F.col('price').isNotNull(), F.col('price')) \
+        .otherwise(F.concat(F.lit(constants.ERROR_MISSING_PRICE), F.col('cell_tfm')))
+
+def _get_rows_tfm_df(spark: SparkSession,
+                     vrn_rdd: RDD,
+                     cells_tfm_df: DataFrame) -> DataFrame:
+    """Regroups the transformed cells DataFrame into rows in worksheet order,
+    where the cells of each row are sorted by their column.
+
+    The cells are joined back to the index of each VRN row, so that the rows
+    without any cells are kept, with null cells.
+
+    Args:
+        spark: SparkSession object
+        vrn_rdd: VRN RDD, as rows, that the cells were split from
+        cells_tfm_df: Transformed cells DataFrame, with the columns "row_idx",
+            "col_idx", "cell_tfm", "is_car_type" and "price"
+
+    Returns:
+        DataFrame with the columns "row_idx" and "cells", where each cell is a
+        struct of "col_idx", "cell_tfm", "result" and "is_price".
+    """
+
+    rows_df = spark.createDataFrame(
+        vrn_rdd
+            .zipWithIndex()
+            .map(lambda x: (x[1],)),
+        _ROWS_SCHEMA)
+
+    cells_by_row_df = cells_tfm_df \
+        .withColumn('result', _get_result(cells_tfm_df)) \
+        .withColumn('is_price', F.col('is_car_type') & F.col('price').isNotNull()) \
+        .groupBy('row_idx') \
+        .agg(F.sort_array(F.collect_list(
+            F.struct('col_idx', 'cell_tfm', 'result', 'is_price'))).alias('cells'))
+
+    return rows_df \
+        .join(cells_by_row_df, 'row_idx', 'left_outer') \
+        .orderBy('row_idx')
+
+def _to_row_tfm(row: Row) -> Tuple[List[str], List[transform.Price]]:
+    """Converts a row of the transformed rows DataFrame to its cleaned row
+    and its Results row, with the prices parsed in the same way as in the
+    RDD engine. A row without any cells has null cells."""
+
+    cells = row.cells or []
+    return [cell.cell_tfm for cell in cells], \
+        [transform._parse_price(cell.result) if cell.is_price else cell.result for cell in cells]
+
+def run(spark: SparkSession,
+        log: logging.Log4j,
+        config: Dict[str, str],
+        vrn_rdd: RDD,
+        prices_rdd: RDD,
+        persistence: RDDPersistence = None,
+        stats: transform.TransformStats = None,
+        results_rdd_cached: RDD = None) -> Tuple[RDD, RDD, RDD]:
+    """Runner of Transform phase on DataFrames.
+
+    If rule profiling is enabled in the config, the stats of each cleaning
+    rule are sent back from the executors through the stats object, to be
+    logged by the caller as in `transform.run`.
+
+    Args:
+        spark: SparkSession object
+        log: Log4j object
+        config: Key-value mappings of config values
+        vrn_rdd: VRN RDD, as rows
+        prices_rdd: Car prices RDD
+        persistence: Persistence policy, created from the config if not given
+        stats: Stats sent back from the executors, created if not given
+        results_rdd_cached: Results RDD of the rows reused from the manifest,
+            as in `transform.run`
+
+    Returns:
+        Transformed VRN RDD, as rows
+        Results RDD, as rows
+        Transformed car prices RDD
+    """
+
+    # config values used
+    profile_rules = config[constants.CONFIG_TRANSFORM_PROFILE_RULES]
+
+    if persistence is None:
+        persistence = RDDPersistence(
+            spark.sparkContext,
+            config[constants.CONFIG_TRANSFORM_STORAGE_LEVEL])
+
+    cells_df = _get_cells_df(spark, vrn_rdd)
+    prices_df = _get_prices_df(spark, prices_rdd)
+
+    if stats is None:
+        stats = transform.TransformStats(log, spark.sparkContext, profile_rules)
+
+    clean_cells = _clean_cells
+    if profile_rules:
+        clean_cells = _get_clean_cells_profiled(stats.rule_stats)
+
+    # Cleans the car model name, then finds the price mapping for each car type
+    cells_tfm_df = cells_df \
+        .withColumn('cell_tfm', clean_cells('cell')) \
+        .withColumn('is_car_type', _is_car_type('cell_tfm')) \
+        .join(prices_df, F.col('cell_tfm') == F.col('car_type'), 'left_outer')
+
+    # regroup the cells into rows with the DataFrame API, so only whole rows
+    # are sent to Python, to parse their prices
+    # reshape it in the form of ({cleaned row}, {results row})
+    rows_tfm_rdd = _get_rows_tfm_df(spark, vrn_rdd, cells_tfm_df).rdd.map(_to_row_tfm)
+    rows_tfm_rdd = persistence.persist('rows_tfm', rows_tfm_rdd)
+
+    vrn_rdd_tfm = rows_tfm_rdd.map(lambda x: x[0])
+    results_rdd = rows_tfm_rdd.map(lambda x: x[1])
+
+    # Add any new car types to the prices RDD
+    prices_rdd_tfm = transform._add_new_car_types(
+        log,
+        results_rdd if results_rdd_cached is None else results_rdd.union(results_rdd_cached),
+        prices_rdd)
+
+    return vrn_rdd_tfm, results_rdd, prices_rdd_tfm
@@ -0,0 +1,167 @@
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+import os
+import time
+from typing import Dict, List, Tuple
+
+from . import transform
+from .transform_scripts import cleaners, profiler, resolver
+from helpers import logging, spans
+from utils import constants
+
+"""
+Transform phase of the ETL pipeline, executed in plain Python.
+
+This is an alternative engine to `transform.run` for inputs that are small
+enough to not be worth starting Spark for, and produces the same outputs
+as lists of rows instead of RDDs. Each distinct cell value is cleaned once,
+across a pool of processes.
+"""
+
+def _clean_cells(profile_rules: bool,
+                 cells: List[str]) -> Tuple[List[str], profiler.RuleStats]:
+    """Performs the basic cleaning and model name cleaning on a chunk of cells,
+    returning the cleaned cells and the rule stats of the chunk."""
+
+    profiler.configure(profile_rules)
+    rule_stats_start = profiler.get_stats()
+    cells_tfm = [cleaners.clean_model_name(cleaners.clean_raw_data(x)) for x in cells]
+    return cells_tfm, profiler.diff_stats(profiler.get_stats(), rule_stats_start)
+
+def _get_cells_tfm(cells: List[str],
+                   n_processes: int,
+                   profile_rules: bool = False) -> Tuple[Dict[str, str], profiler.RuleStats]:
+    """Cleans the distinct cell values, split into chunks across a pool of
+    processes. The cells are cleaned in this process if there are too few of
+    them to be worth the overhead of the pool.
+
+    Args:
+        cells: Distinct cell values
+        n_processes: Number of processes in the pool
+        profile_rules: Whether the cleaning rules are profiled
+
+    Returns:
+        A dict of key-value mappings from cell value to cleaned cell value.
+        Rule stats, added up across the processes; empty if the rules are
+        not profiled.
+    """
+
+    clean_fn = partial(_clean_cells, profile_rules)
+    if n_processes <= 1 or len(cells) <= constants.LOCAL_CHUNK_SIZE:
+        cells_tfm, rule_stats = clean_fn(cells)
+        return dict(zip(cells, cells_tfm)), rule_stats
+
+    chunks = [cells[i:i + constants.LOCAL_CHUNK_SIZE]
+              for i in range(0, len(cells), constants.LOCAL_CHUNK_SIZE)]
+    cells_tfm, rule_stats = [], {}
+    with ProcessPoolExecutor(max_workers=n_processes) as executor:
+        for chunk_tfm, chunk_rule_stats in executor.map(clean_fn, chunks):
+            cells_tfm.extend(chunk_tfm)
+            profiler.add_stats(rule_stats, chunk_rule_stats)
+    return dict(zip(cells, cells_tfm)), rule_stats
+
+def _add_new_car_types(log: logging.Logger,
+                       results_data: List[List[transform.Price]],
+                       prices_data: List[List[str]]) -> List[List[str]]:
+    """Adds any new car types found to the prices data, with their price
+    candidates, as in `transform._add_new_car_types`.
+
+    Args:
+        log: Logger object
+        results_data: Results data, as rows
+        prices_data: Car prices data
+
+    Returns:
+        Transformed car prices data
+    """
+
+    # count the occurrences of each new car type
+    car_types_new = Counter(
+        x.replace(constants.ERROR_MISSING_PRICE, '')
+        for row in results_data
+        for x in row
+        if isinstance(x, str) and constants.ERROR_MISSING_PRICE in x)
+
+    # log the most frequent new car types only
+    transform._log_new_car_types(
+        log,
+        len(car_types_new),
+        sorted(car_types_new.items(), key=transform._new_car_type_order)
+            [:constants.NEW_CAR_TYPES_LOG_MAX])
+
+    # find the price candidates of the new car types
+    # reshape it in the form of [{make}, {model}, "0", {candidates}]
+    # later prices of the same car type replace earlier ones
+    time_start = time.perf_counter()
+    index = resolver.PriceIndex({f'{x[0]} / {x[1]}': transform._parse_price(x[2]) for x in prices_data})
+    prices_new_data = [[*x.split(' / '), '0', resolver.format_candidates(index.resolve(x))]
+                       for x in car_types_new]
+    if car_types_new:
+        log.info(f'Price candidates of {len(car_types_new)} new car types found in '
+                 f'{time.perf_counter() - time_start:.3f}s')
+
+    # join the 2 prices lists together
+    # sort by make, then model name
+    return sorted(prices_data + prices_new_data, key=lambda x: (x[0], x[1]))
+
+def run(log: logging.Logger,
+        config: Dict[str, str],
+        vrn_data: List[List[str]],
+        prices_data: List[List[str]],
+        report: spans.RunReport = None,
+        results_data_cached: List[List[transform.Price]] = None) \
+        -> Tuple[List[List[str]], List[List[transform.Price]], List[List[str]]]:
+    """Runner of Transform phase in plain Python.
+
+    Args:
+        log: Logger object
+        config: Key-value mappings of config values
+        vrn_data: VRN data, as rows
+        prices_data: Car prices data
+        report: Run report that the stages are timed in
+        results_data_cached: Results data of the rows reused from the
+            manifest, whose new car types are added to the prices together
+            with those of the transformed rows
+
+    Returns:
+        Transformed VRN data, as rows
+        Results data, as rows
+        Transformed car prices data
+    """
+
+    # config values used
+    n_processes = int(config.get(constants.CONFIG_LOCAL_PROCESSES) or 0) or os.cpu_count()
+    profile_rules = config[constants.CONFIG_TRANSFORM_PROFILE_RULES]
+
+    if report is None:
+        report = spans.RunReport()
+    if results_data_cached is None:
+        results_data_cached = []
+
+    # Basic cleaning of raw data
+    # Cleans the car model name
+    # Each distinct cell value is cleaned once
+    cells = list(dict.fromkeys(x for row in vrn_data for x in row))
+    with report.span('transform.clean', records_in=len(cells)) as span:
+        cells_tfm, rule_stats = _get_cells_tfm(cells, n_processes, profile_rules)
+        span.records_out = len(cells_tfm)
+    log.info(f'{len(cells)} distinct cells cleaned')
+    if profile_rules:
+        transform._log_rule_profile(log, rule_stats)
+    vrn_data_tfm = [[cells_tfm[x] for x in row] for row in vrn_data]
+
+    # Finds the price mapping for each car type
+    # later prices of the same car type replace earlier ones
+    with report.span('transform.price', records_in=len(vrn_data_tfm)) as span:
+        prices = {f'{x[0]} / {x[1]}': transform._parse_price(x[2]) for x in prices_data}
+        results_data = [[transform._car_type_to_price(prices, x) for x in row]
+                        for row in vrn_data_tfm]
+        span.records_out = len(results_data)
+
+    # Add any new car types to the prices data
+    with report.span('transform.new_car_types', records_in=len(prices_data)) as span:
+        prices_data_tfm = _add_new_car_types(log, results_data + results_data_cached, prices_data)
+        span.records_out = len(prices_data_tfm)
+
+    return vrn_data_tfm, results_data, prices_data_tfm
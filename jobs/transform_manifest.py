@@ -0,0 +1,458 @@
+import hashlib
+import json
+import os
+from pyspark import Broadcast, SparkContext
+from pyspark.rdd import RDD
+from typing import Any, Dict, List, Optional, Tuple
+
+from . import transform
+from .transform_scripts import cleaners, memo
+from helpers import backends, logging
+from utils import constants
+
+"""
+Manifest of the rows transformed in the previous run, for the Transform
+phase to only transform the rows that are new or that have changed.
+
+Each entry is keyed by the hash of the content of a VRN row, and holds the
+transformed VRN row, the results row, and the hash of the prices of the car
+types in the row. An entry is only reused if the prices of its car types are
+unchanged, so that the rows with car types that have new prices are priced
+again.
+
+The manifest is stored as JSON lines, either as a single file or as a
+directory of part files as written by Spark. The first line is a header
+with the version of the Transform outputs and the hash of the cleaning
+rules; a manifest with another header was written by a Transform phase that
+cleans differently, and is discarded. Each other line is an entry, as
+[{row hash}, {transformed row}, {results row}, {prices hash}].
+"""
+
+# Version of the Transform outputs, which is increased with each change to
+# the Transform phase that changes its outputs other than through the
+# cleaning rules, e.g. the parsed prices of the "Results" worksheet
+VERSION = 2
+
+# A transformed VRN row and its results row
+CachedRow = Tuple[List[str], List[transform.Price]]
+
+def _hash(obj: Any) -> str:
+    """Returns the hash of a JSON-serializable object."""
+    return hashlib.sha256(json.dumps(obj).encode('utf-8')).hexdigest()
+
+def _get_header() -> Dict[str, Any]:
+    """Returns the header of a manifest written by this Transform phase."""
+    return {'version': VERSION, 'rules_hash': _hash(cleaners.MAKE_TO_RULES_MAPPING)}
+
+def _get_part_paths(path: str) -> List[str]:
+    """Returns the path itself if it is a file, else the part files in the
+    directory in order."""
+
+    if os.path.isfile(path):
+        return [path]
+    return sorted(os.path.join(path, filename)
+                  for filename in os.listdir(path)
+                  if filename.startswith('part-'))
+
+def _is_current(log: logging.Logger, path: str) -> bool:
+    """Checks if there is a manifest at the path that was written by this
+    Transform phase, i.e. with the same header.
+
+    Args:
+        log: Logger object
+        path: Filepath of the manifest; empty if the manifest is disabled
+
+    Returns:
+        True if the manifest can be reused.
+    """
+
+    if not path or not os.path.exists(path):
+        return False
+
+    header = None
+    part_paths = _get_part_paths(path)
+    if part_paths:
+        with open(part_paths[0], 'r') as manifest_file:
+            try:
+                header = json.loads(manifest_file.readline())
+            except ValueError:
+                pass
+
+    if header != _get_header():
+        log.info(f'Manifest at {path} discarded: written by another version of the '
+                 f'Transform phase or with other cleaning rules')
+        return False
+    return True
+
+def _get_prices_dict(prices_data: List[List[str]]) -> Dict[str, transform.Price]:
+    """Returns a dict of car model to parsed car price, as in
+    `transform._get_prices_dict`."""
+    return {f'{x[0]} / {x[1]}': transform._parse_price(x[2]) for x in prices_data}
+
+def _get_prices_hash(prices: Dict[str, transform.Price],
+                     row_tfm: List[str]) -> str:
+    """Returns the hash of the prices of the car types in a transformed row."""
+    return _hash([prices.get(x) for x in row_tfm if memo.is_car_type(x)])
+
+def _get_cached_row(prices: Dict[str, transform.Price],
+                    entry: Optional[list]) -> Optional[CachedRow]:
+    """Returns the transformed VRN row and results row of a manifest entry,
+    or None if there is no entry or the prices of its car types changed."""
+
+    if entry is not None and entry[2] == _get_prices_hash(prices, entry[0]):
+        return entry[0], entry[1]
+    return None
+
+def load(log: logging.Logger, path: str) -> Dict[str, list]:
+    """Loads the manifest.
+
+    Args:
+        log: Logger object
+        path: Filepath of the manifest; empty if the manifest is disabled
+
+    Returns:
+        Manifest entries, keyed by row hash, or an empty dict if there is
+        no manifest that can be reused.
+    """
+
+    if not _is_current(log, path):
+        return {}
+
+    manifest = {}
+    for part_path in _get_part_paths(path):
+        with open(part_path, 'r') as manifest_file:
+            for line in manifest_file:
+                if line.startswith('['):
+                    entry = json.loads(line)
+                    manifest[entry[0]] = entry[1:]
+    return manifest
+
+def save(path: str, manifest: Dict[str, list]) -> None:
+    """Saves the manifest, replacing the previous one.
+
+    Args:
+        path: Filepath of the manifest; empty if the manifest is disabled
+        manifest: Manifest entries, keyed by row hash
+    """
+
+    if not path:
+        return None
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    path_tmp = f'{path}.{os.getpid()}.tmp'
+    with open(path_tmp, 'w') as manifest_file:
+        manifest_file.write(json.dumps(_get_header()) + '\n')
+        for row_hash, entry in manifest.items():
+            manifest_file.write(json.dumps([row_hash, *entry]) + '\n')
+    backends._replace_path(path_tmp, path)
+    return None
+
+def lookup(manifest: Dict[str, list],
+           vrn_data: List[List[str]],
+           prices_data: List[List[str]]) -> List[Optional[CachedRow]]:
+    """Looks up each VRN row in the manifest.
+
+    Args:
+        manifest: Manifest entries, keyed by row hash
+        vrn_data: VRN data, as rows
+        prices_data: Car prices data
+
+    Returns:
+        The transformed VRN row and results row of each VRN row, or None for
+        the rows that have to be transformed.
+    """
+
+    prices = _get_prices_dict(prices_data)
+    return [_get_cached_row(prices, manifest.get(_hash(row))) for row in vrn_data]
+
+def merge(cached_rows: List[Optional[CachedRow]],
+          vrn_data_tfm: List[List[str]],
+          results_data: List[List[transform.Price]]) \
+          -> Tuple[List[List[str]], List[List[transform.Price]]]:
+    """Merges the rows reused from the manifest with the rows that were
+    transformed, in the order of the VRN rows.
+
+    Args:
+        cached_rows: Rows reused from the manifest, as returned by `lookup`
+        vrn_data_tfm: Transformed VRN data of the rows that were not reused
+        results_data: Results data of the rows that were not reused
+
+    Returns:
+        Transformed VRN data of all rows
+        Results data of all rows
+    """
+
+    rows_tfm = iter(zip(vrn_data_tfm, results_data))
+    rows = [cached_row if cached_row is not None else next(rows_tfm)
+            for cached_row in cached_rows]
+    return [row[0] for row in rows], [row[1] for row in rows]
+
+def build(vrn_data: List[List[str]],
+          vrn_data_tfm: List[List[str]],
+          results_data: List[List[transform.Price]],
+          prices_data: List[List[str]]) -> Dict[str, list]:
+    """Builds the manifest of the rows of this run.
+
+    Args:
+        vrn_data: VRN data, as rows
+        vrn_data_tfm: Transformed VRN data, as rows
+        results_data: Results data, as rows
+        prices_data: Car prices data
+
+    Returns:
+        Manifest entries, keyed by row hash.
+    """
+
+    prices = _get_prices_dict(prices_data)
+    return {
+        _hash(row): [row_tfm, results_row, _get_prices_hash(prices, row_tfm)]
+        for row, row_tfm, results_row in zip(vrn_data, vrn_data_tfm, results_data)
+    }
+
+def broadcast_prices(log: logging.Logger,
+                     config: Dict[str, Any],
+                     prices_rdd: RDD) -> Optional[Broadcast]:
+    """Broadcasts the dict of car model to parsed car price that the entries
+    are checked against, as in `transform._get_prices_dict`, if there are at
+    most `transform_prices_broadcast_max_size` prices.
+
+    Args:
+        log: Logger object
+        config: Config of the ETL job
+        prices_rdd: Car prices RDD
+
+    Returns:
+        Broadcast variable of the prices dict, or None if the prices are too
+        many to be broadcast and have to be joined against the entries.
+    """
+
+    # config values used
+    prices_broadcast_max_size = int(config[constants.CONFIG_TRANSFORM_PRICES_BROADCAST_MAX_SIZE])
+
+    n_prices = prices_rdd.count()
+    if n_prices > prices_broadcast_max_size:
+        log.info(f'Manifest prices checked by shuffle join: {n_prices} prices')
+        return None
+
+    log.info(f'Manifest prices checked by broadcast: {n_prices} prices')
+    return prices_rdd.context.broadcast(transform._get_prices_dict(prices_rdd))
+
+def _get_prices_hash_rdd(rows_tfm_rdd: RDD,
+                         prices_rdd: RDD,
+                         prices_bc: Optional[Broadcast]) -> RDD:
+    """Returns the hash of the prices of the car types in each transformed
+    row, as in `_get_prices_hash`, either from the broadcast prices dict or
+    with a shuffle join against the prices RDD.
+
+    Args:
+        rows_tfm_rdd: Pair RDD of key to transformed row
+        prices_rdd: Car prices RDD
+        prices_bc: Broadcast prices dict, as returned by `broadcast_prices`
+
+    Returns:
+        Pair RDD of key to prices hash, partitioned as the rows are.
+    """
+
+    if prices_bc is not None:
+        return rows_tfm_rdd.mapValues(lambda x: _get_prices_hash(prices_bc.value, x))
+
+    n_partitions = rows_tfm_rdd.getNumPartitions()
+
+    # reshape it in the form of ({car type}, ({key}, {car type idx})) for the join
+    car_types_rdd = rows_tfm_rdd \
+        .flatMap(lambda x: ((car_type, (x[0], car_type_idx))
+                            for car_type_idx, car_type
+                            in enumerate(y for y in x[1] if memo.is_car_type(y))))
+
+    # reshape it in the form of ({key}, ({car type idx}, {price}))
+    prices_pair_rdd = car_types_rdd \
+        .leftOuterJoin(transform._get_last_prices_pair_rdd(prices_rdd), n_partitions) \
+        .map(lambda x: (x[1][0][0], (x[1][0][1], x[1][1])))
+
+    # rows without car types are kept, with the hash of no prices
+    return rows_tfm_rdd \
+        .cogroup(prices_pair_rdd, n_partitions) \
+        .mapValues(lambda x: _hash([price for _, price in sorted(x[1])]))
+
+def load_rdd(log: logging.Logger, sc: SparkContext, path: str) -> RDD:
+    """Loads the manifest into a pair RDD, as in `load`.
+
+    Args:
+        log: Logger object
+        sc: SparkContext object
+        path: Filepath of the manifest; empty if the manifest is disabled
+
+    Returns:
+        Pair RDD of row hash to manifest entry, which is empty if there is
+        no manifest that can be reused.
+    """
+
+    if not _is_current(log, path):
+        return sc.emptyRDD()
+
+    return sc.textFile(path) \
+        .filter(lambda x: x.startswith('[')) \
+        .map(json.loads) \
+        .map(lambda x: (x[0], x[1:]))
+
+def lookup_rdd(manifest_rdd: RDD,
+               vrn_rdd: RDD,
+               prices_rdd: RDD,
+               prices_bc: Optional[Broadcast]) -> RDD:
+    """Looks up each VRN row in the manifest, as in `lookup`, by joining the
+    rows to the manifest entries on the row hash.
+
+    Args:
+        manifest_rdd: Manifest entries, as returned by `load_rdd`
+        vrn_rdd: VRN RDD, as rows
+        prices_rdd: Car prices RDD
+        prices_bc: Broadcast prices dict, as returned by `broadcast_prices`
+
+    Returns:
+        Pair RDD of row index to the VRN row and its cached row, where the
+        cached row is None for the rows that have to be transformed. It is
+        partitioned as the VRN RDD is, whatever the number of part files of
+        the manifest.
+    """
+
+    n_partitions = vrn_rdd.getNumPartitions()
+
+    # reshape it in the form of ({row idx}, ({VRN row}, {manifest entry}))
+    rows_rdd = vrn_rdd \
+        .zipWithIndex() \
+        .map(lambda x: (_hash(x[0]), (x[1], x[0]))) \
+        .leftOuterJoin(manifest_rdd, n_partitions) \
+        .map(lambda x: (x[1][0][0], (x[1][0][1], x[1][1])))
+
+    if prices_bc is not None:
+        return rows_rdd \
+            .mapValues(lambda x: (x[0], _get_cached_row(prices_bc.value, x[1])))
+
+    # reshape it in the form of ({row idx}, {prices hash}) for the rows with an entry
+    prices_hash_rdd = _get_prices_hash_rdd(
+        rows_rdd.filter(lambda x: x[1][1] is not None).mapValues(lambda x: x[1][0]),
+        prices_rdd,
+        None)
+
+    # an entry is only reused if the prices of its car types are unchanged
+    return rows_rdd \
+        .leftOuterJoin(prices_hash_rdd, n_partitions) \
+        .mapValues(lambda x: (x[0][0],
+                              (x[0][1][0], x[0][1][1])
+                              if x[0][1] is not None and x[0][1][2] == x[1] else None))
+
+def get_pending_rdd(rows_rdd: RDD) -> RDD:
+    """Returns the VRN rows that have to be transformed, in order.
+
+    Args:
+        rows_rdd: Looked up rows, as returned by `lookup_rdd`
+
+    Returns:
+        VRN RDD of the rows that were not reused, as rows.
+    """
+
+    return rows_rdd \
+        .filter(lambda x: x[1][1] is None) \
+        .sortByKey() \
+        .map(lambda x: x[1][0])
+
+def get_cached_results_rdd(rows_rdd: RDD) -> RDD:
+    """Returns the results rows reused from the manifest, in no order.
+
+    Args:
+        rows_rdd: Looked up rows, as returned by `lookup_rdd`
+
+    Returns:
+        Results RDD of the rows that were reused, as rows.
+    """
+
+    return rows_rdd \
+        .filter(lambda x: x[1][1] is not None) \
+        .map(lambda x: x[1][1][1])
+
+def merge_rdd(rows_rdd: RDD, vrn_rdd_tfm: RDD, results_rdd: RDD) -> RDD:
+    """Merges the rows reused from the manifest with the rows that were
+    transformed, as in `merge`, by joining the transformed rows back to the
+    index of the VRN row that they were transformed from.
+
+    Args:
+        rows_rdd: Looked up rows, as returned by `lookup_rdd`
+        vrn_rdd_tfm: Transformed VRN RDD of the rows that were not reused
+        results_rdd: Results RDD of the rows that were not reused
+
+    Returns:
+        RDD of ({VRN row}, {transformed row}, {results row}) of all rows,
+        in the order of the VRN rows, partitioned as the looked up rows are.
+    """
+
+    n_partitions = rows_rdd.getNumPartitions()
+
+    # reshape it in the form of ({pending idx}, {row idx})
+    pending_idx_rdd = rows_rdd \
+        .filter(lambda x: x[1][1] is None) \
+        .keys() \
+        .sortBy(lambda x: x, numPartitions=n_partitions) \
+        .zipWithIndex() \
+        .map(lambda x: (x[1], x[0]))
+
+    # reshape it in the form of ({row idx}, ({transformed row}, {results row}))
+    rows_tfm_rdd = vrn_rdd_tfm \
+        .zipWithIndex() \
+        .map(lambda x: (x[1], x[0])) \
+        .join(results_rdd.zipWithIndex().map(lambda x: (x[1], x[0])), n_partitions) \
+        .join(pending_idx_rdd, n_partitions) \
+        .map(lambda x: (x[1][1], x[1][0]))
+    rows_cached_rdd = rows_rdd \
+        .filter(lambda x: x[1][1] is not None) \
+        .mapValues(lambda x: x[1])
+
+    return rows_rdd \
+        .mapValues(lambda x: x[0]) \
+        .join(rows_tfm_rdd.union(rows_cached_rdd), n_partitions) \
+        .sortByKey(numPartitions=n_partitions) \
+        .map(lambda x: (x[1][0], *x[1][1]))
+
+def build_rdd(rows_rdd: RDD,
+              prices_rdd: RDD,
+              prices_bc: Optional[Broadcast]) -> RDD:
+    """Builds the manifest of the rows of this run, as in `build`.
+
+    Args:
+        rows_rdd: Merged rows, as returned by `merge_rdd`
+        prices_rdd: Car prices RDD
+        prices_bc: Broadcast prices dict, as returned by `broadcast_prices`
+
+    Returns:
+        Pair RDD of row hash to manifest entry, with 1 entry per row hash.
+    """
+
+    # identical rows have the same entry, which is saved once,
+    # as each row hash has to be joined to a single entry
+    rows_tfm_rdd = rows_rdd \
+        .map(lambda x: (_hash(x[0]), (x[1], x[2]))) \
+        .reduceByKey(lambda x, y: x)
+
+    return rows_tfm_rdd \
+        .join(_get_prices_hash_rdd(rows_tfm_rdd.mapValues(lambda x: x[0]), prices_rdd, prices_bc)) \
+        .mapValues(lambda x: [x[0][0], x[0][1], x[1]])
+
+def save_rdd(path: str, entries_rdd: RDD) -> None:
+    """Saves the manifest as a directory of part files, replacing the
+    previous one.
+
+    Args:
+        path: Filepath of the manifest; empty if the manifest is disabled
+        entries_rdd: Manifest entries, as returned by `build_rdd`
+    """
+
+    if not path:
+        return None
+
+    sc = entries_rdd.context
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    path_tmp = f'{path}.{os.getpid()}.tmp'
+    sc.parallelize([json.dumps(_get_header())], 1) \
+        .union(entries_rdd.map(lambda x: json.dumps([x[0], *x[1]]))) \
+        .saveAsTextFile(path_tmp)
+    backends._replace_path(path_tmp, path)
+    return None
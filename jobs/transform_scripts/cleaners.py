@@ -1,12 +1,16 @@
+from functools import partial
 import re
-from typing import List
+from typing import Callable, Dict, List, Optional, Pattern, Tuple, Union
 
-from . import general
+from . import general, profiler
 
 """
 cleaners.py contains all of the functions used for various data cleaning.
 """
 
+# A cleaning rule is a (pattern, replacement) pair that is applied with `re.sub`
+Rule = Tuple[str, str]
+
 # Basic data cleaning
 
 def clean_raw_data(s: str) -> str:
@@ -22,467 +26,729 @@ def clean_raw_data(s: str) -> str:
         String with extra "/" symbols removed
     """
 
-    s = re.sub('TOYOTA / TOYOTA /', 'TOYOTA /', s)
-    return s
+    return s.replace('TOYOTA / TOYOTA /', 'TOYOTA /')
 
-# Main data cleaning on car model name
+# Common cleaning rules
 
-def _remove_all_words_in_brackets(s: str) -> str:
+def _remove_all_words_in_brackets() -> Rule:
     # e.g. "E200 AVG (R18 LED)" to "E200 AVG"
-    return re.sub('\s(\(.*\))', '', s)
+    return ('\s(\(.*\))', '')
 
-def _remove_text_after_marker(s: str, marker: str) -> str:
+def _remove_text_after_marker(marker: str) -> Rule:
     # e.g. marker = "BITURBO"
     # then, "B3 BITURBO TOURING S/R" to "B3 BITURBO"
-    return re.sub(f'(?<={marker}).*', '', s)
+    return (f'(?<={marker}).*', '')
 
-def _remove_trailing_letters_behind_engine_cc(s: str) -> str:
+def _remove_trailing_letters_behind_engine_cc() -> Rule:
     # e.g. "ODYSSEY 2.4L" to "ODYSSEY 2.4"
-    return re.sub('(?<=\d\.\d)\S+', '', s)
+    return ('(?<=\d\.\d)\S+', '')
 
-def _remove_trailing_words(s: str, words: List[str]) -> str:
+def _remove_trailing_words(words: List[str]) -> Rule:
     # e.g. words = ['A']
     # then, "ROLLS ROYCE / WRAITH 6.6 A" to "ROLLS ROYCE / WRAITH 6.6"
     pattern = '|'.join(words)
-    return re.sub(f'\s({pattern})$', '', s)
+    return (f'\s({pattern})$', '')
 
-def clean_model_name(s: str) -> str:
-    """Performs cleaning of the car model name, if the input string is so.
+# Main data cleaning on car model name
 
-    This function contains many child functions, where each child function
-    performs the data cleaning for a particular car make.
+# Mapping of car make to its cleaning rules, which are applied in order.
+# Each make is kept in its own list to facilitate maintainability and debugging.
+MAKE_TO_RULES_MAPPING: Dict[str, List[Rule]] = {
+    'ALFA ROMEO': [],
 
-    This segregation facilitates maintainability and debugging.
-    
-    Args:
-        s: Input string
+    'ALPINA': [
+        _remove_text_after_marker('BITURBO'),
+    ],
 
-    Returns:
-        Cleaned model name if input string was a car model name.
-        Else, the input string is returned as it is.
-    """
+    'ASTON MARTIN': [
+        # remove the following words
+        ('\s(ABS|A|D\/AB|HID|SMT)', ''),
+        _remove_all_words_in_brackets(),
+        _remove_trailing_letters_behind_engine_cc(),
+    ],
+
+    'AUDI': [
+        (',18\'\'', ''),
+        ('Q7 40', 'Q7 2.0 40'),
+        ('SB', 'SPORTBACK'),
 
-    def _clean_alfa_romeo(model_name: str) -> str:
-        return model_name
-
-    def _clean_alpina(model_name: str) -> str:
-        model_name = _remove_text_after_marker(model_name, 'BITURBO')
-        return model_name
-    
-    def _clean_aston_martin(model_name: str) -> str:
-        # remove the following words
-        model_name = re.sub('\s(ABS|A|D\/AB|HID|SMT)', '', model_name)
-        model_name = _remove_all_words_in_brackets(model_name)
-        model_name = _remove_trailing_letters_behind_engine_cc(model_name)
-        return model_name
-    
-    def _clean_audi(model_name: str) -> str:
-        model_name = re.sub(',18\'\'', '', model_name)
-        model_name = re.sub('Q7 40', 'Q7 2.0 40', model_name)
-        model_name = re.sub('SB', 'SPORTBACK', model_name)
-        
         # e.g. convert "A3 SEDAN 1.0 TFSI S TRONIC (LED)" to "A3 SEDAN 1.0"
-        model_name = _remove_text_after_marker(model_name, '(\d\.\d)')
-        return model_name
-    
-    def _clean_bmw(model_name: str) -> str:
+        _remove_text_after_marker('(\d\.\d)'),
+    ],
+
+    'B.M.W.': [
         # remove phrases with commas first
-        model_name = re.sub(', LED HL', '', model_name)
-        model_name = re.sub(',HUD, NAV, LASERLIGHT', '', model_name)
+        (', LED HL', ''),
+        (',HUD, NAV, LASERLIGHT', ''),
 
         # remove the following words
         # not sure if "SE" is integral
-        model_name = re.sub('\s(\d\.\d\w?|\d\s?S(EA)?TE?R?|(A|\d)WD|\dDR|ABS?|AUTO|A\/STR|A\/?T|(D\/)?A?(IR)?B(AG)?S?|DSC|EU6|FL|FOG\s?LIGHTS?|GAS\/D|HATCH|HBA|HID|HL|HUD|INT|LASERLIGHT|LED|NAV|NVD|PGR|RCP|RR\/ENT|SALOON|SE(DAN)?|SMT|SR|SUNROOF|TC|XL$)', '', model_name)
-        model_name = _remove_trailing_words(model_name, ['A'])
-        
-        model_name = re.sub('630CI', '630I', model_name)
-        model_name = re.sub('740I', '740LI', model_name)
-        model_name = re.sub('GT', 'GRAN TOURER', model_name)
-        model_name = re.sub('(MSPT|MSPORT|M SPORT)', 'M-SPORT', model_name)
-        model_name = re.sub('M-SPORTX', 'M-SPORT X', model_name)
-        model_name = re.sub('M6 4.4', 'M6 GRAN COUPE', model_name)
-        model_name = re.sub('X3 SDRIVE 20I', 'X3 SDRIVE20I', model_name)
-        model_name = re.sub('^X5 M$', 'X5 M-SPORT', model_name)
-        model_name = re.sub('^X5$', 'X5 XLINE', model_name)
-        model_name = re.sub('^X5 XL$', 'X5 XLINE', model_name)
-        model_name = re.sub('^X6 M$', 'X6 M-SPORT', model_name)
-        model_name = re.sub('X7 XDRIVE 40I', 'X7 XDRIVE40I', model_name)
-        return model_name
-    
-    def _clean_bentley(model_name: str) -> str:
-        # remove the following words
-        model_name = re.sub('\s(\d\.\d|\d\sSEATER|ABS|A\/?T|A(UTO)?|D\/AB|DIESEL|\dWD|S\/?R|SUNROOF|WITHOUT)', '', model_name)
-        
-        model_name = re.sub('^BENTAYGA$', 'BENTAYGA V8', model_name)
-        model_name = re.sub('CONTI FS', 'CONTINENTAL FLYING SPUR', model_name)
-        model_name = re.sub('GT V8 S', 'GT V8', model_name)
-        model_name = re.sub('GTC V8', 'GT V8 CONVERTIBLE', model_name)
-        model_name = _remove_trailing_words(model_name, ['S'])
-        return model_name
-    
-    def _clean_citroen(model_name: str) -> str:
-        # remove the following words
-        model_name = re.sub('\s(EAT6|ABS|EGS|DRL|PSR|SMT|S\/R)', '', model_name)
-        model_name = re.sub('C4 PICASSO 1.6$', 'C4 PICASSO 1.6 THP', model_name)
-        return model_name
-    
-    def _clean_ferrari(model_name: str) -> str:
-        # remove the following words
-        model_name = re.sub('\s(\dWD|\dDR|A\/T|ABS|D\/AB|HID|SMT)', '', model_name)
-        model_name = _remove_trailing_letters_behind_engine_cc(model_name)
-
-        model_name = re.sub('CALIFORNIA T', 'CALIFORNIA 4.3', model_name)
-        model_name = re.sub('^360SPIDER F1$', '360 F1 SPIDER', model_name)
-        model_name = re.sub('F430 A', 'F430', model_name)
-        model_name = re.sub('430F1', '430 F1', model_name)
-        model_name = re.sub('SPECIALE$', 'SPECIALE 4.5', model_name)
-        return model_name
-    
-    def _clean_fiat(model_name: str) -> str:
-        # remove the following words
-        model_name = re.sub('\s(16V|SMT)', '', model_name)
-        model_name = _remove_trailing_words(model_name, ['A'])
-        return model_name
-    
-    def _clean_ford(model_name: str) -> str:
-        # remove the following words
-        model_name = re.sub('\s(AT|GTDI)', '', model_name)
-        
-        model_name = re.sub('SMAX TITN', 'S-MAX TITANIUM', model_name)
-        return model_name
-    
-    def _clean_honda(model_name: str) -> str:
-        # remove the following words
-        model_name = re.sub('\s(\dWD|ABS\b|AT|AUTO|CVT|D\/AIRBAG|EXV?-S|SR|VTI(R|S))', '', model_name)
-        model_name = _remove_trailing_words(model_name, ['ABS', 'A', 'M'])
-        model_name = _remove_trailing_letters_behind_engine_cc(model_name)
-        
-        model_name = re.sub('ODYSSEY ABSOLUTE', 'ODYSSEY', model_name)
-        model_name = re.sub('VEZEL 1.5', 'VEZEL HYBRID 1.5', model_name)
-        return model_name
-    
-    def _clean_hummer(model_name: str) -> str:
+        ('\s(\d\.\d\w?|\d\s?S(EA)?TE?R?|(A|\d)WD|\dDR|ABS?|AUTO|A\/STR|A\/?T|(D\/)?A?(IR)?B(AG)?S?|DSC|EU6|FL|FOG\s?LIGHTS?|GAS\/D|HATCH|HBA|HID|HL|HUD|INT|LASERLIGHT|LED|NAV|NVD|PGR|RCP|RR\/ENT|SALOON|SE(DAN)?|SMT|SR|SUNROOF|TC|XL$)', ''),
+        _remove_trailing_words(['A']),
+
+        ('630CI', '630I'),
+        ('740I', '740LI'),
+        ('GT', 'GRAN TOURER'),
+        ('(MSPT|MSPORT|M SPORT)', 'M-SPORT'),
+        ('M-SPORTX', 'M-SPORT X'),
+        ('M6 4.4', 'M6 GRAN COUPE'),
+        ('X3 SDRIVE 20I', 'X3 SDRIVE20I'),
+        ('^X5 M$', 'X5 M-SPORT'),
+        ('^X5$', 'X5 XLINE'),
+        ('^X5 XL$', 'X5 XLINE'),
+        ('^X6 M$', 'X6 M-SPORT'),
+        ('X7 XDRIVE 40I', 'X7 XDRIVE40I'),
+    ],
+
+    'BENTLEY': [
+        # remove the following words
+        ('\s(\d\.\d|\d\sSEATER|ABS|A\/?T|A(UTO)?|D\/AB|DIESEL|\dWD|S\/?R|SUNROOF|WITHOUT)', ''),
+
+        ('^BENTAYGA$', 'BENTAYGA V8'),
+        ('CONTI FS', 'CONTINENTAL FLYING SPUR'),
+        ('GT V8 S', 'GT V8'),
+        ('GTC V8', 'GT V8 CONVERTIBLE'),
+        _remove_trailing_words(['S']),
+    ],
+
+    'CITROEN': [
+        # remove the following words
+        ('\s(EAT6|ABS|EGS|DRL|PSR|SMT|S\/R)', ''),
+        ('C4 PICASSO 1.6$', 'C4 PICASSO 1.6 THP'),
+    ],
+
+    'FERRARI': [
+        # remove the following words
+        ('\s(\dWD|\dDR|A\/T|ABS|D\/AB|HID|SMT)', ''),
+        _remove_trailing_letters_behind_engine_cc(),
+
+        ('CALIFORNIA T', 'CALIFORNIA 4.3'),
+        ('^360SPIDER F1$', '360 F1 SPIDER'),
+        ('F430 A', 'F430'),
+        ('430F1', '430 F1'),
+        ('SPECIALE$', 'SPECIALE 4.5'),
+    ],
+
+    'FIAT': [
+        # remove the following words
+        ('\s(16V|SMT)', ''),
+        _remove_trailing_words(['A']),
+    ],
+
+    'FORD': [
+        # remove the following words
+        ('\s(AT|GTDI)', ''),
+
+        ('SMAX TITN', 'S-MAX TITANIUM'),
+    ],
+
+    'HONDA': [
+        # remove the following words
+        ('\s(\dWD|ABS\b|AT|AUTO|CVT|D\/AIRBAG|EXV?-S|SR|VTI(R|S))', ''),
+        _remove_trailing_words(['ABS', 'A', 'M']),
+        _remove_trailing_letters_behind_engine_cc(),
+
+        ('ODYSSEY ABSOLUTE', 'ODYSSEY'),
+        ('VEZEL 1.5', 'VEZEL HYBRID 1.5'),
+    ],
+
+    'HUMMER': [
         # remove the following trailing words
-        model_name = _remove_trailing_words(model_name, ['A'])
-        return model_name
-
-    def _clean_hyundai(model_name: str) -> str:
-        # remove the following words
-        model_name = re.sub('\s(\dWD|\dDR|ABS|AD|AT|D\/AB|EU6|GLS|S\/R)', '', model_name)
-        model_name = re.sub('AD\s', '', model_name)
-        model_name = _remove_all_words_in_brackets(model_name)
-        model_name = _remove_trailing_words(model_name, ['S'])
-        return model_name
-    
-    def _clean_infiniti(model_name: str) -> str:
-        # remove the following words
-        model_name = re.sub('\s(AWD|A\/T|DCT|EU6|PREMIUM|S\/R)', '', model_name)
-        model_name = _remove_trailing_letters_behind_engine_cc(model_name)
-        return model_name
-  
-    def _clean_jaguar(model_name: str) -> str:
-        # remove the following words
-        model_name = re.sub('\s(\dWD|\dDR|\d+PS|V6|ABS|AT|D\/AB|GAS\/D|HID|I4D|PL|RWD|SC|SR|TSS|\(\w+\))', '', model_name)
-        model_name = _remove_trailing_letters_behind_engine_cc(model_name)
-        return model_name
-    
-    def _clean_jeep(model_name: str) -> str:
-        # remove the following words
-        model_name = re.sub('\s(ABS|A\/BAG|SRT?)', '', model_name)
-        model_name = _remove_trailing_letters_behind_engine_cc(model_name)
-        return model_name
-    
-    def _clean_kia(model_name: str) -> str:
-        # remove the following words
-        model_name = re.sub('\s(DCT)', '', model_name)
-        model_name = _remove_trailing_letters_behind_engine_cc(model_name)
-        return model_name
-    
-    def _clean_lamborghini(model_name: str) -> str:
-        # remove the following words
-        model_name = re.sub('\s(SMT)', '', model_name)
-        model_name = re.sub('SV J', 'SVJ', model_name)
-        return model_name
-    
-    def _clean_land_rover(model_name: str) -> str:
-        # remove the following words
-        model_name = re.sub('\s(\d(-|\s)?S(EA)?TE?R|\dWD|7S|ABS|AT|D\/AB|EU\d|HID|HSE|S\/C|S\/?R|SDV6|SE|SI\d|SVAB|TC|TSS|\(\w+\))', '', model_name)
-        model_name = _remove_trailing_letters_behind_engine_cc(model_name)
-
-        model_name = re.sub('DISCOVERY 4 3.0', 'DISCOVERY 3.0', model_name)
-        return model_name
-    
-    def _clean_maserati(model_name: str) -> str:
-        # remove the following words
-        model_name = re.sub('\s(\d\.\d|AUTO(MATIC)?|DIESEL|MY15|SR|V6)', '', model_name)
-        return model_name
-    
-    def _clean_mazda(model_name: str) -> str:
-        # remove the following words
-        model_name = re.sub('\s(\d-?D(OO)?R|5SP|\dWD|AT|AUTO|EU6|SP\.6EAT|WAGON)', '', model_name)
-        model_name = _remove_trailing_letters_behind_engine_cc(model_name)
-        return model_name
-    
-    def _clean_mclaren(model_name: str) -> str:
-        # remove the following words
-        model_name = re.sub('MP4 -12C\s', '', model_name)
-        return model_name
-    
-    def _clean_mercedes(model_name: str) -> str:
-        # remove the following words
-        model_name = re.sub('\s(\d\.\d|\dDR|\dWD|A\/?T|ABS|AUTO|BLUEEFFICIENCY|COMPT|D\/AIRBAG|EDITION\s?(1|E)|LINE|LONG|PLUS|PREMIUM|SEDAN|SMT|URBAN)', '', model_name)
-        model_name = _remove_all_words_in_brackets(model_name)
-        model_name = _remove_trailing_words(model_name, ['A'])
-
-        model_name = re.sub('250CGI', '250 CGI', model_name)
-        model_name = re.sub('4M\+', '4MATIC+', model_name)
-        model_name = re.sub('AVG', 'AVANTGARDE', model_name)
-        model_name = re.sub('CAB$', 'CABRIOLET', model_name)
-        model_name = re.sub('C 180', 'C180', model_name)
-        model_name = re.sub('C180K', 'C180 AVANTGARDE', model_name)
-        model_name = re.sub('CLS 350', 'CLS350', model_name)
-        model_name = re.sub('E 200', 'E200', model_name)
-        model_name = re.sub('E 250', 'E250', model_name)
-        model_name = re.sub('SALN', 'SALOON', model_name)
-        model_name = re.sub('SL 350', 'SL350', model_name)
-        model_name = re.sub('SLK 350', 'SLK350', model_name)
+        _remove_trailing_words(['A']),
+    ],
+
+    'HYUNDAI': [
+        # remove the following words
+        ('\s(\dWD|\dDR|ABS|AD|AT|D\/AB|EU6|GLS|S\/R)', ''),
+        ('AD\s', ''),
+        _remove_all_words_in_brackets(),
+        _remove_trailing_words(['S']),
+    ],
+
+    'INFINITI': [
+        # remove the following words
+        ('\s(AWD|A\/T|DCT|EU6|PREMIUM|S\/R)', ''),
+        _remove_trailing_letters_behind_engine_cc(),
+    ],
+
+    'JAGUAR': [
+        # remove the following words
+        ('\s(\dWD|\dDR|\d+PS|V6|ABS|AT|D\/AB|GAS\/D|HID|I4D|PL|RWD|SC|SR|TSS|\(\w+\))', ''),
+        _remove_trailing_letters_behind_engine_cc(),
+    ],
+
+    'JEEP': [
+        # remove the following words
+        ('\s(ABS|A\/BAG|SRT?)', ''),
+        _remove_trailing_letters_behind_engine_cc(),
+    ],
+
+    'KIA': [
+        # remove the following words
+        ('\s(DCT)', ''),
+        _remove_trailing_letters_behind_engine_cc(),
+    ],
+
+    'LAMBORGHINI': [
+        # remove the following words
+        ('\s(SMT)', ''),
+        ('SV J', 'SVJ'),
+    ],
+
+    'LAND ROVER': [
+        # remove the following words
+        ('\s(\d(-|\s)?S(EA)?TE?R|\dWD|7S|ABS|AT|D\/AB|EU\d|HID|HSE|S\/C|S\/?R|SDV6|SE|SI\d|SVAB|TC|TSS|\(\w+\))', ''),
+        _remove_trailing_letters_behind_engine_cc(),
+
+        ('DISCOVERY 4 3.0', 'DISCOVERY 3.0'),
+    ],
+
+    'MASERATI': [
+        # remove the following words
+        ('\s(\d\.\d|AUTO(MATIC)?|DIESEL|MY15|SR|V6)', ''),
+    ],
+
+    'MAZDA': [
+        # remove the following words
+        ('\s(\d-?D(OO)?R|5SP|\dWD|AT|AUTO|EU6|SP\.6EAT|WAGON)', ''),
+        _remove_trailing_letters_behind_engine_cc(),
+    ],
+
+    'MCLAREN': [
+        # remove the following words
+        ('MP4 -12C\s', ''),
+    ],
+
+    'MERCEDES BENZ': [
+        # remove the following words
+        ('\s(\d\.\d|\dDR|\dWD|A\/?T|ABS|AUTO|BLUEEFFICIENCY|COMPT|D\/AIRBAG|EDITION\s?(1|E)|LINE|LONG|PLUS|PREMIUM|SEDAN|SMT|URBAN)', ''),
+        _remove_all_words_in_brackets(),
+        _remove_trailing_words(['A']),
+
+        ('250CGI', '250 CGI'),
+        ('4M\+', '4MATIC+'),
+        ('AVG', 'AVANTGARDE'),
+        ('CAB$', 'CABRIOLET'),
+        ('C 180', 'C180'),
+        ('C180K', 'C180 AVANTGARDE'),
+        ('CLS 350', 'CLS350'),
+        ('E 200', 'E200'),
+        ('E 250', 'E250'),
+        ('SALN', 'SALOON'),
+        ('SL 350', 'SL350'),
+        ('SLK 350', 'SLK350'),
         # standardise "AMG" as the 1st word for AMG types (i.e. 2 numbers)
         # for other series with AMG trims, standardise "AMG" as the 2nd word
-        model_name = re.sub('A45 AMG', 'AMG A45', model_name)
-        model_name = re.sub('C43 AMG', 'AMG C43', model_name)
-        model_name = re.sub('C63 AMG', 'AMG C63', model_name)
-        model_name = re.sub('CLS 63 AMG', 'AMG CLS63', model_name)
-        model_name = re.sub('E63 AMG', 'AMG E63', model_name)
-        model_name = re.sub('G63 AMG', 'AMG G63', model_name)
-        model_name = re.sub('GLE43 AMG', 'AMG GLE43', model_name)
-        model_name = re.sub('GT63 S AMG', 'AMG GT63 S', model_name)
-        model_name = re.sub('^GLC250 4MATIC COUPE AMG$', 'GLC250 AMG 4MATIC COUPE', model_name)
-        model_name = re.sub('COUPE (4MATIC|SPORT)', '4MATIC COUPE', model_name)
-        
+        ('A45 AMG', 'AMG A45'),
+        ('C43 AMG', 'AMG C43'),
+        ('C63 AMG', 'AMG C63'),
+        ('CLS 63 AMG', 'AMG CLS63'),
+        ('E63 AMG', 'AMG E63'),
+        ('G63 AMG', 'AMG G63'),
+        ('GLE43 AMG', 'AMG GLE43'),
+        ('GT63 S AMG', 'AMG GT63 S'),
+        ('^GLC250 4MATIC COUPE AMG$', 'GLC250 AMG 4MATIC COUPE'),
+        ('COUPE (4MATIC|SPORT)', '4MATIC COUPE'),
+
         # standardise model types cause damn Mercedes has so many variations that all sound alike
         # set default type for general sedan to "AVANTGARDE" for simplicity
-        model_name = re.sub('^AMG C63 S$', 'AMG C63 S COUPE', model_name)
-        model_name = re.sub('^AMG G63$', 'AMG G63 4MATIC', model_name)
-        model_name = re.sub('CGI|KOMP(RESSOR)?|SEDAN', 'AVANTGARDE', model_name)
-        model_name = re.sub('^CLA180$', 'CLA180 COUPE', model_name) #FIXME: this is not true
-        model_name = re.sub('^CLA200$', 'CLA200 COUPE', model_name)
-        model_name = re.sub('^E200$', 'E200 AVANTGARDE', model_name)
-        model_name = re.sub('^E250(\sEXCLUSIVE)?$', 'E250 AVANTGARDE', model_name)
-        model_name = re.sub('^E320$', 'E320 AVANTGARDE', model_name)
-        model_name = re.sub('^S400$', 'S400L', model_name)
-        model_name = _remove_text_after_marker(model_name, 'V250')
-        return model_name
-        
-    def _clean_mini(model_name: str) -> str:        
-        # remove the following words
-        model_name = re.sub('\s(\d\.\d|(A|F|\d)WD|ABS|ALL 4 AUTO|A\/?T|D\/A(IR)?B(AG)?|DSC|HB|HID|HUD|LED|NAV|SR|TC)', '', model_name)
-        model_name = _remove_all_words_in_brackets(model_name)
-        
-        model_name = re.sub('2DR', '3DR', model_name)
-        model_name = re.sub('COOP S', 'COOPER S', model_name)
-        model_name = re.sub('CAB-A|CABRIO', 'CABRIOLET', model_name)
-        model_name = re.sub('COUNTRYMAN JCW', 'JCW COUNTRYMAN', model_name)
+        ('^AMG C63 S$', 'AMG C63 S COUPE'),
+        ('^AMG G63$', 'AMG G63 4MATIC'),
+        ('CGI|KOMP(RESSOR)?|SEDAN', 'AVANTGARDE'),
+        ('^CLA180$', 'CLA180 COUPE'), #FIXME: this is not true
+        ('^CLA200$', 'CLA200 COUPE'),
+        ('^E200$', 'E200 AVANTGARDE'),
+        ('^E250(\sEXCLUSIVE)?$', 'E250 AVANTGARDE'),
+        ('^E320$', 'E320 AVANTGARDE'),
+        ('^S400$', 'S400L'),
+        _remove_text_after_marker('V250'),
+    ],
+
+    'MINI': [
+        # remove the following words
+        ('\s(\d\.\d|(A|F|\d)WD|ABS|ALL 4 AUTO|A\/?T|D\/A(IR)?B(AG)?|DSC|HB|HID|HUD|LED|NAV|SR|TC)', ''),
+        _remove_all_words_in_brackets(),
+
+        ('2DR', '3DR'),
+        ('COOP S', 'COOPER S'),
+        ('CAB-A|CABRIO', 'CABRIOLET'),
+        ('COUNTRYMAN JCW', 'JCW COUNTRYMAN'),
 
         # standardise model names
-        model_name = re.sub('JCW 3DR LCI', 'JCW COUNTRYMAN', model_name)
-        return model_name
-    
-    def _clean_mitsubishi(model_name: str) -> str:
-        # remove the following words
-        model_name = re.sub('\s(LANC|5MT|SUNROOF)', '', model_name)
-        model_name = re.sub('^LANC\s', '', model_name)
-        return model_name
-    
-    def _clean_nissan(model_name: str) -> str:
-        # remove the following words
-        model_name = re.sub('\s(\dDR|\d-STR|\dWD|ABS|AUTO|CVT|D\/AIRBAG|DIG-T|S\/R)', '', model_name)
-        model_name = _remove_trailing_letters_behind_engine_cc(model_name)
-        model_name = _remove_trailing_words(model_name, ['A'])
-        return model_name
-    
-    def _clean_peugeot(model_name: str) -> str:
-        # remove the following words
-        model_name = re.sub('\s(AUTO)', '', model_name)
-        return model_name
-    
-    def _clean_porsche(model_name: str) -> str:        
-        # remove the following words
-        model_name = _remove_all_words_in_brackets(model_name)
-        model_name = re.sub('\s(\d\.\d|(A|\d)WD|(\d|S)MT|A\/T|ABS|AUTO|COUPE|CYP|D\/AIRBAG|DIESEL|E\d|EDITION|G2|PDK|S\/R|SES|S(UN)?R(OOF)?|TIP(TRONIC)?|V\d|W\/\w+|WO)', '', model_name)
-        model_name = _remove_trailing_words(model_name, ['A'])
-        
-        model_name = re.sub('PORSCHE CAYENNE TURBO', 'CAYENNE TURBO', model_name)
-        model_name = re.sub('911SCOUPETIP', '911 CARRERA S', model_name)
-        model_name = re.sub('CARRERAS\(991\)', 'CARRERA S', model_name)
-        model_name = re.sub('^PORSCHE 911 GT3$', '911 GT3', model_name)
-        model_name = re.sub('CAB\s', 'CABRIOLET ', model_name)
-        model_name = re.sub('CAB$', 'CABRIOLET', model_name)
-        model_name = re.sub('EXEC\s', 'EXECUTIVE ', model_name)
-        model_name = re.sub('EXEC$', 'EXECUTIVE', model_name)
+        ('JCW 3DR LCI', 'JCW COUNTRYMAN'),
+    ],
+
+    'MITSUBISHI': [
+        # remove the following words
+        ('\s(LANC|5MT|SUNROOF)', ''),
+        ('^LANC\s', ''),
+    ],
+
+    'NISSAN': [
+        # remove the following words
+        ('\s(\dDR|\d-STR|\dWD|ABS|AUTO|CVT|D\/AIRBAG|DIG-T|S\/R)', ''),
+        _remove_trailing_letters_behind_engine_cc(),
+        _remove_trailing_words(['A']),
+    ],
+
+    'PEUGEOT': [
+        # remove the following words
+        ('\s(AUTO)', ''),
+    ],
+
+    'PORSCHE': [
+        # remove the following words
+        _remove_all_words_in_brackets(),
+        ('\s(\d\.\d|(A|\d)WD|(\d|S)MT|A\/T|ABS|AUTO|COUPE|CYP|D\/AIRBAG|DIESEL|E\d|EDITION|G2|PDK|S\/R|SES|S(UN)?R(OOF)?|TIP(TRONIC)?|V\d|W\/\w+|WO)', ''),
+        _remove_trailing_words(['A']),
+
+        ('PORSCHE CAYENNE TURBO', 'CAYENNE TURBO'),
+        ('911SCOUPETIP', '911 CARRERA S'),
+        ('CARRERAS\(991\)', 'CARRERA S'),
+        ('^PORSCHE 911 GT3$', '911 GT3'),
+        ('CAB\s', 'CABRIOLET '),
+        ('CAB$', 'CABRIOLET'),
+        ('EXEC\s', 'EXECUTIVE '),
+        ('EXEC$', 'EXECUTIVE'),
 
         # standardise model types
-        model_name = re.sub('^MACAN$', 'MACAN II', model_name)
-        model_name = re.sub('^MACAN S$', 'MACAN S II', model_name)
-        model_name = re.sub('^MACAN TURBO$', 'MACAN TURBO II', model_name)
-        return model_name
-    
-    def _clean_renault(model_name: str) -> str:
-        # remove the following words
-        model_name = re.sub('\s(\d\.\d|AT|EU6)', '', model_name)
-        return model_name
-    
-    def _clean_rolls_royce(model_name: str) -> str:
-        # remove the following words
-        model_name = re.sub('\s(\d.\d\w?|\dDR|\dWD|\d-SEAT|ABS|A\/?T|AUTO|D\/A(IR)?B(AG)?|COUPE|GAS\/D|HID|MY\d{2}|NAV|S\/R|SEDAN|SERIES II|SR|TC|TV|V12)', '', model_name)
-        model_name = _remove_all_words_in_brackets(model_name)
-        model_name = _remove_trailing_words(model_name, ['A'])
-        
-        model_name = re.sub('EXTENDED WHEELBASE', 'EWB', model_name)
-        return model_name
-    
-    def _clean_ruf(model_name: str) -> str:
-        # remove the following words
-        model_name = re.sub('\s(SMT)', '', model_name)
-        return model_name
-    
-    def _clean_seat(model_name: str) -> str:
-        # remove the following words
-        model_name = re.sub('\s(\d.\d|\dAT|STYLE|TSI)', '', model_name)
-        
-        model_name = re.sub('XCELL', 'XCELLENCE', model_name)
-        return model_name
-    
-    def _clean_skoda(model_name: str) -> str:
-        # remove the following words
-        model_name = re.sub('\s(\d.\d|4x4|TSI)', '', model_name)
-        
-        model_name = re.sub('L&K', 'LAURIN&KLEMENT', model_name)
-        model_name = _remove_all_words_in_brackets(model_name)
-        return model_name
-    
-    def _clean_subaru(model_name: str) -> str:
-        # remove the following words
-        model_name = re.sub('\s(\dDR?|ABS|AIRBAG|\d?AT|AWD|CVT|EYESIGHT|SR)', '', model_name)
-
-        model_name = re.sub('2.0XT', '2.0I-L', model_name)
-        model_name = re.sub('IMPREZA 1.5R', 'IMPREZA 1.5', model_name)
-        model_name = re.sub('WRX STI 2.0M', 'WRX STI 2.0', model_name)
-        return model_name
-    
-    def _clean_suzuki(model_name: str) -> str:
-        model_name = re.sub('\s(AT|CVT|GLX)', '', model_name)
-        model_name = _remove_trailing_letters_behind_engine_cc(model_name)
-        model_name = _remove_trailing_words(model_name, ['A'])
-        return model_name
-    
-    def _clean_toyota(model_name: str) -> str:
-        model_name = re.sub('TOYOTA / TOYOTA /', 'TOYOTA /', model_name)
-        model_name = re.sub('ESTIMA', 'PREVIA', model_name)
-
-        # remove the following words
-        model_name = re.sub('\s(7(\s|-)SEATER|\dDR|\dWD|ABS|A\/?T|(D\/)?AIRBAG|AUTO|CVT|EDITION|EXECUTIVE\sLOUNGE|G\'S|M(OON)?R(OOF)?|PACKAGE|PLATINUM|PREMIUM|S\/R|SEDAN|SELECTION|ST(ANDAR)?D|SUV)', '', model_name)
-        model_name = re.sub('^TOYOTA ', '', model_name)
-        model_name = re.sub('-PACKAGE', '', model_name)
-        model_name = _remove_all_words_in_brackets(model_name)
-        model_name = _remove_trailing_words(model_name, ['A', 'M'])
-        
+        ('^MACAN$', 'MACAN II'),
+        ('^MACAN S$', 'MACAN S II'),
+        ('^MACAN TURBO$', 'MACAN TURBO II'),
+    ],
+
+    'RENAULT': [
+        # remove the following words
+        ('\s(\d\.\d|AT|EU6)', ''),
+    ],
+
+    'ROLLS ROYCE': [
+        # remove the following words
+        ('\s(\d.\d\w?|\dDR|\dWD|\d-SEAT|ABS|A\/?T|AUTO|D\/A(IR)?B(AG)?|COUPE|GAS\/D|HID|MY\d{2}|NAV|S\/R|SEDAN|SERIES II|SR|TC|TV|V12)', ''),
+        _remove_all_words_in_brackets(),
+        _remove_trailing_words(['A']),
+
+        ('EXTENDED WHEELBASE', 'EWB'),
+    ],
+
+    'RUF': [
+        # remove the following words
+        ('\s(SMT)', ''),
+    ],
+
+    'SEAT': [
+        # remove the following words
+        ('\s(\d.\d|\dAT|STYLE|TSI)', ''),
+
+        ('XCELL', 'XCELLENCE'),
+    ],
+
+    'SKODA': [
+        # remove the following words
+        ('\s(\d.\d|4x4|TSI)', ''),
+
+        ('L&K', 'LAURIN&KLEMENT'),
+        _remove_all_words_in_brackets(),
+    ],
+
+    'SUBARU': [
+        # remove the following words
+        ('\s(\dDR?|ABS|AIRBAG|\d?AT|AWD|CVT|EYESIGHT|SR)', ''),
+
+        ('2.0XT', '2.0I-L'),
+        ('IMPREZA 1.5R', 'IMPREZA 1.5'),
+        ('WRX STI 2.0M', 'WRX STI 2.0'),
+    ],
+
+    'SUZUKI': [
+        ('\s(AT|CVT|GLX)', ''),
+        _remove_trailing_letters_behind_engine_cc(),
+        _remove_trailing_words(['A']),
+    ],
+
+    'TOYOTA': [
+        ('TOYOTA / TOYOTA /', 'TOYOTA /'),
+        ('ESTIMA', 'PREVIA'),
+
+        # remove the following words
+        ('\s(7(\s|-)SEATER|\dDR|\dWD|ABS|A\/?T|(D\/)?AIRBAG|AUTO|CVT|EDITION|EXECUTIVE\sLOUNGE|G\'S|M(OON)?R(OOF)?|PACKAGE|PLATINUM|PREMIUM|S\/R|SEDAN|SELECTION|ST(ANDAR)?D|SUV)', ''),
+        ('^TOYOTA ', ''),
+        ('-PACKAGE', ''),
+        _remove_all_words_in_brackets(),
+        _remove_trailing_words(['A', 'M']),
+
         # standardise Alphard model types cause somehow Alphard has so many different variations
-        model_name = re.sub('2.5S', '2.5 S', model_name)
-        model_name = re.sub('2.5 SA', '2.5 S-A', model_name)
-        model_name = re.sub('2.5\s?S(-|\s)?C-?', '2.5 S-C', model_name)
-        model_name = re.sub('3.5SA-C', '3.5 SA-C', model_name)
-        model_name = re.sub('3.5SC', '3.5 S-C', model_name)
-        model_name = re.sub('^ALPHARD 3.5$', 'ALPHARD 3.5 S-C', model_name)
-        model_name = re.sub('ALPHARD ELEGANCE', 'ALPHARD 2.5 ELEGANCE', model_name)
+        ('2.5S', '2.5 S'),
+        ('2.5 SA', '2.5 S-A'),
+        ('2.5\s?S(-|\s)?C-?', '2.5 S-C'),
+        ('3.5SA-C', '3.5 SA-C'),
+        ('3.5SC', '3.5 S-C'),
+        ('^ALPHARD 3.5$', 'ALPHARD 3.5 S-C'),
+        ('ALPHARD ELEGANCE', 'ALPHARD 2.5 ELEGANCE'),
         # and also Vellfire
-        model_name = re.sub('2.5Z-?', '2.5 Z', model_name)
-        model_name = re.sub('ZG(\sEDITION)?', 'Z G-EDITION', model_name)
-        model_name = re.sub('2.4X', '2.4 X', model_name)
-        model_name = re.sub('2.4Z', '2.4 Z', model_name)
-        model_name = re.sub('2.5X', '2.5 X', model_name)
-        model_name = re.sub('Z G-EDITION 3.5', '3.5 Z G-EDITION', model_name)
-        model_name = re.sub('3.5VL?', '3.5 V', model_name)
-        model_name = re.sub('3.5Z', '3.5 Z', model_name)
-        model_name = re.sub('3.5ZA', '3.5 ZA', model_name)
-        model_name = re.sub('VELLFIRE ELEGANCE', 'VELLFIRE 2.5', model_name)
+        ('2.5Z-?', '2.5 Z'),
+        ('ZG(\sEDITION)?', 'Z G-EDITION'),
+        ('2.4X', '2.4 X'),
+        ('2.4Z', '2.4 Z'),
+        ('2.5X', '2.5 X'),
+        ('Z G-EDITION 3.5', '3.5 Z G-EDITION'),
+        ('3.5VL?', '3.5 V'),
+        ('3.5Z', '3.5 Z'),
+        ('3.5ZA', '3.5 ZA'),
+        ('VELLFIRE ELEGANCE', 'VELLFIRE 2.5'),
         # and for Noah
-        model_name = re.sub('2.0X', '2.0 X', model_name)
-        model_name = re.sub('1.8X', '1.8 X', model_name)
+        ('2.0X', '2.0 X'),
+        ('1.8X', '1.8 X'),
         # Lexus
-        model_name = re.sub('ES300H$', 'ES300H EXECUTIVE', model_name)
+        ('ES300H$', 'ES300H EXECUTIVE'),
         # general
-        model_name = re.sub('8 SEATER', '8-SEATER', model_name)
-        model_name = re.sub('ALTIS 1.6L$', 'ALTIS 1.6', model_name)
-        model_name = re.sub('^HARRIER(\sELEGANCE)? 2.0$', 'HARRIER 2.0 ELEGANCE', model_name)
-        model_name = re.sub('HYBRID 2.5G$', 'HYBRID 2.5', model_name)
-        model_name = re.sub('^PREVIA(\sHYBRID)? 2.4 X$', 'PREVIA AERAS 2.4', model_name)
-        model_name = re.sub('RUSH 1.5G$', 'RUSH 1.5', model_name)
-        model_name = re.sub('VIOS 1.5E$', 'VIOS 1.5', model_name)
-        
-        return model_name
-    
-    def _clean_volkswagen(model_name: str) -> str:
-        # remove the following words
-        model_name = re.sub('\s(90|\d\w\d{2}\w{2}|280|A\/?T|A7|CL|GP|HID|HLG?|LED|SR|STYLE|TSI|W\/O)', '', model_name)
-        
-        model_name = re.sub('^GOLF TL$', 'GOLF 1.4', model_name)
-        return model_name
-    
-    def _clean_volvo(model_name: str) -> str:
-        # remove the following words
-        model_name = re.sub('\s(\d\.\d|\dWD|\dDR|ABS|AUTO|D\/AB|TURBO)', '', model_name)
-        model_name = _remove_all_words_in_brackets(model_name)
-        return model_name
+        ('8 SEATER', '8-SEATER'),
+        ('ALTIS 1.6L$', 'ALTIS 1.6'),
+        ('^HARRIER(\sELEGANCE)? 2.0$', 'HARRIER 2.0 ELEGANCE'),
+        ('HYBRID 2.5G$', 'HYBRID 2.5'),
+        ('^PREVIA(\sHYBRID)? 2.4 X$', 'PREVIA AERAS 2.4'),
+        ('RUSH 1.5G$', 'RUSH 1.5'),
+        ('VIOS 1.5E$', 'VIOS 1.5'),
+
+    ],
+
+    'VOLKSWAGEN': [
+        # remove the following words
+        ('\s(90|\d\w\d{2}\w{2}|280|A\/?T|A7|CL|GP|HID|HLG?|LED|SR|STYLE|TSI|W\/O)', ''),
+
+        ('^GOLF TL$', 'GOLF 1.4'),
+    ],
+
+    'VOLVO': [
+        # remove the following words
+        ('\s(\d\.\d|\dWD|\dDR|ABS|AUTO|D\/AB|TURBO)', ''),
+        _remove_all_words_in_brackets(),
+    ],
+}
+
+# Compilation of cleaning rules
+
+# A compiled rule is a (guard, is_suffix, pattern, replacement) tuple, where
+# the rule is only applied if one of the guard literals is found in the string,
+# or if the string ends with one of them when the pattern is anchored at its
+# end. Literal rules have no pattern and are applied with `str.replace`.
+CompiledRule = Tuple[Tuple[str, ...], bool, Optional[Pattern], str]
+
+# Characters that are given a special meaning by `re` when unescaped
+_REGEX_METACHARS = set('.^$*+?{}[]()|\\')
+# Escape sequences that do not stand for a literal character
+_REGEX_CLASS_ESCAPES = set('AbBdDsSwWZ0123456789')
+# Maximum number of literals in a guard, beyond which checking each of them
+# takes longer than scanning the string with the pattern
+_GUARD_MAX_LITERALS = 4
+
+def _split_alternatives(pattern: str) -> List[str]:
+    """Splits a regex pattern at its top-level alternations."""
+
+    alternatives = []
+    start, depth, i = 0, 0, 0
+    while i < len(pattern):
+        c = pattern[i]
+        if c == '\\':
+            i += 1
+        elif c == '[':
+            i = pattern.index(']', i + 2)
+        elif c in '()':
+            depth += 1 if c == '(' else -1
+        elif c == '|' and not depth:
+            alternatives.append(pattern[start:i])
+            start = i + 1
+        i += 1
+    alternatives.append(pattern[start:])
+    return alternatives
+
+def _parse_literal_runs(pattern: str) \
+        -> Tuple[List[Tuple[str, ...]], Optional[Tuple[str, ...]], bool]:
+    """Splits a regex pattern into the literals that every match must contain.
+
+    Each requirement is a tuple of literals, one of which every match must
+    contain: either a run of literal characters, or the literal alternatives
+    of a group with alternation. Groups are only inspected if they are
+    neither optional nor negative lookarounds, and a run is ended by any
+    other regex syntax. Characters that are made optional by a quantifier
+    are dropped.
+
+    Args:
+        pattern: Regex pattern
+
+    Returns:
+        List of requirements in the order they appear; a pattern with a
+        top-level alternation only requires 1 literal of each alternative.
+        Literals one of which every match must end with, if the pattern is
+        anchored at its end by `$`, else None.
+        Whether the pattern is a pure literal.
+    """
+
+    runs = []
+    run = ''
+    suffixes = None
+    # literal alternatives of the last group, if all of them are literals
+    group_literals = None
+    i = 0
+    while i < len(pattern):
+        c = pattern[i]
+        group_runs = []
+        if c == '|':
+            # every match contains 1 literal of one of the alternatives
+            runs, _ = _parse_group(pattern)
+            return runs, None, False
+        if c == '$' and i == len(pattern) - 1:
+            if run:
+                suffixes = (run,)
+            elif group_literals is not None:
+                suffixes = group_literals
+        group_literals = None
+        if c == '\\' and i + 1 < len(pattern) \
+                and pattern[i + 1] not in _REGEX_CLASS_ESCAPES:
+            atom, i = pattern[i + 1], i + 2
+        elif c == '(':
+            start, depth = i + 1, 1
+            while depth:
+                i += 1
+                if pattern[i] == '\\':
+                    i += 1
+                elif pattern[i] in '()':
+                    depth += 1 if pattern[i] == '(' else -1
+            group = re.sub('^\?(:|<?=)', '', pattern[start:i])
+            if not group.startswith('?'):
+                group_runs, group_literals = _parse_group(group)
+            atom, i = None, i + 1
+        elif c == '[':
+            atom, i = None, pattern.index(']', i + 2) + 1
+        elif c in _REGEX_METACHARS:
+            atom, i = None, i + (2 if c == '\\' else 1)
+        else:
+            atom, i = c, i + 1
+
+        is_optional = i < len(pattern) and pattern[i] in '?*{'
+        is_repeated = i < len(pattern) and pattern[i] == '+'
+        if atom is not None and not is_optional:
+            run += atom
+        if atom is None or is_optional or is_repeated:
+            runs.append((run,))
+            run = ''
+        if is_optional or is_repeated:
+            group_literals = None
+        if not is_optional:
+            runs.extend(group_runs)
+    runs.append((run,))
+
+    is_literal = len(runs) == 1
+    return [x for x in runs if all(x)], suffixes, is_literal
+
+def _parse_group(group: str) -> Tuple[List[Tuple[str, ...]], Optional[Tuple[str, ...]]]:
+    """Finds the literals that every match of the contents of a group must
+    contain, as in `_parse_literal_runs`.
+
+    Args:
+        group: Regex pattern inside the group
+
+    Returns:
+        List of requirements; a group with alternation requires 1 literal of
+        each alternative, if each of them has one.
+        The literal alternatives of the group, if all of them are literals,
+        else None.
+    """
+
+    alternatives = [_parse_literal_runs(x) for x in _split_alternatives(group)]
+    if len(alternatives) == 1:
+        runs, _, is_literal = alternatives[0]
+        return runs, runs[0] if is_literal and runs else None
+
+    literals = tuple(max(runs, key=lambda x: len(x[0]))[0] if runs else ''
+                     for runs, _, _ in alternatives)
+    is_literal = all(x for _, _, x in alternatives)
+    return [literals] if all(literals) else [], literals if is_literal else None
+
+def _get_guard(pattern: str) -> Tuple[Tuple[str, ...], bool]:
+    """Returns the guard of a regex pattern: the literals that every match must
+    either end with, or else contain, one of.
+
+    A suffix guard is preferred. Otherwise, the requirement whose shortest
+    literal is the longest is taken, as it is found in the fewest strings.
+    The guard is empty if the pattern has no requirement, in which case the
+    rule is always applied.
+    """
+
+    runs, suffixes, _ = _parse_literal_runs(pattern)
+    if suffixes is not None and len(suffixes) <= _GUARD_MAX_LITERALS:
+        # `$` also matches before a trailing newline
+        return suffixes + tuple(f'{x}\n' for x in suffixes), True
+
+    runs = [x for x in runs if len(x) <= _GUARD_MAX_LITERALS]
+    guard = max(runs, key=lambda x: (min(len(y) for y in x), -len(x)), default=('',))
+    return guard, False
+
+def _compile_rules(rules: List[Rule]) -> List[CompiledRule]:
+    """Compiles an ordered list of cleaning rules.
+
+    Regex patterns are compiled once and guarded by the literals that every
+    match must contain one of, or end with one of, so that strings without
+    them are not scanned.
+    Patterns without any regex syntax are substituted as plain strings.
+
+    Args:
+        rules: Cleaning rules for a car make
+
+    Returns:
+        Compiled rules, in the same order.
+    """
+
+    compiled_rules = []
+    for pattern, replacement in rules:
+        runs, _, is_literal = _parse_literal_runs(pattern)
+        if is_literal and '\\' not in replacement:
+            compiled_rules.append((runs[0], False, None, replacement))
+        else:
+            guard, is_suffix = _get_guard(pattern)
+            compiled_rules.append((guard, is_suffix, re.compile(pattern), replacement))
+
+    return compiled_rules
+
+def _apply_rules(compiled_rules: List[CompiledRule], model_name: str) -> str:
+    """Applies compiled cleaning rules to a model name in a single pass
+    over the rules."""
+
+    for guard, is_suffix, pattern, replacement in compiled_rules:
+        if is_suffix:
+            is_guard_found = model_name.endswith(guard)
+        else:
+            is_guard_found = False
+            for literal in guard:
+                if literal in model_name:
+                    is_guard_found = True
+                    break
+        if is_guard_found:
+            if pattern is None:
+                model_name = model_name.replace(guard[0], replacement)
+            else:
+                model_name = pattern.sub(replacement, model_name)
+    return model_name
+
+def _apply_rules_vectorized(compiled_rules: List[CompiledRule],
+                            model_names: 'pd.Series') -> 'pd.Series':
+    """Applies compiled cleaning rules to a batch of model names, where each
+    rule is a single vectorized string operation over the model names that
+    contain its guard literals."""
+
+    model_names = model_names.copy()
+    for guard, is_suffix, pattern, replacement in compiled_rules:
+        if is_suffix:
+            mask = model_names.map(lambda x: x.endswith(guard)).astype(bool)
+        else:
+            mask = model_names.str.contains(guard[0], regex=False)
+            for literal in guard[1:]:
+                mask |= model_names.str.contains(literal, regex=False)
+        if mask.any():
+            model_names[mask] = model_names[mask].str.replace(
+                guard[0] if pattern is None else pattern,
+                replacement,
+                regex=pattern is not None)
+    return model_names
+
+# Cleaning rules for each car make, compiled once per process
+MAKE_TO_COMPILED_RULES_MAPPING: Dict[str, List[CompiledRule]] = {
+    make: _compile_rules(rules)
+    for make, rules in MAKE_TO_RULES_MAPPING.items()
+}
+
+# Cleaning functions for each car make
+MAKE_TO_CLEAN_FN_MAPPING: Dict[str, Callable[[str], str]] = {
+    make: partial(_apply_rules, compiled_rules)
+    for make, compiled_rules in MAKE_TO_COMPILED_RULES_MAPPING.items()
+}
+
+def clean_model_name(s: str) -> str:
+    """Performs cleaning of the car model name, if the input string is so.
+
+    The cleaning rules of each car make are defined in `MAKE_TO_RULES_MAPPING`
+    and compiled into `MAKE_TO_CLEAN_FN_MAPPING` when this module is imported.
+    If profiling is enabled, the rules are applied through `profiler`.
+
+    Args:
+        s: Input string
+
+    Returns:
+        Cleaned model name if input string was a car model name.
+        Else, the input string is returned as it is.
+    """
 
     # First, check if the input string is of a car type structure
     # If not, simply return the string
     if not general.is_car_type(s):
         return s
 
-    # Mapping of car make to the corresponding cleaning function
-    make_to_clean_fn_mapping = {
-        'ALFA ROMEO': _clean_alfa_romeo,
-        'ALPINA': _clean_alpina,
-        'ASTON MARTIN': _clean_aston_martin,
-        'AUDI': _clean_audi,
-        'B.M.W.': _clean_bmw,
-        'BENTLEY': _clean_bentley,
-        'CITROEN': _clean_citroen,
-        'FERRARI': _clean_ferrari,
-        'FIAT': _clean_fiat,
-        'FORD': _clean_ford,
-        'HONDA': _clean_honda,
-        'HUMMER': _clean_hummer,
-        'HYUNDAI': _clean_hyundai,
-        'INFINITI': _clean_infiniti,
-        'JAGUAR': _clean_jaguar,
-        'JEEP': _clean_jeep,
-        'KIA': _clean_kia,
-        'LAMBORGHINI': _clean_lamborghini,
-        'LAND ROVER': _clean_land_rover,
-        'MASERATI': _clean_maserati,
-        'MAZDA': _clean_mazda,
-        'MCLAREN': _clean_mclaren,
-        'MERCEDES BENZ': _clean_mercedes,
-        'MINI': _clean_mini,
-        'MITSUBISHI': _clean_mitsubishi,
-        'NISSAN': _clean_nissan,
-        'PEUGEOT': _clean_peugeot,
-        'PORSCHE': _clean_porsche,
-        'RENAULT': _clean_renault,
-        'ROLLS ROYCE': _clean_rolls_royce,
-        'RUF': _clean_ruf,
-        'SEAT': _clean_seat,
-        'SKODA': _clean_skoda,
-        'SUBARU': _clean_subaru,
-        'SUZUKI': _clean_suzuki,
-        'TOYOTA': _clean_toyota,
-        'VOLKSWAGEN': _clean_volkswagen,
-        'VOLVO': _clean_volvo,
-    }
-    
     make, model_name = s.split(' / ')
-    if make in make_to_clean_fn_mapping:
-        model_name = make_to_clean_fn_mapping[make](model_name)
-   
-    return f'{make} / {model_name}'
+    if make not in MAKE_TO_CLEAN_FN_MAPPING:
+        return s
+
+    if profiler.is_enabled():
+        model_name_tfm = profiler.apply_rules(
+            make,
+            MAKE_TO_COMPILED_RULES_MAPPING[make],
+            _apply_rules,
+            model_name)
+    else:
+        model_name_tfm = MAKE_TO_CLEAN_FN_MAPPING[make](model_name)
+
+    # the car type is only rebuilt if the rules changed the model name
+    if model_name_tfm == model_name:
+        return s
+    return f'{make} / {model_name_tfm}'
+
+def clean_model_names(batch: Union['pd.Series', 'np.ndarray']) -> 'pd.Series':
+    """Vectorized version of `clean_model_name` over a batch of cells.
+
+    Each distinct car type in the batch is cleaned once. The make is split
+    from the model name for all of them at once, and the cleaning rules of
+    each make are applied to all of its model names at once.
+
+    Args:
+        batch: Series or array of cell values
+
+    Returns:
+        Series of the results of `clean_model_name` for each cell, with the
+        same index as the input Series.
+    """
+
+    # only the batch API needs pandas, so the scalar cleaner loads without it
+    import pandas as pd
+
+    cells = pd.Series(batch, dtype=object)
+    cells_tfm = cells.copy()
+
+    is_car_type = general.are_car_types(cells)
+    if not is_car_type.any():
+        return cells_tfm
+
+    car_types = pd.Series(pd.unique(cells[is_car_type]), dtype=object)
+    car_types_split = car_types.str.split(' / ')
+    n_parts = car_types_split.str.len()
+    if (n_parts != 2).any():
+        # same as unpacking the split in `clean_model_name`
+        raise ValueError(f'Car types must contain exactly 1 " / ": '
+                         f'{car_types[n_parts != 2].iloc[0]}')
+    makes = car_types_split.str[0]
+    model_names = car_types_split.str[1]
+
+    for make, model_names_make in model_names.groupby(makes, sort=False):
+        if make in MAKE_TO_COMPILED_RULES_MAPPING:
+            if profiler.is_enabled():
+                model_names[model_names_make.index] = profiler.apply_rules(
+                    make,
+                    MAKE_TO_COMPILED_RULES_MAPPING[make],
+                    _apply_rules_vectorized,
+                    model_names_make)
+            else:
+                model_names[model_names_make.index] = _apply_rules_vectorized(
+                    MAKE_TO_COMPILED_RULES_MAPPING[make],
+                    model_names_make)
+
+    car_types_tfm = dict(zip(car_types, makes + ' / ' + model_names))
+    cells_tfm[is_car_type] = cells[is_car_type].map(car_types_tfm)
+    return cells_tfm
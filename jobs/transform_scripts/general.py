@@ -1,29 +1,49 @@
-import re
+from . import plates
 
 """
 general.py contains all of the general functions used in the Transform phase.
 """
 
+# Prefixes of the values that are neither car types nor VRN letters,
+# e.g. headers and empty plates
+_NON_CAR_TYPE_PREFIXES = ('Series', '-')
+
+def _is_vrn_letters(s: str) -> bool:
+    """Checks if the string matches the VRN letter structure.
+
+    4 possible variants:
+    1. 1-letter S
+    2. 2-letter starting with S, e.g. SB
+    3. 2-letter starting with E, e.g. EP
+    4. 3-letter starting with S, e.g. SDD
+
+    The string is looked up in `plates.VRN_PREFIXES`, the letter prefixes of
+    the prefix codes in `plates.VRN_PREFIX_CODES`.
+    """
+    return s in plates.VRN_PREFIXES
+
 def is_car_type(s: str) -> bool:
     """Checks if the string represents a car type in the form of
     '{make} / {model}'.
     """
-    
-    def _is_vrn_letters(s: str) -> bool:
-        """Checks if the string matches the VRN letter structure.
-        
-        4 possible variants:
-        1. 1-letter S
-        2. 2-letter starting with S, e.g. SB
-        3. 2-letter starting with E, e.g. EP
-        4. 3-letter starting with S, e.g. SDD
-        """
-        return s.isalpha() \
-            and (re.match('^S$', s) is not None \
-                or re.match('^(S|E)[A-Z]$', s) is not None \
-                or re.match('^(S)[A-Z]{2}$', s) is not None)   
-    
-    return not (s.isnumeric()
+
+    return not (s == ''
+                or s.isnumeric()
                 or _is_vrn_letters(s)
-                or re.match('Series|-', s) is not None
-                or s == '')
+                or s.startswith(_NON_CAR_TYPE_PREFIXES))
+
+def are_car_types(cells: 'pd.Series') -> 'pd.Series':
+    """Vectorized version of `is_car_type` over a batch of cells.
+
+    Args:
+        cells: Series of cell values
+
+    Returns:
+        Boolean Series of whether each cell is a car type.
+    """
+
+    is_vrn_letters = cells.isin(plates.VRN_PREFIXES)
+    return ~(cells.str.isnumeric()
+             | is_vrn_letters
+             | cells.str.startswith(_NON_CAR_TYPE_PREFIXES)
+             | (cells == ''))
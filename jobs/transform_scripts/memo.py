@@ -0,0 +1,113 @@
+from collections import OrderedDict
+from typing import Any, Callable, Dict
+
+from . import cleaners, general
+from utils import constants
+
+"""
+memo.py contains the memoizing caches placed in front of the cell cleaning
+and car type detection functions.
+
+The caches are module-level, so each Python worker process holds its own set
+of caches that persists across the tasks it runs.
+"""
+
+class MemoCache(object):
+    """Bounded memoizing cache for a function of a single cell value.
+
+    Args:
+        fn: Function to be memoized
+        maxsize: Maximum number of entries; 0 disables caching
+        eviction: Eviction policy, either "lru" or "fifo"
+    """
+
+    def __init__(self,
+                 fn: Callable[[str], Any],
+                 maxsize: int,
+                 eviction: str):
+        if eviction not in (constants.CACHE_EVICTION_LRU,
+                            constants.CACHE_EVICTION_FIFO):
+            raise ValueError(f'Unknown cache eviction policy "{eviction}"')
+
+        self.fn = fn
+        self.maxsize = maxsize
+        self.eviction = eviction
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __call__(self, s: str) -> Any:
+        try:
+            value = self.entries[s]
+        except KeyError:
+            self.misses += 1
+            value = self.fn(s)
+            if self.maxsize > 0:
+                if len(self.entries) >= self.maxsize:
+                    self.entries.popitem(last=False)
+                    self.evictions += 1
+                self.entries[s] = value
+            return value
+
+        self.hits += 1
+        if self.eviction == constants.CACHE_EVICTION_LRU:
+            self.entries.move_to_end(s)
+        return value
+
+    def get_stats(self) -> Dict[str, int]:
+        return {
+            constants.CACHE_HITS: self.hits,
+            constants.CACHE_MISSES: self.misses,
+            constants.CACHE_EVICTIONS: self.evictions,
+        }
+
+def _create_caches(maxsize: int, eviction: str) -> Dict[str, MemoCache]:
+    return {
+        'clean_raw_data': MemoCache(cleaners.clean_raw_data, maxsize, eviction),
+        'clean_model_name': MemoCache(cleaners.clean_model_name, maxsize, eviction),
+        'is_car_type': MemoCache(general.is_car_type, maxsize, eviction),
+    }
+
+_caches = _create_caches(constants.CACHE_DEFAULT_SIZE, constants.CACHE_EVICTION_LRU)
+
+def configure(maxsize: int, eviction: str) -> None:
+    """Sets the size and eviction policy of the caches in this process.
+
+    The caches are only recreated, and hence emptied, if the settings changed.
+
+    Args:
+        maxsize: Maximum number of entries per cache; 0 disables caching
+        eviction: Eviction policy, either "lru" or "fifo"
+    """
+
+    global _caches
+    cache = _caches['is_car_type']
+    if (cache.maxsize, cache.eviction) != (maxsize, eviction):
+        _caches = _create_caches(maxsize, eviction)
+    return None
+
+def get_stats() -> Dict[str, Dict[str, int]]:
+    """Returns the hits, misses and evictions of each cache in this process."""
+    return {name: cache.get_stats() for name, cache in _caches.items()}
+
+def diff_stats(stats: Dict[str, Dict[str, int]],
+               stats_prev: Dict[str, Dict[str, int]]) -> Dict[str, Dict[str, int]]:
+    """Returns the change in cache stats between 2 calls of `get_stats`."""
+    return {
+        name: {k: v - stats_prev.get(name, {}).get(k, 0)
+               for k, v in cache_stats.items()}
+        for name, cache_stats in stats.items()
+    }
+
+def clean_raw_data(s: str) -> str:
+    """Memoized version of `cleaners.clean_raw_data`."""
+    return _caches['clean_raw_data'](s)
+
+def clean_model_name(s: str) -> str:
+    """Memoized version of `cleaners.clean_model_name`."""
+    return _caches['clean_model_name'](s)
+
+def is_car_type(s: str) -> bool:
+    """Memoized version of `general.is_car_type`."""
+    return _caches['is_car_type'](s)
@@ -0,0 +1,217 @@
+import numpy as np
+import os
+import string
+from typing import Optional, Tuple, Union
+
+"""
+plates.py contains the compact representation of a vehicle registration
+plate, e.g. "SKA1L", which packs its letter prefix, plate number and checksum
+letter into a single integer.
+
+From the most significant bits, a packed plate is made of:
+- 15 bits - the prefix code, which is the letters of the prefix in base 27,
+    with "A" to "Z" as 1 to 26, e.g. "SKA" is 19 * 27^2 + 11 * 27 + 1
+- 14 bits - the plate number, from 1 to 9999, or 0 for a prefix alone
+- 5 bits - the checksum letter, as 1 + its index in `CHECKSUM_MAPPING`,
+    or 0 for none
+
+Packed plates are ordered by prefix, then number; prefix codes are ordered
+by length, then alphabetically.
+"""
+
+# Checksum letter of each remainder of the weighted sum of a VRN, divided by 19
+CHECKSUM_MAPPING = 'AZYXUTSRPMLKJHGEDCB'
+
+_LETTER_BASE = 27
+_MAX_PREFIX_LENGTH = 3
+_NUMBER_BITS = 14
+_CHECKSUM_BITS = 5
+
+# An integer, or an array of integers
+Packed = Union[int, np.ndarray]
+
+def parse_prefix(s: str) -> int:
+    """Returns the prefix code of a letter prefix, or -1 if the string is not
+    1 to 3 letters from "A" to "Z"."""
+
+    if not 0 < len(s) <= _MAX_PREFIX_LENGTH:
+        return -1
+    prefix_code = 0
+    for c in s:
+        letter = ord(c) - 64
+        if not 1 <= letter <= 26:
+            return -1
+        prefix_code = prefix_code * _LETTER_BASE + letter
+    return prefix_code
+
+def format_prefix(prefix_code: int) -> str:
+    """Returns the letter prefix of a prefix code."""
+
+    letters = []
+    while prefix_code:
+        prefix_code, letter = divmod(prefix_code, _LETTER_BASE)
+        letters.append(chr(letter + 64))
+    return ''.join(reversed(letters))
+
+def pack(prefix_code: Packed, number: Packed = 0, checksum_code: Packed = 0) -> Packed:
+    """Packs a prefix code, plate number and checksum code, which are either
+    integers or arrays of them, into packed plates."""
+    return (prefix_code << (_NUMBER_BITS + _CHECKSUM_BITS)) | (number << _CHECKSUM_BITS) | checksum_code
+
+def unpack(plate: Packed) -> Tuple[Packed, Packed, Packed]:
+    """Returns the prefix code, plate number and checksum code of packed
+    plates, which are either an integer or an array of them."""
+    return plate >> (_NUMBER_BITS + _CHECKSUM_BITS), \
+        (plate >> _CHECKSUM_BITS) & ((1 << _NUMBER_BITS) - 1), \
+        plate & ((1 << _CHECKSUM_BITS) - 1)
+
+def parse_plate(s: str) -> int:
+    """Parses a plate, made of a letter prefix, an optional plate number and
+    an optional checksum letter, e.g. "SKA", "SKA1" or "SKA1L".
+
+    Args:
+        s: Input string
+
+    Returns:
+        Packed plate, or -1 if the string is not a plate.
+    """
+
+    n_letters = 0
+    while n_letters < len(s) and s[n_letters].isalpha():
+        n_letters += 1
+    prefix_code = parse_prefix(s[:n_letters])
+    if prefix_code < 0:
+        return -1
+
+    n_digits = n_letters
+    while n_digits < len(s) and '0' <= s[n_digits] <= '9':
+        n_digits += 1
+    number = int(s[n_letters:n_digits] or 0)
+    if n_digits - n_letters > 4 or (n_digits > n_letters and number == 0):
+        return -1
+
+    checksum = s[n_digits:]
+    if not checksum:
+        return pack(prefix_code, number)
+    if number == 0 or len(checksum) != 1 or checksum not in CHECKSUM_MAPPING:
+        return -1
+    return pack(prefix_code, number, CHECKSUM_MAPPING.index(checksum) + 1)
+
+def format_plate(plate: int) -> str:
+    """Returns the string of a packed plate, e.g. "SKA1L"."""
+
+    prefix_code, number, checksum_code = unpack(plate)
+    return format_prefix(prefix_code) \
+        + (str(number) if number else '') \
+        + (CHECKSUM_MAPPING[checksum_code - 1] if checksum_code else '')
+
+class Plate(object):
+    """Vehicle registration plate, held as a single packed integer.
+
+    Args:
+        plate: Packed plate
+    """
+
+    __slots__ = ('plate',)
+
+    def __init__(self, plate: int):
+        self.plate = plate
+
+    @classmethod
+    def parse(cls, s: str) -> Optional['Plate']:
+        """Parses a plate as in `parse_plate`, returning None if the string
+        is not a plate."""
+        plate = parse_plate(s)
+        return cls(plate) if plate >= 0 else None
+
+    @property
+    def prefix(self) -> str:
+        return format_prefix(unpack(self.plate)[0])
+
+    @property
+    def number(self) -> int:
+        return unpack(self.plate)[1]
+
+    @property
+    def checksum(self) -> str:
+        checksum_code = unpack(self.plate)[2]
+        return CHECKSUM_MAPPING[checksum_code - 1] if checksum_code else ''
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, Plate) and self.plate == other.plate
+
+    def __lt__(self, other: 'Plate') -> bool:
+        return self.plate < other.plate
+
+    def __hash__(self) -> int:
+        return hash(self.plate)
+
+    def __repr__(self) -> str:
+        return f'Plate({format_plate(self.plate)!r})'
+
+    def __str__(self) -> str:
+        return format_plate(self.plate)
+
+# VRN letter prefixes, as sorted prefix codes:
+# 1. 1-letter S
+# 2. 2-letter starting with S, e.g. SB
+# 3. 2-letter starting with E, e.g. EP
+# 4. 3-letter starting with S, e.g. SDD
+VRN_PREFIX_CODES = np.array(sorted(
+    [parse_prefix('S')]
+    + [parse_prefix(f'{x}{y}') for x in 'ES' for y in string.ascii_uppercase]
+    + [parse_prefix(f'S{x}{y}') for x in string.ascii_uppercase for y in string.ascii_uppercase]),
+    dtype=np.int64)
+_VRN_PREFIX_CODE_SET = frozenset(VRN_PREFIX_CODES.tolist())
+VRN_PREFIXES = frozenset(format_prefix(x) for x in _VRN_PREFIX_CODE_SET)
+
+def is_vrn_prefix(s: str) -> bool:
+    """Checks if the string is a VRN letter prefix, e.g. "SKA"."""
+    return parse_prefix(s) in _VRN_PREFIX_CODE_SET
+
+class PlateTable(object):
+    """Sorted table of packed plates, for membership checks of single plates
+    and of arrays of them by binary search.
+
+    The table is saved as a NumPy array file, which can be memory-mapped when
+    it is loaded, so that only the pages searched are read, and they are
+    shared between the processes that load it.
+
+    Args:
+        plates: Packed plates, sorted
+    """
+
+    __slots__ = ('plates',)
+
+    def __init__(self, plates: np.ndarray):
+        self.plates = plates
+
+    @classmethod
+    def load(cls, path: str, memory_map: bool = True) -> 'PlateTable':
+        """Loads a table saved by `save`, memory-mapped if set."""
+        return cls(np.load(path, mmap_mode='r' if memory_map else None))
+
+    def save(self, path: str) -> None:
+        """Saves the table as a NumPy array file, through a temporary file."""
+
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        path_tmp = f'{path}.{os.getpid()}.tmp.npy'
+        np.save(path_tmp, np.asarray(self.plates, dtype=np.int64))
+        os.replace(path_tmp, path)
+        return None
+
+    def __len__(self) -> int:
+        return len(self.plates)
+
+    def __contains__(self, plate: int) -> bool:
+        idx = np.searchsorted(self.plates, plate)
+        return bool(idx < len(self.plates) and self.plates[idx] == plate)
+
+    def contains(self, plates: np.ndarray) -> np.ndarray:
+        """Vectorized version of `in` over an array of packed plates."""
+
+        plates = np.asarray(plates, dtype=np.int64)
+        if not len(self.plates):
+            return np.zeros(len(plates), dtype=bool)
+        idxs = np.minimum(np.searchsorted(self.plates, plates), len(self.plates) - 1)
+        return self.plates[idxs] == plates
@@ -0,0 +1,107 @@
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple, TypeVar
+
+from utils import constants
+
+"""
+profiler.py contains the opt-in profiler of the cleaning rules of each car
+make, which records how often each rule is applied, how often it changes the
+model name, and how long it takes.
+
+The stats are module-level, so each Python worker process holds its own stats
+that persist across the tasks it runs, as with the caches in `memo.py`.
+"""
+
+# Model names, either a single string or a batch of them
+ModelNames = TypeVar('ModelNames')
+
+# Stats of each cleaning rule, keyed by (make, rule index)
+RuleStats = Dict[Tuple[str, int], Dict[str, float]]
+
+# Stats of this process; None if profiling is disabled
+_stats: Optional[RuleStats] = None
+
+def configure(enabled: bool) -> None:
+    """Enables or disables profiling in this process.
+
+    The stats are kept if profiling stays enabled, and dropped if it is
+    disabled.
+
+    Args:
+        enabled: Whether the cleaning rules are profiled
+    """
+
+    global _stats
+    if not enabled:
+        _stats = None
+    elif _stats is None:
+        _stats = {}
+    return None
+
+def is_enabled() -> bool:
+    return _stats is not None
+
+def get_stats() -> RuleStats:
+    """Returns the calls, matches and seconds of each rule in this process."""
+    return {key: dict(rule_stats) for key, rule_stats in (_stats or {}).items()}
+
+def diff_stats(stats: RuleStats, stats_prev: RuleStats) -> RuleStats:
+    """Returns the change in rule stats between 2 calls of `get_stats`,
+    leaving out the rules that were not applied in between."""
+    return {
+        key: {k: v - stats_prev.get(key, {}).get(k, 0) for k, v in rule_stats.items()}
+        for key, rule_stats in stats.items()
+        if rule_stats[constants.PROFILE_CALLS] != stats_prev.get(key, {}).get(constants.PROFILE_CALLS, 0)
+    }
+
+def add_stats(stats: RuleStats, stats_other: RuleStats) -> RuleStats:
+    """Adds the rule stats of another process to the rule stats, in place."""
+
+    for key, rule_stats in stats_other.items():
+        stats_rule = stats.setdefault(key, {})
+        for k, v in rule_stats.items():
+            stats_rule[k] = stats_rule.get(k, 0) + v
+    return stats
+
+def _count_changed(model_names: Any, model_names_tfm: Any) -> Tuple[int, int]:
+    """Returns the number of model names, and the number of them changed."""
+
+    if isinstance(model_names, str):
+        return 1, int(model_names_tfm != model_names)
+    return len(model_names), int((model_names_tfm != model_names).sum())
+
+def apply_rules(make: str,
+                compiled_rules: List[Any],
+                apply_fn: Callable[[List[Any], ModelNames], ModelNames],
+                model_names: ModelNames) -> ModelNames:
+    """Applies the cleaning rules of a car make one at a time, recording the
+    stats of each rule.
+
+    Args:
+        make: Car make
+        compiled_rules: Compiled cleaning rules of the car make
+        apply_fn: Function that applies a list of compiled rules to the model
+            names, e.g. `cleaners._apply_rules`
+        model_names: A model name, or a Series of model names
+
+    Returns:
+        Result of `apply_fn` with all of the rules.
+    """
+
+    for rule_idx, compiled_rule in enumerate(compiled_rules):
+        time_start = time.perf_counter()
+        model_names_tfm = apply_fn([compiled_rule], model_names)
+        seconds = time.perf_counter() - time_start
+
+        n_calls, n_matches = _count_changed(model_names, model_names_tfm)
+        rule_stats = _stats.setdefault((make, rule_idx), {
+            constants.PROFILE_CALLS: 0,
+            constants.PROFILE_MATCHES: 0,
+            constants.PROFILE_SECONDS: 0,
+        })
+        rule_stats[constants.PROFILE_CALLS] += n_calls
+        rule_stats[constants.PROFILE_MATCHES] += n_matches
+        rule_stats[constants.PROFILE_SECONDS] += seconds
+
+        model_names = model_names_tfm
+    return model_names
@@ -0,0 +1,126 @@
+from collections import defaultdict
+import heapq
+from typing import Any, Dict, FrozenSet, Iterable, List, Set, Tuple
+
+from utils import constants
+
+"""
+resolver.py contains the index of the car types in the "Prices" worksheet
+that finds the closest priced car types to a car type without a price, so
+that new car types can be priced by looking at their candidates.
+
+The index is partitioned by car make, as only the car types of the same make
+are candidates, and each partition is an inverted index from the n-grams of
+the model names to the car types that contain them.
+"""
+
+# A candidate is a (car type, price, similarity score) triple
+Candidate = Tuple[str, Any, float]
+
+def _get_ngrams(model_name: str) -> Set[str]:
+    """Returns the n-grams of a model name: its words, and the character
+    n-grams of the model name padded with a space at each end."""
+
+    padded = f' {model_name} '
+    n = constants.CANDIDATES_NGRAM_SIZE
+    return {f'#{word}' for word in model_name.split()} \
+        | {padded[i:i + n] for i in range(len(padded) - n + 1)}
+
+class MakeIndex(object):
+    """Inverted index of the n-grams of the model names of a car make.
+
+    The car types are indexed in sorted order, so that candidates with the
+    same score are ranked the same whichever order the prices are given in,
+    e.g. as grouped by Spark.
+
+    Args:
+        prices: Car types of the make, with their prices, in the form of
+            ({make} / {model}, {price}); later prices of the same car type
+            replace earlier ones
+    """
+
+    def __init__(self, prices: Iterable[Tuple[str, Any]]):
+        prices = dict(prices)
+        self.car_types = sorted(prices)
+        self.prices = [prices[x] for x in self.car_types]
+        self.ngrams: List[FrozenSet[str]] = []
+        self.postings: Dict[str, List[int]] = defaultdict(list)
+        for car_type_idx, car_type in enumerate(self.car_types):
+            ngrams = frozenset(_get_ngrams(car_type.split(' / ')[1]))
+            self.ngrams.append(ngrams)
+            for ngram in ngrams:
+                self.postings[ngram].append(car_type_idx)
+
+    def resolve(self,
+                car_type: str,
+                top_k: int = constants.CANDIDATES_TOP_K,
+                min_score: float = constants.CANDIDATES_MIN_SCORE) -> List[Candidate]:
+        """Finds the priced car types of the make that are most similar to
+        the car type.
+
+        The similarity score is the Dice coefficient of the n-grams of the
+        model names. The postings of the n-grams of the car type are scanned
+        from the rarest n-gram, which tells apart the car types best, up to
+        a maximum number of postings, so that the n-grams shared by most car
+        types of the make are not scanned. Only the car types that share the
+        most of the n-grams scanned are then scored.
+
+        Args:
+            car_type: Car type, in the form of '{make} / {model}'
+            top_k: Maximum number of candidates
+            min_score: Minimum similarity score of a candidate, from 0 to 1
+
+        Returns:
+            Candidates, most similar first.
+        """
+
+        ngrams = _get_ngrams(car_type.split(' / ')[1])
+        n_shared = defaultdict(int)
+        n_postings = 0
+        for postings in sorted((self.postings[x] for x in ngrams if x in self.postings), key=len):
+            if n_postings and n_postings + len(postings) > constants.CANDIDATES_MAX_POSTINGS:
+                break
+            for car_type_idx in postings:
+                n_shared[car_type_idx] += 1
+            n_postings += len(postings)
+
+        car_type_idxs = heapq.nlargest(max(top_k, constants.CANDIDATES_MAX_SCORED),
+                                       n_shared,
+                                       key=n_shared.get)
+        scores = ((2 * len(ngrams & self.ngrams[x]) / (len(ngrams) + len(self.ngrams[x])), x)
+                  for x in car_type_idxs)
+        return [(self.car_types[car_type_idx], self.prices[car_type_idx], score)
+                for score, car_type_idx in heapq.nlargest(top_k, scores)
+                if score >= min_score]
+
+class PriceIndex(object):
+    """Index of the car types in the "Prices" worksheet, partitioned by make.
+
+    Args:
+        prices: A dict of key-value mappings from car type to price,
+            as returned by `transform._get_prices_dict`
+    """
+
+    def __init__(self, prices: Dict[str, Any]):
+        prices_by_make = defaultdict(list)
+        for car_type, price in prices.items():
+            prices_by_make[car_type.split(' / ')[0]].append((car_type, price))
+        self.makes = {make: MakeIndex(prices_make) for make, prices_make in prices_by_make.items()}
+
+    def resolve(self,
+                car_type: str,
+                top_k: int = constants.CANDIDATES_TOP_K,
+                min_score: float = constants.CANDIDATES_MIN_SCORE) -> List[Candidate]:
+        """Finds the priced car types of the same make that are most similar
+        to the car type, as in `MakeIndex.resolve`; there are none if the make
+        has no prices."""
+
+        make = car_type.split(' / ')[0]
+        if make not in self.makes:
+            return []
+        return self.makes[make].resolve(car_type, top_k, min_score)
+
+def format_candidates(candidates: List[Candidate]) -> str:
+    """Formats the candidates for a cell of the "Prices" worksheet,
+    e.g. "B.M.W. / M5 30 JAHRE EDITION: 588800 (0.82); ..."."""
+    return '; '.join(f'{car_type}: {price} ({score:.2f})' for car_type, price, score in candidates)
@@ -0,0 +1,100 @@
+from typing import Dict, List, Tuple
+
+from helpers import backends
+from helpers.local import start_local
+from jobs import etl_job
+from utils import constants, gsheet, gsheet_stub
+
+"""
+Benchmark script that runs the ETL job end to end against a local stand-in
+for Google Sheets, and reports the wall time of each phase and the Google API
+calls made.
+"""
+
+# Number of times the data rows of the "VRN" worksheet are replicated
+SCALE_FACTORS = [1, 10, 100]
+
+def run(scale_factors: List[int] = SCALE_FACTORS,
+        latency: float = 0.05,
+        error_rate: float = 0) -> Dict[int, Tuple[Dict[str, float], Dict[str, int]]]:
+    """Runner method.
+
+    The "VRN" and "Prices" worksheets are read once from the backend in the
+    config. For each scale factor, a stand-in spreadsheet is seeded with the
+    scaled worksheets, and the ETL job is run against it with the extract
+    cache and the row manifest disabled, so that every phase does its full
+    work.
+
+    Args:
+        scale_factors: Number of times the data rows are replicated
+        latency: Delay of each request to the stand-in, in seconds
+        error_rate: Probability of a request to the stand-in failing with
+            a quota error
+
+    Returns:
+        Wall time in seconds of each phase, and number of Google API calls
+        made by API method, keyed by scale factor.
+    """
+
+    log, config = start_local(
+        app_name='vrn_analysis_benchmark',
+        files=['configs/etl_config.json'])
+
+    # config values used
+    spreadsheet_id = config[constants.CONFIG_GSHEET_SPREADSHEET_ID_DEV]
+    ws_title_vrn = config[constants.CONFIG_GSHEET_WS_VRN]
+    ws_title_prices = config[constants.CONFIG_GSHEET_WS_PRICES]
+    ws_title_results = config[constants.CONFIG_GSHEET_WS_RESULTS]
+    ws_title_vrn_cleaned = config[constants.CONFIG_GSHEET_WS_VRN_CLEANED]
+
+    vrn_data, prices_data = backends.get_backend(log, config).read([ws_title_vrn, ws_title_prices])
+
+    results = {}
+    for scale_factor in scale_factors:
+        # keep the header row, replicate the data rows
+        vrn_data_scaled = vrn_data[:1] + vrn_data[1:] * scale_factor
+
+        stub = gsheet_stub.GSheetStub(
+            spreadsheet_id,
+            {
+                ws_title_vrn: vrn_data_scaled,
+                ws_title_prices: prices_data,
+                ws_title_results: [],
+                ws_title_vrn_cleaned: [],
+            },
+            latency=latency,
+            error_rate=error_rate)
+        with stub:
+            config_stub = dict(config, **{
+                constants.CONFIG_BACKEND: constants.BACKEND_GSHEETS,
+                constants.CONFIG_EXTRACT_CACHE_DIR: '',
+                constants.CONFIG_GSHEET_API_URL: stub.url,
+                constants.CONFIG_REPORT_JSON_PATH: '',
+                constants.CONFIG_REPORT_PROMETHEUS_PATH: '',
+                constants.CONFIG_TRANSFORM_MANIFEST_PATH: '',
+            })
+            client = gsheet.GSheetClient(
+                requests_per_minute=int(config[constants.CONFIG_GSHEET_REQUESTS_PER_MINUTE]),
+                api_url=stub.url)
+
+            report = etl_job.run(log, config_stub, client)
+            phase_times = {phase: report.get_seconds(phase)
+                           for phase in [constants.PHASE_EXTRACT,
+                                         constants.PHASE_TRANSFORM,
+                                         constants.PHASE_LOAD]}
+            api_calls = client.get_api_calls()
+            n_rows_loaded = len(stub.get_worksheet_values(ws_title_vrn_cleaned))
+
+        results[scale_factor] = (phase_times, api_calls)
+        n_cells = sum(len(row) for row in vrn_data_scaled)
+        log.info(f'x{scale_factor} ({len(vrn_data_scaled)} rows, {n_cells} cells): '
+                 + ', '.join(f'{phase} {t:.2f}s' for phase, t in phase_times.items())
+                 + f', total {sum(phase_times.values()):.2f}s; '
+                 + f'{sum(api_calls.values())} API calls ('
+                 + ', '.join(f'{name} {n}' for name, n in sorted(api_calls.items()))
+                 + f'), {stub.n_quota_errors} quota errors')
+        if n_rows_loaded != len(vrn_data_scaled):
+            log.error(f'x{scale_factor}: {n_rows_loaded} rows loaded to "{ws_title_vrn_cleaned}", '
+                      f'{len(vrn_data_scaled)} expected')
+
+    return results
@@ -0,0 +1,88 @@
+import time
+from typing import Dict, List
+
+from helpers.persistence import RDDPersistence
+from helpers.spark import start_spark
+from jobs import extract, transform, transform_df, transform_local
+from utils import constants
+
+"""
+Benchmark script that compares the RDD, DataFrame and local engines of the
+Transform phase.
+"""
+
+# Number of times the data rows of the "VRN" worksheet are replicated
+SCALE_FACTORS = [1, 10, 100]
+
+def run(scale_factors: List[int] = SCALE_FACTORS) -> Dict[int, Dict[str, float]]:
+    """Runner method.
+
+    The "VRN" and "Prices" worksheets are extracted once. For each scale factor,
+    the Spark engines transform the same scaled VRN RDD, and the time taken
+    till all 3 outputs are collected is measured. The local engine is timed
+    on the same rows as lists.
+
+    Args:
+        scale_factors: Number of times the data rows are replicated
+
+    Returns:
+        Time taken in seconds by each engine, keyed by scale factor.
+    """
+
+    spark, log, config = start_spark(
+        app_name='vrn_analysis_benchmark',
+        files=['configs/etl_config.json'])
+    sc = spark.sparkContext
+
+    vrn_data, prices_data = extract.run_local(log, config)
+    prices_rdd = sc.parallelize(prices_data).cache()
+
+    engines = {
+        constants.TRANSFORM_ENGINE_RDD:
+            lambda vrn_rdd, persistence, stats: transform.run(
+                log, config, vrn_rdd, prices_rdd, persistence, stats),
+        constants.TRANSFORM_ENGINE_DATAFRAME:
+            lambda vrn_rdd, persistence, stats: transform_df.run(
+                spark, log, config, vrn_rdd, prices_rdd, persistence, stats),
+    }
+
+    timings = {}
+    for scale_factor in scale_factors:
+        # keep the header row, replicate the data rows
+        vrn_rdd_scaled = sc.parallelize(vrn_data[:1] + vrn_data[1:] * scale_factor)
+
+        timings[scale_factor] = {}
+        outputs = {}
+        for engine, run_engine in engines.items():
+            persistence = RDDPersistence(
+                sc,
+                config[constants.CONFIG_TRANSFORM_STORAGE_LEVEL])
+            stats = transform.TransformStats(
+                log,
+                sc,
+                config[constants.CONFIG_TRANSFORM_PROFILE_RULES])
+
+            time_start = time.perf_counter()
+            outputs[engine] = [rdd.collect() for rdd in run_engine(vrn_rdd_scaled, persistence, stats)]
+            timings[scale_factor][engine] = time.perf_counter() - time_start
+
+            stats.log_stats(log)
+            persistence.unpersist_all(log)
+
+        time_start = time.perf_counter()
+        outputs[constants.TRANSFORM_ENGINE_LOCAL] = list(transform_local.run(
+            log, config, vrn_data[:1] + vrn_data[1:] * scale_factor, prices_data))
+        timings[scale_factor][constants.TRANSFORM_ENGINE_LOCAL] = time.perf_counter() - time_start
+
+        outputs_match = all(output == outputs[constants.TRANSFORM_ENGINE_RDD]
+                            for output in outputs.values())
+        n_rows = 1 + (len(vrn_data) - 1) * scale_factor
+        log.info(f'x{scale_factor} ({n_rows} rows): '
+                 + ', '.join(f'{engine} {t:.2f}s' for engine, t in timings[scale_factor].items()))
+        if not outputs_match:
+            log.error(f'x{scale_factor} ({n_rows} rows): the outputs of the engines differ')
+
+    # the buffered messages are sent to Log4j while the JVM is up
+    log.flush()
+    spark.stop()
+    return timings
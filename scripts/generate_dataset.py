@@ -0,0 +1,247 @@
+from bisect import bisect
+import csv
+from itertools import accumulate, islice
+import os
+import pyarrow as pa
+import pyarrow.parquet as pq
+import random
+import shutil
+import string
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from helpers.local import start_local
+from jobs.transform_scripts import cleaners
+from scripts import vrn_checksum
+from utils import constants
+
+"""
+Helper script to generate synthetic "VRN" and "Prices" worksheets for scale
+testing, in the layout that the Extract phase expects:
+- "VRN" - a header row of "Series" and the plate numbers, followed by one row
+    per series of VRN letters, with a car type, "-" or nothing in each cell
+- "Prices" - a header row, followed by one row of make, model and price per
+    car type
+
+The car types are drawn from the makes that have cleaning rules, with the
+kinds of dirty suffixes that the rules remove. The rows are generated one at
+a time and streamed to the output files, so that the dataset is never held
+in memory.
+"""
+
+# Number of rows written to a Parquet file at a time
+_PARQUET_BATCH_SIZE = 1000
+
+# Body styles and dirty suffixes of the generated model names
+_BODY_STYLES = ['', ' SEDAN', ' COUPE', ' HATCHBACK', ' TOURING', ' CONVERTIBLE', ' SPORTBACK']
+_DIRTY_SUFFIXES = [' A', ' ABS', ' A/T', ' AUTO', ' D/AB', ' HID', ' S/R', ' SMT', ' (LED)', ' (R18 LED)']
+
+def _get_series() -> List[str]:
+    """Returns all VRN letter series, starting with those in
+    `vrn_checksum.VRN_LETTERS`."""
+
+    series = vrn_checksum.get_vrn_prefixes()
+    return vrn_checksum.VRN_LETTERS \
+        + [x for x in series if x not in set(vrn_checksum.VRN_LETTERS)]
+
+def _get_numbers(n_numbers: int) -> List[int]:
+    """Returns the plate numbers of the columns, starting with those in
+    `vrn_checksum.VRN_NUMBERS`, up to 9999."""
+
+    numbers = vrn_checksum.VRN_NUMBERS \
+        + [x for x in range(1, 10000) if x not in set(vrn_checksum.VRN_NUMBERS)]
+    return numbers[:n_numbers]
+
+def _get_car_types(rng: random.Random,
+                   n_models: int,
+                   n_variants: int) -> Tuple[List[str], List[str]]:
+    """Generates the car types, as they are entered in the "VRN" worksheet,
+    and their cleaned forms.
+
+    Args:
+        rng: Random number generator
+        n_models: Number of models
+        n_variants: Maximum number of dirty variants of each model
+
+    Returns:
+        Car types, in the form of '{make} / {model}'
+        Cleaned car types, in the same order
+    """
+
+    makes = sorted(cleaners.MAKE_TO_RULES_MAPPING)
+    car_types = []
+    for _ in range(n_models):
+        make = rng.choice(makes)
+        model = f'{rng.choice(string.ascii_uppercase)}{rng.randint(1, 999)}' \
+            f'{rng.choice(_BODY_STYLES)} {rng.randint(1, 6)}.{rng.randint(0, 9)}'
+        for _ in range(rng.randint(1, n_variants)):
+            suffixes = rng.sample(_DIRTY_SUFFIXES, rng.randint(0, 2))
+            car_types.append(f'{make} / {model}{"".join(suffixes)}')
+
+    car_types = list(dict.fromkeys(car_types))
+    car_types_clean = [cleaners.clean_model_name(cleaners.clean_raw_data(x)) for x in car_types]
+    return car_types, car_types_clean
+
+def generate_vrn_rows(rng: random.Random,
+                      car_types: List[str],
+                      n_cells: int,
+                      n_numbers: int,
+                      skew: float,
+                      empty_rate: float) -> Iterator[List[str]]:
+    """Generates the rows of the "VRN" worksheet, one at a time.
+
+    The series repeat once all VRN letter series have been used, so that any
+    number of cells can be generated. The cells left over in the last row
+    are empty, so that all rows have as many cells as the header row.
+
+    Args:
+        rng: Random number generator
+        car_types: Car types to draw the cells from
+        n_cells: Number of cells, excluding the header row and column
+        n_numbers: Number of plate numbers, i.e. columns
+        skew: Exponent of the Zipf-like frequencies of the car types,
+            where the k-th car type is drawn with weight 1 / k^skew;
+            0 for uniform frequencies
+        empty_rate: Proportion of cells without a car type
+
+    Returns:
+        Iterator of rows, starting with the header row.
+    """
+
+    series = _get_series()
+    numbers = _get_numbers(n_numbers)
+    cum_weights = list(accumulate(1 / (k ** skew) for k in range(1, len(car_types) + 1)))
+    total_weight = cum_weights[-1]
+
+    def _get_cell() -> str:
+        if rng.random() < empty_rate:
+            return rng.choice(['', '-'])
+        return car_types[bisect(cum_weights, rng.random() * total_weight)]
+
+    yield ['Series', *(str(x) for x in numbers)]
+
+    n_rows = -(-n_cells // len(numbers))
+    for row_idx in range(n_rows):
+        n_cols = min(len(numbers), n_cells - row_idx * len(numbers))
+        yield [series[row_idx % len(series)],
+               *(_get_cell() for _ in range(n_cols)),
+               *([''] * (len(numbers) - n_cols))]
+
+def generate_prices_rows(rng: random.Random,
+                         car_types_clean: List[str],
+                         missing_price_rate: float) -> Iterator[List[str]]:
+    """Generates the rows of the "Prices" worksheet, one at a time.
+
+    Args:
+        rng: Random number generator
+        car_types_clean: Cleaned car types to be priced
+        missing_price_rate: Proportion of car types without a price, which
+            are priced as "MISSINGPRICE:..." in the Transform phase
+
+    Returns:
+        Iterator of rows, starting with the header row, sorted by make,
+        then model name.
+    """
+
+    yield constants.GSHEET_PRICES_HEADER_ROW
+    for car_type in sorted(set(car_types_clean), key=lambda x: x.split(' / ')):
+        if rng.random() < missing_price_rate:
+            continue
+        yield [*car_type.split(' / '), f'{rng.randint(50, 3000) * 1000:,}']
+
+def _write_csv(path: str, rows: Iterator[List[str]]) -> int:
+    """Writes the rows to a CSV file, returning the number of rows."""
+
+    n_rows = 0
+    with open(path, 'w', newline='') as csv_file:
+        writer = csv.writer(csv_file)
+        for row in rows:
+            writer.writerow(row)
+            n_rows += 1
+    return n_rows
+
+def _write_parquet(path: str, rows: Iterator[List[str]]) -> int:
+    """Writes the rows to a Parquet file in batches, in the schema of
+    `backends.ParquetBackend`, returning the number of rows."""
+
+    schema = pa.schema([('row_idx', pa.int64()), ('row', pa.list_(pa.string()))])
+    n_rows = 0
+    with pq.ParquetWriter(path, schema) as writer:
+        while True:
+            batch = list(islice(rows, _PARQUET_BATCH_SIZE))
+            if not batch:
+                break
+            writer.write_table(pa.Table.from_arrays(
+                [pa.array(range(n_rows, n_rows + len(batch)), type=pa.int64()),
+                 pa.array(batch, type=pa.list_(pa.string()))],
+                schema=schema))
+            n_rows += len(batch)
+    return n_rows
+
+def run(n_cells: int = 1000,
+        n_numbers: int = 100,
+        n_models: int = 2000,
+        n_variants: int = 3,
+        skew: float = 1.0,
+        empty_rate: float = 0.1,
+        missing_price_rate: float = 0.05,
+        output_dir: Optional[str] = None,
+        output_format: Optional[str] = None,
+        seed: int = 0) -> Dict[str, int]:
+    """Runner method.
+
+    The worksheets are written to "{output dir}/{title}.{format}", where
+    the CSV and Parquet backends read them from.
+
+    Args:
+        n_cells: Number of cells in the "VRN" worksheet, e.g. 1k to 10M
+        n_numbers: Number of plate numbers, i.e. columns of the "VRN" worksheet
+        n_models: Number of car models
+        n_variants: Maximum number of dirty variants of each car model
+        skew: Exponent of the Zipf-like frequencies of the car types;
+            0 for uniform frequencies
+        empty_rate: Proportion of cells without a car type
+        missing_price_rate: Proportion of car types without a price
+        output_dir: Output directory; the backend directory in the config
+            if not given
+        output_format: "csv" or "parquet"; the backend in the config if it
+            is either of these, else "csv", if not given
+        seed: Seed of the random number generator
+
+    Returns:
+        Number of rows written, keyed by worksheet title.
+    """
+
+    log, config = start_local(
+        app_name='vrn_analysis_generate_dataset',
+        files=['configs/etl_config.json'])
+
+    # config values used
+    ws_title_vrn = config[constants.CONFIG_GSHEET_WS_VRN]
+    ws_title_prices = config[constants.CONFIG_GSHEET_WS_PRICES]
+
+    if output_dir is None:
+        output_dir = config[constants.CONFIG_BACKEND_DIR]
+    if output_format is None:
+        output_format = config[constants.CONFIG_BACKEND] \
+            if config[constants.CONFIG_BACKEND] == constants.BACKEND_PARQUET \
+            else constants.BACKEND_CSV
+    write = _write_parquet if output_format == constants.BACKEND_PARQUET else _write_csv
+
+    rng = random.Random(seed)
+    car_types, car_types_clean = _get_car_types(rng, n_models, n_variants)
+
+    os.makedirs(output_dir, exist_ok=True)
+    ws_rows = {
+        ws_title_vrn: generate_vrn_rows(rng, car_types, n_cells, n_numbers, skew, empty_rate),
+        ws_title_prices: generate_prices_rows(rng, car_types_clean, missing_price_rate),
+    }
+    n_rows = {}
+    for ws_title, rows in ws_rows.items():
+        path = os.path.join(output_dir, f'{ws_title}.{output_format}')
+        # replace any directory of part files written by Spark
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        n_rows[ws_title] = write(path, rows)
+    log.info(', '.join(f'{n} rows written to "{ws_title}"' for ws_title, n in n_rows.items())
+          + f' in {output_dir}, from {len(car_types)} car types')
+    return n_rows
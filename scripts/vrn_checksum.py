@@ -1,7 +1,19 @@
-from utils import gsheet
+import numpy as np
+import os
+from typing import List, Sequence, Tuple
+
+from helpers.local import start_local
+from jobs.transform_scripts import plates
+from utils import constants, gsheet
     
 """
 Helper script to calculate VRN checksum letters.
+
+Besides the checksum of a single VRN, the checksums can be calculated in bulk
+for any number of letter prefixes and plate numbers, including every letter
+prefix with every plate number from 1 to 9999, in a single array operation
+over the packed prefix codes of `plates`. These make up the table of valid
+plates, which can be saved and memory-mapped for validity checks.
 """
 
 VRN_LETTERS = [
@@ -42,23 +54,143 @@ def _calc_vrn_checksum(vrn: str) -> str:
     checksumMapping = 'AZYXUTSRPMLKJHGEDCB'
     return checksumMapping[vrn_numeric_sum % 19]
 
-def run():
+# Weights of the last 2 letters and the 4 digits of a VRN
+_WEIGHTS = np.array([9, 4, 5, 4, 3, 2])
+# Checksum letter of each remainder of the weighted sum, divided by 19
+_CHECKSUM_LETTERS = np.array(list(plates.CHECKSUM_MAPPING))
+# All plate numbers
+PLATE_NUMBERS = np.arange(1, 10000)
+
+def get_vrn_prefixes() -> List[str]:
+    """Returns all VRN letter prefixes, i.e. the strings that pass
+    `general._is_vrn_letters`, ordered by length, then alphabetically."""
+    return [plates.format_prefix(x) for x in plates.VRN_PREFIX_CODES]
+
+def _get_letter_sums(prefix_codes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Returns the weighted sum of the last 2 letters of each prefix code,
+    and whether each prefix has a single letter, in which case the digits
+    take the weights from the 2nd weight onwards, as in `_calc_vrn_checksum`.
+    """
+
+    # the last 2 letters are the last 2 digits of the prefix code in base 27
+    letters = np.stack([(prefix_codes // 27) % 27, prefix_codes % 27], axis=-1)
+    is_single = letters[..., 0] == 0
+    letter_sums = np.where(is_single,
+                           letters[..., 1] * _WEIGHTS[0],
+                           letters @ _WEIGHTS[:2])
+    return letter_sums, is_single
+
+def _get_digit_sums(numbers: np.ndarray) -> np.ndarray:
+    """Returns the weighted sum of the 4 digits of each plate number, padded
+    with zeros, for a prefix of 2 letters (row 0) and of 1 letter (row 1)."""
+
+    digits = (np.asarray(numbers, dtype=np.int64)[:, None] // np.array([1000, 100, 10, 1])) % 10
+    return np.stack([digits @ _WEIGHTS[2:], digits @ _WEIGHTS[1:5]])
+
+def _calc_checksum_idxs(prefix_codes: np.ndarray, numbers: np.ndarray) -> np.ndarray:
+    """Returns the index in `plates.CHECKSUM_MAPPING` of the checksum letter
+    of every combination of prefix code (rows) and plate number (columns)."""
+
+    letter_sums, is_single = _get_letter_sums(np.asarray(prefix_codes, dtype=np.int64))
+    digit_sums = _get_digit_sums(numbers)
+    return (letter_sums[:, None] + digit_sums[is_single.astype(int)]) % 19
+
+def calc_vrn_checksums(prefixes: Sequence[str] = None,
+                       numbers: np.ndarray = PLATE_NUMBERS) -> np.ndarray:
+    """Vectorized version of `_calc_vrn_checksum` over every combination of
+    letter prefix and plate number.
+
+    Args:
+        prefixes: Letter prefixes of 1 to 3 letters; all VRN letter prefixes
+            if not given
+        numbers: Plate numbers, from 1 to 9999; all of them if not given
+
+    Returns:
+        Array of checksum letters, with a row per prefix and a column
+        per number.
+    """
+
+    if prefixes is None:
+        prefix_codes = plates.VRN_PREFIX_CODES
+    else:
+        prefix_codes = np.array([plates.parse_prefix(x) for x in prefixes], dtype=np.int64)
+        if (prefix_codes < 0).any():
+            raise ValueError(f'Letter prefixes must be 1 to 3 letters from "A" to "Z": '
+                             f'{prefixes[int(np.argmax(prefix_codes < 0))]}')
+
+    return _CHECKSUM_LETTERS[_calc_checksum_idxs(prefix_codes, numbers)]
+
+def get_plate_table(path: str = None) -> plates.PlateTable:
+    """Returns the sorted table of every valid plate, i.e. every VRN letter
+    prefix with every plate number and its checksum letter, as packed plates.
+
+    Args:
+        path: Filepath of the table; if given, the table is memory-mapped
+            from it, and saved to it first if it does not exist
+
+    Returns:
+        Table of packed plates.
+    """
+
+    if path is not None and os.path.exists(path):
+        return plates.PlateTable.load(path)
+
+    checksum_idxs = _calc_checksum_idxs(plates.VRN_PREFIX_CODES, PLATE_NUMBERS)
+    table = plates.PlateTable(plates.pack(
+        plates.VRN_PREFIX_CODES[:, None],
+        PLATE_NUMBERS[None, :],
+        checksum_idxs + 1).ravel())
+    if path is not None:
+        table.save(path)
+        return plates.PlateTable.load(path)
+    return table
+
+def validate_vrns(vrns: Sequence[str], table: plates.PlateTable = None) -> np.ndarray:
+    """Checks if each VRN is a valid plate, with a VRN letter prefix, a plate
+    number and its checksum letter, e.g. "SKA1L".
+
+    Args:
+        vrns: VRNs
+        table: Table of valid plates; built if not given
+
+    Returns:
+        Boolean array of whether each VRN is in the table.
+    """
+
+    if table is None:
+        table = get_plate_table()
+    return table.contains([plates.parse_plate(x) for x in vrns])
+
+def run(client: gsheet.GSheetClient = None):
     """Runner method.
 
-    The checksum letters are inserted into the "Checksum" worksheet in rows.
+    The checksum letters are inserted into the "Checksum" worksheet in rows,
+    in the spreadsheet of the config.
+
+    Args:
+        client: Google Sheets client, created if not given
     """
 
-    output = []
+    _, config = start_local(
+        app_name='vrn_analysis_checksum',
+        files=['configs/etl_config.json'])
+
+    # config values used
+    spreadsheet_id = config[constants.CONFIG_GSHEET_SPREADSHEET_ID_DEV]
+
+    if client is None:
+        client = gsheet.GSheetClient(
+            requests_per_minute=int(config[constants.CONFIG_GSHEET_REQUESTS_PER_MINUTE]),
+            api_url=config[constants.CONFIG_GSHEET_API_URL] or None)
+
     # prepare list of lists
-    for letter in VRN_LETTERS:
-        checksum = [letter]
-        for number in VRN_NUMBERS:
-            checksum.append(_calc_vrn_checksum(f'{letter}{number}'))
-        output.append(checksum)
+    checksums = calc_vrn_checksums(VRN_LETTERS, np.array(VRN_NUMBERS))
+    output = [[letter, *checksum] for letter, checksum in zip(VRN_LETTERS, checksums.tolist())]
 
     # save to "Checksum" worksheet in GSheets
     gsheet.save_to_worksheet(
-        '18KGQFVDZ8wgj2pb1ErKh2QXGtF1N2U17GiwRBcXI1TI',
+        client,
+        spreadsheet_id,
         'Checksum',
         output,
         True)
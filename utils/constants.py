@@ -2,18 +2,96 @@
 FILEPATH_GSHEET_CREDS = 'configs/gsheet_creds.json'
 
 # Config values
+CONFIG_BACKEND = 'backend'
+CONFIG_BACKEND_DIR = 'backend_dir'
+CONFIG_EXTRACT_CACHE_DIR = 'extract_cache_dir'
+CONFIG_EXTRACT_CACHE_MEMORY_MAP = 'extract_cache_memory_map'
+CONFIG_GSHEET_API_URL = 'gsheet_api_url'
+CONFIG_GSHEET_REQUESTS_PER_MINUTE = 'gsheet_requests_per_minute'
 CONFIG_GSHEET_SPREADSHEET_ID_DEV = 'gsheet_spreadsheet_id_dev'
 CONFIG_GSHEET_SPREADSHEET_ID_PROD = 'gsheet_spreadsheet_id_prod'
 CONFIG_GSHEET_WS_PRICES = 'gsheet_ws_prices'
 CONFIG_GSHEET_WS_RESULTS = 'gsheet_ws_results'
 CONFIG_GSHEET_WS_VRN = 'gsheet_ws_vrn'
 CONFIG_GSHEET_WS_VRN_CLEANED = 'gsheet_ws_vrn_cleaned'
+CONFIG_LOAD_BACKOFF_BASE = 'load_backoff_base'
+CONFIG_LOAD_BACKOFF_MAX = 'load_backoff_max'
+CONFIG_LOAD_DIFF_MAX_RATIO = 'load_diff_max_ratio'
+CONFIG_LOAD_MAX_RETRIES = 'load_max_retries'
+CONFIG_LOCAL_MAX_CELLS = 'local_max_cells'
+CONFIG_LOCAL_PROCESSES = 'local_processes'
+CONFIG_REPORT_JSON_PATH = 'report_json_path'
+CONFIG_REPORT_PROMETHEUS_PATH = 'report_prometheus_path'
+CONFIG_TRANSFORM_CACHE_EVICTION = 'transform_cache_eviction'
+CONFIG_TRANSFORM_CACHE_SIZE = 'transform_cache_size'
+CONFIG_TRANSFORM_DEDUP = 'transform_dedup'
+CONFIG_TRANSFORM_ENGINE = 'transform_engine'
+CONFIG_TRANSFORM_MANIFEST_PATH = 'transform_manifest_path'
+CONFIG_TRANSFORM_PRICES_BROADCAST_MAX_SIZE = 'transform_prices_broadcast_max_size'
+CONFIG_TRANSFORM_PROFILE_RULES = 'transform_profile_rules'
+CONFIG_TRANSFORM_STORAGE_LEVEL = 'transform_storage_level'
 
 # Fixed constants
 GSHEET_PRICES_HEADER_ROW = ['Make', 'Model', 'Price']
 ERROR_MISSING_PRICE = 'MISSINGPRICE:'
+NEW_CAR_TYPES_LOG_MAX = 20
+
+# Price candidates of new car types
+CANDIDATES_MAX_POSTINGS = 1000
+CANDIDATES_MAX_SCORED = 20
+CANDIDATES_MIN_SCORE = 0.3
+CANDIDATES_NGRAM_SIZE = 3
+CANDIDATES_TOP_K = 3
+
+# Backends
+BACKEND_CSV = 'csv'
+BACKEND_GSHEETS = 'gsheets'
+BACKEND_PARQUET = 'parquet'
+
+# ETL phases
+PHASE_EXTRACT = 'extract'
+PHASE_LOAD = 'load'
+PHASE_TRANSFORM = 'transform'
+
+# Transform engines
+TRANSFORM_ENGINE_DATAFRAME = 'dataframe'
+TRANSFORM_ENGINE_LOCAL = 'local'
+TRANSFORM_ENGINE_RDD = 'rdd'
+
+# Local engine
+LOCAL_CHUNK_SIZE = 2000
+
+# Logging
+LOG_BUFFER_SIZE = 100
+LOG_DROPPED = 'dropped'
+LOG_FLUSH_INTERVAL = 5.0
+LOG_FLUSHES = 'flushes'
+LOG_MESSAGES = 'messages'
+LOG_QUEUE_SIZE = 10000
+LOG_SECONDS = 'seconds'
+
+# Memoizing caches
+CACHE_DEFAULT_SIZE = 8192
+CACHE_EVICTION_FIFO = 'fifo'
+CACHE_EVICTION_LRU = 'lru'
+CACHE_EVICTIONS = 'evictions'
+CACHE_HITS = 'hits'
+CACHE_MISSES = 'misses'
+
+# Cleaning rule profiler
+PROFILE_CALLS = 'calls'
+PROFILE_HOTTEST_LOG_MAX = 10
+PROFILE_MATCHES = 'matches'
+PROFILE_SECONDS = 'seconds'
+
+# Load phase response
+LOAD_ERROR = 'error'
+LOAD_LATENCY = 'latency'
+LOAD_RETRIES = 'retries'
 
 # General strings
+REWRITTEN_CELLS = 'rewrittenCells'
+SKIPPED_CELLS = 'skippedCells'
 UPDATED_RANGE = 'updatedRange'
 UPDATED_ROWS = 'updatedRows'
 UPDATES = 'updates'
@@ -1,54 +1,453 @@
+from collections import Counter, deque
+from google.auth.credentials import AnonymousCredentials
+from google.oauth2.service_account import Credentials
 import gspread
-from typing import Dict, List, Union
+from gspread.auth import DEFAULT_SCOPES
+from gspread.urls import DRIVE_FILES_API_V3_URL, SPREADSHEETS_API_V4_BASE_URL
+from gspread.utils import absolute_range_name, fill_gaps, rowcol_to_a1
+import random
+import re
+import requests
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple, TypeVar, Union
 
 from utils import constants
 
-def load_worksheet(spreadsheet_id: str,
+# Sheets API URLs, e.g. ".../v4/spreadsheets/{id}/values/{range}:append",
+# where the range is URL-encoded and so contains no ":"
+_SHEETS_API_URL_PATTERN = re.compile(r'.*/v4/spreadsheets/[^/:?]+(/values)?[^:?]*(?::(\w+))?')
+
+def _get_api_call_name(method: str, endpoint: str) -> str:
+    """Names the Google API method called by a request,
+    e.g. "values.append" or "spreadsheets.batchUpdate".
+    """
+
+    if endpoint.startswith(DRIVE_FILES_API_V3_URL):
+        return f'drive.files.{method}'
+
+    match = _SHEETS_API_URL_PATTERN.match(endpoint)
+    if match is None:
+        return method
+    resource = 'values' if match.group(1) else 'spreadsheets'
+    return f'{resource}.{match.group(2) or method}'
+
+# Base URLs of the Google APIs, which are replaced by the API URL of a client
+_GOOGLE_API_BASE_URLS = [
+    SPREADSHEETS_API_V4_BASE_URL[:-len('/v4/spreadsheets')],
+    DRIVE_FILES_API_V3_URL[:-len('/drive/v3/files')],
+]
+
+T = TypeVar('T')
+
+class _RateLimiter(object):
+    """Limits the number of requests made in any 60-second window, across
+    all threads.
+
+    Args:
+        requests_per_minute: Maximum number of requests per minute;
+            None for no limit
+    """
+
+    def __init__(self, requests_per_minute: Optional[int]):
+        self.requests_per_minute = requests_per_minute
+        self.request_times = deque()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Blocks until a request can be made within the limit."""
+
+        if self.requests_per_minute is None:
+            return None
+
+        while True:
+            with self.lock:
+                time_now = time.monotonic()
+                while self.request_times and self.request_times[0] <= time_now - 60:
+                    self.request_times.popleft()
+                if len(self.request_times) < self.requests_per_minute:
+                    self.request_times.append(time_now)
+                    return None
+                wait = self.request_times[0] + 60 - time_now
+            time.sleep(wait)
+
+class _CountingClient(gspread.Client):
+    """gspread client that counts the requests made, by API method, and
+    keeps them within the rate limit. The requests are sent to the API URL
+    instead of the Google APIs, if it is given.
+
+    Args:
+        auth: Credentials of the authorized session
+        rate_limiter: Rate limiter, which may be shared with other clients
+        api_calls: Counts of the requests made, which may be shared with
+            other clients
+        lock: Lock of the counts of the requests made
+        api_url: Base URL of a stand-in for the Google APIs
+    """
+
+    def __init__(self,
+                 auth: Credentials,
+                 rate_limiter: _RateLimiter,
+                 api_calls: Counter,
+                 lock: threading.Lock,
+                 api_url: Optional[str] = None):
+        super().__init__(auth)
+        self.rate_limiter = rate_limiter
+        self.api_url = api_url
+        self.api_calls = api_calls
+        self.lock = lock
+
+    def request(self, method: str, endpoint: str, *args, **kwargs):
+        with self.lock:
+            self.api_calls[_get_api_call_name(method, endpoint)] += 1
+        self.rate_limiter.acquire()
+        if self.api_url:
+            for base_url in _GOOGLE_API_BASE_URLS:
+                if endpoint.startswith(base_url):
+                    endpoint = self.api_url + endpoint[len(base_url):]
+        return super().request(method, endpoint, *args, **kwargs)
+
+class GSheetClient(object):
+    """Google Sheets client shared by all sheet operations of a run.
+
+    The client may be shared between threads. As a requests session is not
+    thread-safe, each thread authorizes its own gspread client, with its own
+    HTTP session that pools its connections, on its first use of the client.
+    The threads are held to the same per-minute request limit, and their
+    requests are counted together.
+
+    Spreadsheet and worksheet handles are cached for each thread, as they
+    send their requests through the session of the thread they were opened
+    in, so that each worksheet's metadata is only fetched once by a thread
+    until the worksheet is modified.
+
+    Args:
+        creds_filepath: Filepath of the service account credentials
+        requests_per_minute: Maximum number of requests per minute;
+            None for no limit
+        api_url: Base URL of a stand-in for the Google APIs, such as
+            `gsheet_stub.GSheetStub`, which is used without credentials;
+            None for the Google APIs
+    """
+
+    def __init__(self,
+                 creds_filepath: str = constants.FILEPATH_GSHEET_CREDS,
+                 requests_per_minute: Optional[int] = None,
+                 api_url: Optional[str] = None):
+        self.creds_filepath = creds_filepath
+        self.api_url = api_url
+        self.rate_limiter = _RateLimiter(requests_per_minute)
+        self.api_calls = Counter()
+        self.worksheet_versions = Counter()
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+    def get_gc(self) -> _CountingClient:
+        """Returns the gspread client of this thread, authorizing it on first
+        use."""
+
+        if getattr(self.local, 'gc', None) is None:
+            creds = AnonymousCredentials() if self.api_url else \
+                Credentials.from_service_account_file(
+                    self.creds_filepath,
+                    scopes=DEFAULT_SCOPES)
+            self.local.gc = _CountingClient(creds, self.rate_limiter, self.api_calls, self.lock, self.api_url)
+            self.local.spreadsheets = {}
+            self.local.worksheets = {}
+        return self.local.gc
+
+    def get_spreadsheet(self, spreadsheet_id: str) -> gspread.Spreadsheet:
+        """Returns the handle of a spreadsheet."""
+
+        gc = self.get_gc()
+        if spreadsheet_id not in self.local.spreadsheets:
+            self.local.spreadsheets[spreadsheet_id] = gc.open_by_key(spreadsheet_id)
+        return self.local.spreadsheets[spreadsheet_id]
+
+    def get_worksheet(self,
+                      spreadsheet_id: str,
+                      ws_title: str) -> gspread.Worksheet:
+        """Returns the handle of a worksheet."""
+
+        key = (spreadsheet_id, ws_title)
+        with self.lock:
+            version = self.worksheet_versions[key]
+        sheet = self.get_spreadsheet(spreadsheet_id)
+        cached = self.local.worksheets.get(key)
+        if cached is None or cached[0] != version:
+            cached = self.local.worksheets[key] = (version, sheet.worksheet(ws_title))
+        return cached[1]
+
+    def invalidate_worksheet(self, spreadsheet_id: str, ws_title: str) -> None:
+        """Drops the handles of a worksheet whose rows have been changed, in
+        all threads, as the row count of a handle is not updated by the
+        changes."""
+
+        with self.lock:
+            self.worksheet_versions[(spreadsheet_id, ws_title)] += 1
+        return None
+
+    def get_api_calls(self) -> Dict[str, int]:
+        """Returns the number of requests made, keyed by API method."""
+
+        with self.lock:
+            return dict(self.api_calls)
+
+def _is_retryable(e: Exception) -> bool:
+    """Checks if a failed request may succeed when retried, i.e. it was rate
+    limited, failed on the server, or failed to connect."""
+
+    if isinstance(e, gspread.exceptions.APIError):
+        status_code = e.response.status_code
+        return status_code == 429 or status_code >= 500
+    return isinstance(e, (requests.exceptions.ConnectionError, requests.exceptions.Timeout))
+
+def call_with_retry(fn: Callable[[], T],
+                    max_retries: int,
+                    backoff_base: float,
+                    backoff_max: float) -> T:
+    """Calls the function, retrying it with exponential backoff and full
+    jitter for as long as it fails with a retryable error.
+
+    The function should be safe to call again after it failed partway, as
+    `save_to_worksheet` is.
+
+    Args:
+        fn: Function to be called
+        max_retries: Maximum number of retries
+        backoff_base: Maximum delay before the 1st retry, in seconds,
+            which doubles with each retry
+        backoff_max: Maximum delay before any retry, in seconds
+
+    Returns:
+        Result of the function.
+    """
+
+    n_retries = 0
+    while True:
+        try:
+            return fn()
+        except Exception as e:
+            if n_retries >= max_retries or not _is_retryable(e):
+                raise
+        time.sleep(random.uniform(0, min(backoff_max, backoff_base * 2 ** n_retries)))
+        n_retries += 1
+
+def load_worksheet(client: GSheetClient,
+                   spreadsheet_id: str,
                    ws_title: str) -> List[List[str]]:
     """Loads an individual worksheet from the sheet in Google Sheets.
 
     Args:
+        client: Google Sheets client
         spreadsheet_id: Google Sheets ID
         ws_title: Worksheet title
-    
+
     Returns:
         All values from the worksheet, as a list of lists.
     """
 
-    gc = gspread.service_account(filename=constants.FILEPATH_GSHEET_CREDS)
-    sheet = gc.open_by_key(spreadsheet_id)
-
-    ws = sheet.worksheet(ws_title)
+    ws = client.get_worksheet(spreadsheet_id, ws_title)
     return ws.get_all_values()
 
-def save_to_worksheet(spreadsheet_id: str,
+def load_worksheets(client: GSheetClient,
+                    spreadsheet_id: str,
+                    ws_titles: List[str]) -> List[List[List[str]]]:
+    """Loads several worksheets from the sheet in Google Sheets in a single
+    batched request, without fetching the metadata of each worksheet.
+
+    Args:
+        client: Google Sheets client
+        spreadsheet_id: Google Sheets ID
+        ws_titles: Worksheet titles
+
+    Returns:
+        All values from each worksheet, as a list of lists, in the order of
+        the worksheet titles. The values are padded in the same way as in
+        `load_worksheet`.
+    """
+
+    sheet = client.get_spreadsheet(spreadsheet_id)
+    resp = sheet.values_batch_get(
+        [absolute_range_name(ws_title) for ws_title in ws_titles],
+        params={'valueRenderOption': 'FORMATTED_VALUE'})
+
+    return [fill_gaps(value_range['values']) if 'values' in value_range else []
+            for value_range in resp['valueRanges']]
+
+def get_spreadsheet_version(client: GSheetClient,
+                            spreadsheet_id: str) -> str:
+    """Gets the version of the sheet in Google Sheets, which increases with
+    every change made to the sheet.
+
+    Args:
+        client: Google Sheets client
+        spreadsheet_id: Google Sheets ID
+
+    Returns:
+        Version of the sheet.
+    """
+
+    resp = client.get_gc().request(
+        'get',
+        f'{DRIVE_FILES_API_V3_URL}/{spreadsheet_id}',
+        params={'fields': 'version'})
+    return resp.json()['version']
+
+def _get_changed_ranges(ws_title: str,
+                        start_row_idx: int,
+                        data_current: List[List[Any]],
+                        data: List[List[Any]]) -> Tuple[List[Dict[str, Any]], int, int]:
+    """Compares the new data against the current data of a worksheet, cell by
+    cell over the grid that covers both, and groups the changed cells of each
+    row into contiguous ranges. Cells that are only in the current data are
+    changed to empty strings, which clears them.
+
+    Args:
+        ws_title: Worksheet title
+        start_row_idx: Row number of the first row of data
+        data_current: Current data, in a list of lists
+        data: New data, in a list of lists
+
+    Returns:
+        Value ranges of the changed cells, in the form of the `data` field
+            of a values batch update
+        Number of changed cells
+        Number of rows with changed cells
+    """
+
+    n_rows = max(len(data_current), len(data))
+    n_cols = max((len(row) for row in data_current + data), default=0)
+    pad = lambda row: [*row, *[''] * (n_cols - len(row))]
+    data_current = [pad(row) for row in data_current] + [pad([])] * (n_rows - len(data_current))
+    data = [pad(row) for row in data] + [pad([])] * (n_rows - len(data))
+
+    value_ranges = []
+    n_cells_changed = 0
+    n_rows_changed = 0
+    for row_idx, (row_current, row) in enumerate(zip(data_current, data)):
+        col_idx = 0
+        row_changed = False
+        while col_idx < n_cols:
+            if row[col_idx] == row_current[col_idx]:
+                col_idx += 1
+                continue
+
+            # extend the range over the following changed cells
+            col_idx_end = col_idx
+            while col_idx_end + 1 < n_cols and row[col_idx_end + 1] != row_current[col_idx_end + 1]:
+                col_idx_end += 1
+
+            row_number = start_row_idx + row_idx
+            value_ranges.append({
+                'range': absolute_range_name(
+                    ws_title,
+                    f'{rowcol_to_a1(row_number, col_idx + 1)}:'
+                    f'{rowcol_to_a1(row_number, col_idx_end + 1)}'),
+                'values': [row[col_idx:col_idx_end + 1]],
+            })
+            n_cells_changed += col_idx_end - col_idx + 1
+            row_changed = True
+            col_idx = col_idx_end + 1
+
+        n_rows_changed += row_changed
+
+    return value_ranges, n_cells_changed, n_rows_changed
+
+def _save_diff_to_worksheet(ws: gspread.Worksheet,
+                            start_row_idx: int,
+                            data: List[List[Any]],
+                            diff_max_ratio: float) -> Dict[str, Union[str, int]]:
+    """Saves only the changed cells of the data to the worksheet, in a single
+    values batch update.
+
+    Args:
+        ws: Worksheet handle
+        start_row_idx: Row number of the first row of data
+        data: New data, in a list of lists
+        diff_max_ratio: Maximum ratio of changed cells to all cells
+
+    Returns:
+        The same dict as `save_to_worksheet`, or None if the ratio of changed
+        cells is above the maximum.
+    """
+
+    resp = ws.spreadsheet.values_get(
+        absolute_range_name(ws.title),
+        params={'valueRenderOption': 'UNFORMATTED_VALUE'})
+    data_current = fill_gaps(resp['values'])[start_row_idx - 1:] if 'values' in resp else []
+
+    value_ranges, n_cells_changed, n_rows_changed = _get_changed_ranges(
+        ws.title,
+        start_row_idx,
+        data_current,
+        data)
+    n_rows = max(len(data_current), len(data))
+    n_cols = max((len(row) for row in data_current + data), default=0)
+    n_cells = n_rows * n_cols
+    if n_cells_changed > diff_max_ratio * n_cells:
+        return None
+
+    if value_ranges:
+        # the values batch update does not add rows or columns to the worksheet
+        n_rows_required = start_row_idx - 1 + n_rows
+        if n_rows_required > ws.row_count or n_cols > ws.col_count:
+            ws.resize(max(n_rows_required, ws.row_count), max(n_cols, ws.col_count))
+        ws.spreadsheet.values_batch_update(body={
+            'valueInputOption': 'RAW',
+            'data': value_ranges,
+        })
+
+    return {
+        constants.UPDATED_RANGE: absolute_range_name(
+            ws.title,
+            f'A{start_row_idx}:{rowcol_to_a1(start_row_idx - 1 + max(n_rows, 1), max(n_cols, 1))}'),
+        constants.UPDATED_ROWS: n_rows_changed,
+        constants.REWRITTEN_CELLS: n_cells_changed,
+        constants.SKIPPED_CELLS: n_cells - n_cells_changed,
+    }
+
+def save_to_worksheet(client: GSheetClient,
+                      spreadsheet_id: str,
                       ws_title: str,
                       data: List[List[str]],
-                      keep_header_row: bool) -> Dict[str, Union[str, int]]:
+                      keep_header_row: bool,
+                      diff_max_ratio: float = 0) -> Dict[str, Union[str, int]]:
     """Saves the data to the specified worksheet.
-    
-    Steps:
+
+    If diff writes are enabled, the current data is read and only the changed
+    cells are written. If the ratio of changed cells is above the maximum,
+    the worksheet is rewritten in full instead:
     1. Add a new row to the end.
     2. Delete rows from `start_row_idx` till the 2nd-last row.
     3. Insert new data from `start_row_idx` onwards.
 
     Args:
+        client: Google Sheets client
         spreadsheet_id: Google Sheets ID
         ws_title: Worksheet title
         data: New data, in a list of lists
         keep_header_row: Whether the header row should be kept
+        diff_max_ratio: Maximum ratio of changed cells to all cells for only
+            the changed cells to be written; 0 always rewrites in full
 
     Returns:
         A dict with the following keys:
             - updatedRange: Cell range updated
             - updatedRows: Number of rows updated
+            - rewrittenCells: Number of cells written
+            - skippedCells: Number of unchanged cells that were not written
     """
 
-    gc = gspread.service_account(filename=constants.FILEPATH_GSHEET_CREDS)
-    sheet = gc.open_by_key(spreadsheet_id)
-    ws = sheet.worksheet(ws_title)
+    ws = client.get_worksheet(spreadsheet_id, ws_title)
+    client.invalidate_worksheet(spreadsheet_id, ws_title)
+
+    start_row_idx = 2 if keep_header_row else 1
 
-    start_row_idx = 2 if keep_header_row else 1 
+    if diff_max_ratio > 0:
+        resp = _save_diff_to_worksheet(ws, start_row_idx, data, diff_max_ratio)
+        if resp is not None:
+            return resp
 
     # 1. Add a new row to the end.
     ws.add_rows(1)
@@ -60,4 +459,6 @@ def save_to_worksheet(spreadsheet_id: str,
     return {
         constants.UPDATED_RANGE: resp[constants.UPDATES][constants.UPDATED_RANGE],
         constants.UPDATED_ROWS: resp[constants.UPDATES][constants.UPDATED_ROWS],
+        constants.REWRITTEN_CELLS: sum(len(row) for row in data),
+        constants.SKIPPED_CELLS: 0,
     }
@@ -0,0 +1,467 @@
+from gspread.utils import a1_to_rowcol, rowcol_to_a1
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import random
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlsplit
+
+"""
+Local stand-in for the subset of the Google Sheets and Drive APIs that the
+ETL pipeline uses through gspread, for running the pipeline offline:
+- spreadsheets.get - worksheet metadata
+- spreadsheets.batchUpdate - resizing, adding, deleting and inserting rows
+- spreadsheets.values.get / batchGet - getting values
+- spreadsheets.values.update / batchUpdate / append / clear - setting values
+- drive.files.get - spreadsheet version
+
+The stand-in serves one spreadsheet over HTTP, and can delay each request
+and reject requests with quota errors. A `gsheet.GSheetClient` is pointed
+at it with the `api_url` argument.
+"""
+
+# Default size of a new worksheet, as in Google Sheets
+_DEFAULT_ROW_COUNT = 1000
+_DEFAULT_COL_COUNT = 26
+
+def _error(code: int, status: str, message: str) -> Tuple[int, Dict[str, Any]]:
+    """Returns an error response in the form of the Google APIs."""
+    return code, {'error': {'code': code, 'message': message, 'status': status}}
+
+def _format_value(value: Any) -> str:
+    """Formats a value as a FORMATTED_VALUE is rendered by Google Sheets."""
+
+    if isinstance(value, bool):
+        return 'TRUE' if value else 'FALSE'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+def _split_range_name(range_name: str) -> Tuple[str, Optional[str]]:
+    """Splits an A1 range into the worksheet title and the cell range."""
+
+    if range_name.startswith("'"):
+        idx = 1
+        while True:
+            idx = range_name.index("'", idx)
+            if range_name[idx + 1:idx + 2] != "'":
+                break
+            idx += 2
+        title = range_name[1:idx].replace("''", "'")
+        cells = range_name[idx + 1:]
+    else:
+        title, _, cells = range_name.partition('!')
+        cells = '!' + cells if cells else ''
+    return title, cells[1:] if cells.startswith('!') else None
+
+class _Worksheet(object):
+    """Values and grid size of a worksheet.
+
+    Args:
+        sheet_id: Worksheet ID
+        title: Worksheet title
+        values: Values of the worksheet, as rows
+    """
+
+    def __init__(self, sheet_id: int, title: str, values: List[List[Any]]):
+        self.sheet_id = sheet_id
+        self.title = title
+        self.values = [list(row) for row in values]
+        self.row_count = max(len(self.values), _DEFAULT_ROW_COUNT)
+        self.col_count = max(max((len(row) for row in self.values), default=0), _DEFAULT_COL_COUNT)
+
+    def get_properties(self, index: int) -> Dict[str, Any]:
+        return {
+            'sheetId': self.sheet_id,
+            'title': self.title,
+            'index': index,
+            'sheetType': 'GRID',
+            'gridProperties': {'rowCount': self.row_count, 'columnCount': self.col_count},
+        }
+
+    def get_bounds(self, cells: Optional[str]) -> Tuple[int, int, int, int]:
+        """Returns the 0-based, end-exclusive row and column bounds of a cell
+        range, which is the whole grid if there is none."""
+
+        if not cells:
+            return 0, self.row_count, 0, self.col_count
+        start, _, end = cells.partition(':')
+        row_start, col_start = a1_to_rowcol(start)
+        row_end, col_end = a1_to_rowcol(end) if end else (self.row_count, self.col_count)
+        return row_start - 1, row_end, col_start - 1, col_end
+
+    def get_values(self, cells: Optional[str], render_option: str) -> Dict[str, Any]:
+        """Returns the values of a cell range, without the trailing empty rows
+        and cells, as the values.get method does."""
+
+        row_start, row_end, col_start, col_end = self.get_bounds(cells)
+        values = []
+        for row in self.values[row_start:row_end]:
+            row = row[col_start:col_end]
+            while row and row[-1] == '':
+                row.pop()
+            if render_option != 'UNFORMATTED_VALUE':
+                row = [_format_value(x) for x in row]
+            values.append(row)
+        while values and not values[-1]:
+            values.pop()
+
+        range_name = f"'{self.title}'!{rowcol_to_a1(row_start + 1, col_start + 1)}:" \
+            f'{rowcol_to_a1(min(row_end, self.row_count), min(col_end, self.col_count))}'
+        resp = {'range': range_name, 'majorDimension': 'ROWS'}
+        if values:
+            resp['values'] = values
+        return resp
+
+    def set_values(self, row_start: int, col_start: int, values: List[List[Any]]) -> Dict[str, Any]:
+        """Sets the values of the cells from a 0-based row and column onwards.
+
+        Returns:
+            Update response of the values, or None if the values do not fit
+            in the grid.
+        """
+
+        n_cols = max((len(row) for row in values), default=0)
+        if row_start + len(values) > self.row_count or col_start + n_cols > self.col_count:
+            return None
+
+        for row_idx, row in enumerate(values, row_start):
+            if len(self.values) <= row_idx:
+                self.values.extend([] for _ in range(row_idx + 1 - len(self.values)))
+            row_current = self.values[row_idx]
+            if len(row_current) < col_start + len(row):
+                row_current.extend([''] * (col_start + len(row) - len(row_current)))
+            row_current[col_start:col_start + len(row)] = [
+                '' if x is None else x for x in row]
+
+        return {
+            'updatedRange': f"'{self.title}'!{rowcol_to_a1(row_start + 1, col_start + 1)}:"
+                            f'{rowcol_to_a1(row_start + max(len(values), 1), col_start + max(n_cols, 1))}',
+            'updatedRows': len(values),
+            'updatedColumns': n_cols,
+            'updatedCells': sum(len(row) for row in values),
+        }
+
+    def resize(self, row_count: Optional[int], col_count: Optional[int]) -> None:
+        """Resizes the grid, dropping the values outside of it."""
+
+        if row_count is not None:
+            self.row_count = row_count
+            del self.values[row_count:]
+        if col_count is not None:
+            self.col_count = col_count
+            self.values = [row[:col_count] for row in self.values]
+        return None
+
+    def insert_rows(self, start_idx: int, end_idx: int) -> None:
+        """Inserts empty rows before a 0-based row."""
+
+        if start_idx < len(self.values):
+            self.values[start_idx:start_idx] = [[] for _ in range(end_idx - start_idx)]
+        self.row_count += end_idx - start_idx
+        return None
+
+    def delete_rows(self, start_idx: int, end_idx: int) -> None:
+        """Deletes the 0-based, end-exclusive rows."""
+
+        del self.values[start_idx:end_idx]
+        self.row_count -= end_idx - start_idx
+        return None
+
+class GSheetStub(object):
+    """Local HTTP stand-in for a spreadsheet in Google Sheets.
+
+    Args:
+        spreadsheet_id: Google Sheets ID
+        worksheets: Values of each worksheet, as rows, keyed by title
+        latency: Delay before each response, in seconds
+        error_rate: Probability of a request failing with a quota error
+        requests_per_minute: Maximum number of requests per minute, above
+            which requests fail with a quota error; None for no limit
+        seed: Seed of the random quota errors
+    """
+
+    def __init__(self,
+                 spreadsheet_id: str,
+                 worksheets: Dict[str, List[List[Any]]],
+                 latency: float = 0,
+                 error_rate: float = 0,
+                 requests_per_minute: Optional[int] = None,
+                 seed: int = 0):
+        self.spreadsheet_id = spreadsheet_id
+        self.worksheets = [_Worksheet(sheet_id, title, values)
+                           for sheet_id, (title, values) in enumerate(worksheets.items())]
+        self.latency = latency
+        self.error_rate = error_rate
+        self.requests_per_minute = requests_per_minute
+        self.random = random.Random(seed)
+        self.version = 1
+        self.request_times = []
+        self.n_requests = 0
+        self.n_quota_errors = 0
+        self.lock = threading.Lock()
+        self.server = None
+        self.thread = None
+
+    @property
+    def url(self) -> str:
+        """Base URL of the stand-in, to be given as the `api_url` of a client."""
+        return f'http://{self.server.server_address[0]}:{self.server.server_address[1]}'
+
+    def start(self) -> 'GSheetStub':
+        """Starts serving in a background thread, on a free local port."""
+
+        stub = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            def _respond(self, method: str) -> None:
+                n_bytes = int(self.headers.get('Content-Length') or 0)
+                body = json.loads(self.rfile.read(n_bytes)) if n_bytes else None
+                code, resp = stub.handle(method, self.path, body)
+                resp_bytes = json.dumps(resp).encode('utf-8')
+                self.send_response(code)
+                self.send_header('Content-Type', 'application/json; charset=UTF-8')
+                self.send_header('Content-Length', str(len(resp_bytes)))
+                self.end_headers()
+                self.wfile.write(resp_bytes)
+
+            def do_GET(self):
+                self._respond('get')
+
+            def do_POST(self):
+                self._respond('post')
+
+            def do_PUT(self):
+                self._respond('put')
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stops serving."""
+
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+        return None
+
+    def __enter__(self) -> 'GSheetStub':
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def get_worksheet_values(self, ws_title: str) -> List[List[Any]]:
+        """Returns the values of a worksheet, without the trailing empty rows
+        and cells."""
+
+        with self.lock:
+            return self._get_worksheet(ws_title).get_values(None, 'UNFORMATTED_VALUE').get('values', [])
+
+    def _get_worksheet(self, ws_title: str) -> Optional[_Worksheet]:
+        return next((ws for ws in self.worksheets if ws.title == ws_title), None)
+
+    def _get_worksheet_by_id(self, sheet_id: int) -> Optional[_Worksheet]:
+        return next((ws for ws in self.worksheets if ws.sheet_id == sheet_id), None)
+
+    def _is_quota_exceeded(self) -> bool:
+        """Checks if a request fails with a quota error, either at random or
+        because the requests of the last minute are over the limit."""
+
+        time_now = time.monotonic()
+        self.request_times = [t for t in self.request_times if t > time_now - 60]
+        if self.requests_per_minute is not None \
+                and len(self.request_times) >= self.requests_per_minute:
+            return True
+        self.request_times.append(time_now)
+        return self.random.random() < self.error_rate
+
+    def handle(self, method: str, path: str, body: Optional[Dict[str, Any]]) \
+            -> Tuple[int, Dict[str, Any]]:
+        """Handles a request.
+
+        Args:
+            method: HTTP method, in lowercase
+            path: Path and query string of the request
+            body: JSON body of the request
+
+        Returns:
+            HTTP status code
+            JSON body of the response
+        """
+
+        if self.latency:
+            time.sleep(self.latency)
+
+        with self.lock:
+            self.n_requests += 1
+            if self._is_quota_exceeded():
+                self.n_quota_errors += 1
+                return _error(
+                    429,
+                    'RESOURCE_EXHAUSTED',
+                    'Quota exceeded for quota metric \'Requests\' and limit '
+                    '\'Requests per minute per user\'')
+
+            url = urlsplit(path)
+            params = parse_qs(url.query)
+            sheets_prefix = f'/v4/spreadsheets/{self.spreadsheet_id}'
+            drive_prefix = f'/drive/v3/files/{self.spreadsheet_id}'
+
+            if url.path == drive_prefix and method == 'get':
+                return 200, {'version': str(self.version)}
+            if url.path == sheets_prefix and method == 'get':
+                return 200, self._get_metadata()
+            if url.path == f'{sheets_prefix}:batchUpdate' and method == 'post':
+                return self._batch_update(body)
+            if url.path == f'{sheets_prefix}/values:batchGet' and method == 'get':
+                return self._values_batch_get(params)
+            if url.path == f'{sheets_prefix}/values:batchUpdate' and method == 'post':
+                return self._values_batch_update(body)
+            if url.path.startswith(f'{sheets_prefix}/values/'):
+                range_path = url.path[len(f'{sheets_prefix}/values/'):]
+                if range_path.endswith(':append') and method == 'post':
+                    return self._values_append(unquote(range_path[:-len(':append')]), body)
+                if range_path.endswith(':clear') and method == 'post':
+                    return self._values_clear(unquote(range_path[:-len(':clear')]))
+                if method == 'get':
+                    return self._values_get(unquote(range_path), params)
+                if method == 'put':
+                    return self._values_update(unquote(range_path), body)
+            return _error(404, 'NOT_FOUND', f'Requested entity was not found: {method} {url.path}')
+
+    def _get_metadata(self) -> Dict[str, Any]:
+        return {
+            'spreadsheetId': self.spreadsheet_id,
+            'properties': {'title': self.spreadsheet_id},
+            'sheets': [{'properties': ws.get_properties(index)}
+                       for index, ws in enumerate(self.worksheets)],
+        }
+
+    def _parse_range(self, range_name: str) -> Tuple[Optional[_Worksheet], Optional[str]]:
+        title, cells = _split_range_name(range_name)
+        return self._get_worksheet(title), cells
+
+    def _values_get(self,
+                    range_name: str,
+                    params: Dict[str, List[str]]) -> Tuple[int, Dict[str, Any]]:
+        ws, cells = self._parse_range(range_name)
+        if ws is None:
+            return _error(400, 'INVALID_ARGUMENT', f'Unable to parse range: {range_name}')
+        render_option = params.get('valueRenderOption', ['FORMATTED_VALUE'])[0]
+        return 200, ws.get_values(cells, render_option)
+
+    def _values_batch_get(self, params: Dict[str, List[str]]) -> Tuple[int, Dict[str, Any]]:
+        value_ranges = []
+        for range_name in params.get('ranges', []):
+            code, resp = self._values_get(range_name, params)
+            if code != 200:
+                return code, resp
+            value_ranges.append(resp)
+        return 200, {'spreadsheetId': self.spreadsheet_id, 'valueRanges': value_ranges}
+
+    def _set_values(self, range_name: str, values: List[List[Any]]) \
+            -> Tuple[int, Dict[str, Any]]:
+        ws, cells = self._parse_range(range_name)
+        if ws is None:
+            return _error(400, 'INVALID_ARGUMENT', f'Unable to parse range: {range_name}')
+        row_start, _, col_start, _ = ws.get_bounds(cells)
+        resp = ws.set_values(row_start, col_start, values)
+        if resp is None:
+            return _error(400, 'INVALID_ARGUMENT', f'Range ({range_name}) exceeds grid limits. '
+                                                   f'Max rows: {ws.row_count}, max columns: {ws.col_count}')
+        self.version += 1
+        return 200, dict(resp, spreadsheetId=self.spreadsheet_id)
+
+    def _values_update(self, range_name: str, body: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        return self._set_values(range_name, body.get('values', []))
+
+    def _values_batch_update(self, body: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        resps = []
+        for value_range in body.get('data', []):
+            code, resp = self._set_values(value_range['range'], value_range.get('values', []))
+            if code != 200:
+                return code, resp
+            resps.append(resp)
+        return 200, {
+            'spreadsheetId': self.spreadsheet_id,
+            'totalUpdatedRows': sum(resp['updatedRows'] for resp in resps),
+            'totalUpdatedCells': sum(resp['updatedCells'] for resp in resps),
+            'responses': resps,
+        }
+
+    def _values_append(self, range_name: str, body: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        ws, cells = self._parse_range(range_name)
+        if ws is None:
+            return _error(400, 'INVALID_ARGUMENT', f'Unable to parse range: {range_name}')
+        values = body.get('values', [])
+
+        # the values are appended after the table of non-empty rows that
+        # starts at the range, and the grid is extended to fit them
+        row_start, _, col_start, _ = ws.get_bounds(cells)
+        while row_start < len(ws.values) and any(x != '' for x in ws.values[row_start]):
+            row_start += 1
+        n_cols = max((len(row) for row in values), default=0)
+        ws.resize(
+            max(ws.row_count, row_start + len(values)),
+            max(ws.col_count, col_start + n_cols))
+
+        resp = ws.set_values(row_start, col_start, values)
+        self.version += 1
+        return 200, {
+            'spreadsheetId': self.spreadsheet_id,
+            'tableRange': range_name,
+            'updates': dict(resp, spreadsheetId=self.spreadsheet_id),
+        }
+
+    def _values_clear(self, range_name: str) -> Tuple[int, Dict[str, Any]]:
+        ws, cells = self._parse_range(range_name)
+        if ws is None:
+            return _error(400, 'INVALID_ARGUMENT', f'Unable to parse range: {range_name}')
+        row_start, row_end, col_start, col_end = ws.get_bounds(cells)
+        for row in ws.values[row_start:row_end]:
+            row[col_start:col_end] = [''] * len(row[col_start:col_end])
+        self.version += 1
+        return 200, {'spreadsheetId': self.spreadsheet_id, 'clearedRange': range_name}
+
+    def _batch_update(self, body: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        requests = body.get('requests', [])
+        for request_idx, request in enumerate(requests):
+            (kind, args), = request.items()
+            if kind == 'updateSheetProperties':
+                sheet_id = args['properties']['sheetId']
+            elif kind in ('insertDimension', 'deleteDimension') and args['range']['dimension'] == 'ROWS':
+                sheet_id = args['range']['sheetId']
+            elif kind == 'appendDimension' and args['dimension'] == 'ROWS':
+                sheet_id = args['sheetId']
+            else:
+                return _error(400, 'INVALID_ARGUMENT', f'Unsupported request: requests[{request_idx}].{kind}')
+
+            ws = self._get_worksheet_by_id(sheet_id)
+            if ws is None:
+                return _error(400, 'INVALID_ARGUMENT', f'No grid with id: {sheet_id}')
+
+            if kind == 'updateSheetProperties':
+                grid_properties = args['properties'].get('gridProperties', {})
+                ws.resize(grid_properties.get('rowCount'), grid_properties.get('columnCount'))
+            elif kind == 'appendDimension':
+                ws.resize(ws.row_count + args['length'], None)
+            elif kind == 'insertDimension':
+                ws.insert_rows(args['range']['startIndex'], args['range']['endIndex'])
+            else:
+                start_idx, end_idx = args['range']['startIndex'], args['range']['endIndex']
+                if not 0 <= start_idx < end_idx <= ws.row_count:
+                    return _error(400, 'INVALID_ARGUMENT', f'Invalid requests[{request_idx}].deleteDimension')
+                if end_idx - start_idx == ws.row_count:
+                    return _error(400, 'INVALID_ARGUMENT', f'Invalid requests[{request_idx}].deleteDimension: '
+                                                           'You can\'t delete all the rows on the sheet.')
+                ws.delete_rows(start_idx, end_idx)
+
+        self.version += 1
+        return 200, {'spreadsheetId': self.spreadsheet_id, 'replies': [{} for _ in requests]}
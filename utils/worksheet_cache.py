@@ -0,0 +1,94 @@
+import glob
+import hashlib
+import os
+import pyarrow as pa
+from typing import List, Optional
+
+"""
+On-disk cache of worksheet values, stored in the Arrow IPC file format.
+
+Each worksheet is cached under the version of its spreadsheet, so that a
+cached worksheet is only used as long as the spreadsheet has not been edited
+since it was fetched.
+"""
+
+def _get_cache_path(cache_dir: str,
+                    spreadsheet_id: str,
+                    ws_title: str,
+                    version: str) -> str:
+    """Returns the path of the cache file of a worksheet at a spreadsheet
+    version, with a prefix that is shared by all versions of the worksheet.
+    """
+
+    # worksheet titles may contain characters that are not valid in filenames
+    ws_key = hashlib.sha256(ws_title.encode('utf-8')).hexdigest()[:16]
+    return os.path.join(cache_dir, spreadsheet_id, f'{ws_key}-{version}.arrow')
+
+def load(cache_dir: str,
+         spreadsheet_id: str,
+         ws_title: str,
+         version: str,
+         memory_map: bool) -> Optional[List[List[str]]]:
+    """Loads a worksheet from the cache.
+
+    Args:
+        cache_dir: Cache directory
+        spreadsheet_id: Google Sheets ID
+        ws_title: Worksheet title
+        version: Version of the spreadsheet
+        memory_map: Whether the cache file should be memory-mapped
+            instead of read into memory
+
+    Returns:
+        All values from the worksheet, as a list of lists,
+        or None if the worksheet is not cached at this version.
+    """
+
+    cache_path = _get_cache_path(cache_dir, spreadsheet_id, ws_title, version)
+    if not os.path.exists(cache_path):
+        return None
+
+    source = pa.memory_map(cache_path, 'r') if memory_map else pa.OSFile(cache_path, 'rb')
+    with source:
+        table = pa.RecordBatchFileReader(source).read_all()
+        return table.column(0).to_pylist()
+
+def save(cache_dir: str,
+         spreadsheet_id: str,
+         ws_title: str,
+         version: str,
+         data: List[List[str]]) -> None:
+    """Saves a worksheet to the cache, replacing any other cached versions
+    of the worksheet.
+
+    Args:
+        cache_dir: Cache directory
+        spreadsheet_id: Google Sheets ID
+        ws_title: Worksheet title
+        version: Version of the spreadsheet
+        data: All values from the worksheet, as a list of lists
+    """
+
+    cache_path = _get_cache_path(cache_dir, spreadsheet_id, ws_title, version)
+    cache_path_prefix = cache_path[:-len(f'{version}.arrow')]
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+
+    # each row is stored as a list of strings, so that rows of any length
+    # are loaded back as they are
+    table = pa.Table.from_arrays(
+        [pa.array(data, type=pa.list_(pa.string()))],
+        names=['row'])
+
+    # write to a temporary file first, so that a partly written file
+    # is never loaded
+    cache_path_tmp = f'{cache_path}.{os.getpid()}.tmp'
+    with pa.OSFile(cache_path_tmp, 'wb') as sink:
+        writer = pa.RecordBatchFileWriter(sink, table.schema)
+        writer.write_table(table)
+        writer.close()
+    os.replace(cache_path_tmp, cache_path)
+
+    for cache_path_old in glob.glob(f'{glob.escape(cache_path_prefix)}*.arrow'):
+        if cache_path_old != cache_path:
+            os.remove(cache_path_old)
+    return None